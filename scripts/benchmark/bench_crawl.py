@@ -0,0 +1,183 @@
+"""
+Crawl throughput benchmark of HPScraper against the local mock portal.
+
+Every scenario runs in its own process, so peak RSS is measured per scenario.
+Reports hearings/sec, MB/sec, peak RSS and the number of requests the portal saw.
+
+Example:
+    python scripts/benchmark/bench_crawl.py --hearings 100 --latency 0.02 --error-rate 0.02
+    python scripts/benchmark/bench_crawl.py --scenarios subpages_parallel populate_concurrent --output bench.json
+
+The sequential scenarios wait 1 / --rate-limit seconds between requests (`AdaptiveConcurrency.pause`, doubled
+for every throttled or failed response in a row), so keep --hearings small for them. The concurrent scenarios
+are paced by the per-host token bucket at --rate-limit requests per second, with the number of requests in
+flight adapted by AdaptiveConcurrency up to --concurrency.
+"""
+
+import argparse
+import json
+import multiprocessing
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from mock_portal import MockPortal, make_corpus  # noqa: E402
+
+SCENARIOS = [
+    "subpages",
+    "subpages_parallel",
+    "populate",
+    "populate_concurrent",
+    "unzip",
+]
+
+
+def folder_size(path):
+    return sum(x.stat().st_size for x in Path(path).rglob("*") if x.is_file())
+
+
+def run_scenario(scenario, base_url, workdir, args, queue):
+    """Run a scenario in a child process and put its measurements on the queue."""
+    from hoering.scraper.scrape import HPScraper
+
+    workdir = Path(workdir)
+    mainpath = workdir / "hearings"
+    scraper = HPScraper(rate_limit=args.rate_limit, base_url=base_url)
+
+    # Every scenario after the subpages ones starts from the full list of hearings
+    if not scenario.startswith("subpages"):
+        scraper.subpages = json.loads((workdir / "subpages.json").read_text())
+
+    start = time.perf_counter()
+    if scenario == "subpages":
+        scraper.get_subpages(page_size=args.page_size)
+        n_bytes = len(json.dumps(scraper.subpages))
+    elif scenario == "subpages_parallel":
+        scraper.get_subpages(page_size=args.page_size, concurrency=args.concurrency)
+        n_bytes = len(json.dumps(scraper.subpages))
+    elif scenario in ("populate", "populate_concurrent"):
+        shutil.rmtree(mainpath, ignore_errors=True)
+        concurrency = args.concurrency if scenario == "populate_concurrent" else None
+        scraper.populate(mainpath, concurrency=concurrency)
+        n_bytes = folder_size(mainpath)
+    elif scenario == "unzip":
+        scraper.unzip(mainpath)
+        n_bytes = folder_size(mainpath) - sum(
+            x.stat().st_size for x in mainpath.glob("*/*.zip")
+        )
+    elapsed = time.perf_counter() - start
+
+    if scenario.startswith("subpages"):
+        (workdir / "subpages.json").write_text(json.dumps(scraper.subpages))
+
+    queue.put(
+        {
+            "scenario": scenario,
+            "seconds": elapsed,
+            "hearings": len(scraper.subpages),
+            "bytes": n_bytes,
+            # ru_maxrss is in kilobytes on Linux. RUSAGE_CHILDREN covers worker processes.
+            "peak_rss_mb": max(
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+            )
+            / 1024,
+        }
+    )
+
+
+def benchmark(args):
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="hoering_bench_"))
+    corpus = workdir / "corpus"
+    if not (corpus / "hearings.json").exists():
+        print(f"Generating a corpus of {args.hearings} hearings in {corpus}")
+        make_corpus(corpus, args.hearings, document_size=args.document_size)
+
+    portal = MockPortal(
+        corpus,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        bandwidth=args.bandwidth,
+    ).start()
+
+    # The later scenarios need the subpages, and unzip needs the populated folders
+    scenarios = list(args.scenarios)
+    if any(not x.startswith("subpages") for x in scenarios) and not (
+        workdir / "subpages.json"
+    ).exists():
+        scenarios = ["subpages_parallel"] + [
+            x for x in scenarios if x != "subpages_parallel"
+        ]
+    if "unzip" in scenarios and not any(x.startswith("populate") for x in scenarios):
+        scenarios.insert(scenarios.index("unzip"), "populate_concurrent")
+
+    context = multiprocessing.get_context("spawn")
+    results = []
+    try:
+        for scenario in scenarios:
+            portal.reset_stats()
+            queue = context.Queue()
+            process = context.Process(
+                target=run_scenario,
+                args=(scenario, portal.base_url, workdir, args, queue),
+            )
+            process.start()
+            result = queue.get()
+            process.join()
+
+            result.update(
+                {
+                    "requests": portal.stats["requests"],
+                    "errors_injected": portal.stats["errors"],
+                    "mb_served": portal.stats["bytes_sent"] / 1e6,
+                    "hearings_per_sec": result["hearings"] / result["seconds"],
+                    "mb_per_sec": result["bytes"] / 1e6 / result["seconds"],
+                }
+            )
+            results.append(result)
+    finally:
+        portal.stop()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print()
+    print(
+        f"{'scenario':<22}{'seconds':>9}{'hearings/s':>12}{'MB/s':>9}{'peak RSS MB':>13}{'requests':>10}{'errors':>8}"
+    )
+    for r in results:
+        print(
+            f"{r['scenario']:<22}{r['seconds']:>9.2f}{r['hearings_per_sec']:>12.1f}{r['mb_per_sec']:>9.2f}"
+            f"{r['peak_rss_mb']:>13.1f}{r['requests']:>10}{r['errors_injected']:>8}"
+        )
+
+    if args.output:
+        settings = {k: v for k, v in vars(args).items() if k not in ("output", "scenarios")}
+        with open(args.output, "w") as f:
+            json.dump({"settings": settings, "results": results}, f, indent=2)
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the crawl throughput of HPScraper against a local mock portal")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--hearings", type=int, default=40, help="Number of hearings in the synthetic corpus")
+    parser.add_argument("--document-size", type=int, default=200_000, help="Bytes per document in the zip files")
+    parser.add_argument("--page-size", type=int, default=10, help="Hearings per search request")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrency of the concurrent scenarios")
+    parser.add_argument("--rate-limit", type=float, default=50.0, help="Requests per second per host")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added before every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--bandwidth", type=float, default=None, help="Bytes per second per response")
+    parser.add_argument("--workdir", type=Path, default=None, help="Keep the corpus and downloads here instead of a temporary folder")
+    parser.add_argument("--output", type=Path, default=None, help="Write the results as json")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    benchmark(parse_args())
@@ -0,0 +1,106 @@
+"""
+Micro-benchmark of the Details page parser: the lxml parser of `parse_details` against the BeautifulSoup
+parser it replaced, over a corpus of saved Details pages. Checks that both give the same meta info.
+
+The pages are read from a folder of .html files, from a ResponseArchive, or generated with the mock portal.
+Generated pages get --padding bytes of markup after the fieldset, like the document list and scripts of the real pages.
+
+Example:
+    python scripts/benchmark/bench_details.py --archive data/raw_archive
+    python scripts/benchmark/bench_details.py --pages 500 --padding 60000 --repeat 5
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bs4 import BeautifulSoup as bs
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from hoering.scraper.archive import ResponseArchive, read_record  # noqa: E402
+from hoering.scraper.meta import parse_details  # noqa: E402
+from mock_portal import make_corpus  # noqa: E402
+
+
+def parse_details_soup(content) -> dict:
+    """The BeautifulSoup parser `parse_details` replaced. `details` is a Tag here."""
+    fieldset = bs(content, features="lxml").find("fieldset")
+    details = fieldset.find("h3", {"class": "Høringsdetaljer"})
+    containers = fieldset.find_all("div", {"class": "fieldContainer"})
+    meta_info = {k.label.text.strip(): k.span.text.strip() for k in containers}
+    meta_info["details"] = details if details else ""
+    return meta_info
+
+
+def load_pages(args) -> list[bytes]:
+    if args.html_dir:
+        return [x.read_bytes() for x in sorted(Path(args.html_dir).glob("*.html"))]
+
+    if args.archive:
+        archive = ResponseArchive(args.archive)
+        return [
+            read_record(archive.archive_dir / entry["segment"], entry)[1]
+            for entry in archive.index("details").values()
+        ]
+
+    padding = "<div class='document'><a href='/file'>Bilag</a></div>\n" * (
+        args.padding // 52
+    )
+    with tempfile.TemporaryDirectory() as corpus:
+        make_corpus(corpus, args.pages, document_size=10)
+        return [
+            x.read_bytes().replace(b"</body>", padding.encode() + b"</body>")
+            for x in sorted(Path(corpus, "details").glob("*.html"))
+        ]
+
+
+def run(parser, pages, repeat) -> float:
+    """The best pages/sec over `repeat` runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for page in pages:
+            parser(page)
+        best = min(best, time.perf_counter() - start)
+    return len(pages) / best
+
+
+def benchmark(args):
+    pages = load_pages(args)
+    if not pages:
+        sys.exit("No Details pages found")
+    print(f"{len(pages)} pages, {sum(map(len, pages)) / len(pages) / 1000:.1f} kB on average")
+
+    mismatches = 0
+    for page in pages:
+        expected = parse_details_soup(page)
+        details = expected["details"]
+        expected["details"] = details.text.strip() if details else ""
+        if parse_details(page) != expected:
+            mismatches += 1
+    print(f"Pages parsed differently: {mismatches}")
+
+    soup = run(parse_details_soup, pages, args.repeat)
+    lean = run(parse_details, pages, args.repeat)
+    print(f"{'parser':<16}{'pages/s':>10}")
+    print(f"{'BeautifulSoup':<16}{soup:>10.1f}")
+    print(f"{'lxml':<16}{lean:>10.1f}")
+    print(f"Speedup: {lean / soup:.1f}x")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the Details page parser against the BeautifulSoup parser")
+    parser.add_argument("--html-dir", type=Path, default=None, help="A folder of saved Details pages (.html)")
+    parser.add_argument("--archive", type=Path, default=None, help="A ResponseArchive (eg. data-dir/raw_archive) holding Details pages")
+    parser.add_argument("--pages", type=int, default=200, help="Number of generated pages, without --html-dir or --archive")
+    parser.add_argument("--padding", type=int, default=50_000, help="Bytes of markup after the fieldset of generated pages")
+    parser.add_argument("--repeat", type=int, default=3)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    benchmark(parse_args())
@@ -0,0 +1,161 @@
+"""
+Benchmark of the text engines of NGOExtractor: "html" (page.get_text("html") parsed with BeautifulSoup)
+against "spans" (the span data of page.get_text("dict")). Checks that both find the same NGOs on every page.
+With --tables, also times the table detection of the first pages: the ruling-line detector against camelot
+(if installed).
+
+The hearing lists are read from a folder (every *liste*.pdf below it), or generated: bullet lists in a symbol font
+with a bold title, page numbers, e-mail addresses and a few indented or colored rows.
+
+Example:
+    python scripts/benchmark/bench_extract.py --pdf-dir data/hearings
+    python scripts/benchmark/bench_extract.py --documents 20 --rows 300
+"""
+
+import argparse
+import logging
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import fitz
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src"))
+
+from hoering.parser import tables  # noqa: E402
+from hoering.parser.extract import NGOExtractor, logger  # noqa: E402
+
+ORGANISATIONS = [
+    "Dansk Industri",
+    "Landbrug & Fødevarer",
+    "KL",
+    "Danske Regioner",
+    "Forbrugerrådet Tænk",
+    "Dansk Erhverv",
+    "Danmarks Naturfredningsforening",
+    "Institut for Menneskerettigheder",
+    "Advokatrådet",
+    "Datatilsynet",
+    "FH - Fagbevægelsens Hovedorganisation",
+    "Ældre Sagen",
+    "Danske Handicaporganisationer",
+    "Rigsrevisionen",
+    "Finans Danmark",
+]
+
+
+def make_lists(folder, n_documents, n_rows, seed=170497) -> list[Path]:
+    random.seed(seed)
+    files = []
+    for i in range(n_documents):
+        doc = fitz.open()
+        page = doc.new_page()
+        page.insert_text((72, 60), "Høringsliste", fontname="hebo", fontsize=14)
+        y = 90
+        for row in range(n_rows):
+            if y > 780:
+                page.insert_text((280, 820), f"Side {doc.page_count}", fontname="helv", fontsize=8)
+                page = doc.new_page()
+                y = 60
+            name = random.choice(ORGANISATIONS)
+            if random.random() < 0.1:
+                name += f" ({random.randint(1, 99)})"
+            left = 90 if random.random() > 0.05 else 110
+            color = (0, 0, 0.5) if random.random() < 0.05 else (0, 0, 0)
+            page.insert_text((72, y), "·", fontname="symb", fontsize=11)
+            page.insert_text((left, y), name, fontname="tiro", fontsize=11, color=color)
+            if random.random() < 0.1:
+                page.insert_text((360, y), "post@example.dk", fontname="tiro", fontsize=11)
+            y += 14
+        path = Path(folder) / f"{i}" / f"hoeringsliste_{i}.pdf"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        doc.save(path)
+        files.append(path)
+    return files
+
+
+def run(engine, files) -> tuple[float, list]:
+    """Extract every page with an engine. Returns (seconds, NGOs per page)."""
+    extractor = NGOExtractor(engine=engine)
+    results = []
+    start = time.perf_counter()
+    for file in files:
+        with fitz.open(file) as doc:
+            style = extractor.get_most_common_style(doc[0])
+            for page in doc:
+                try:
+                    results.append(extractor.extract_page(page, style) if style else [])
+                except IndexError:
+                    results.append(None)
+    return time.perf_counter() - start, results
+
+
+def run_tables(files):
+    """Time the table detectors on the first page of every file."""
+    verdicts = []
+    start = time.perf_counter()
+    for file in files:
+        with fitz.open(file) as doc:
+            verdicts.append(tables.classify_page(doc[0]))
+    vector_seconds = time.perf_counter() - start
+    print(f"Ruling-line detector: {vector_seconds / len(files) * 1000:.1f} ms per document")
+    for verdict in (tables.TABLE, tables.NO_TABLE, tables.AMBIGUOUS):
+        print(f"  {verdict:<10}{verdicts.count(verdict):>6}")
+
+    try:
+        import camelot
+    except ImportError:
+        print("camelot is not installed, skipping it")
+        return
+
+    agree = 0
+    start = time.perf_counter()
+    for file, verdict in zip(files, verdicts):
+        found = bool(camelot.read_pdf(str(file), line_scale=25, resolution=500))
+        agree += verdict == tables.AMBIGUOUS or found == (verdict == tables.TABLE)
+    camelot_seconds = time.perf_counter() - start
+    print(f"camelot: {camelot_seconds / len(files) * 1000:.1f} ms per document")
+    print(f"Documents where the detector agrees with camelot (or defers to it): {agree} of {len(files)}")
+
+
+def benchmark(args):
+    # The debug records of extract_page would dominate the timings
+    logger.setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as folder:
+        if args.pdf_dir:
+            files = sorted(Path(args.pdf_dir).rglob("*liste*.pdf"))
+        else:
+            files = make_lists(folder, args.documents, args.rows)
+        if not files:
+            sys.exit("No hearing lists found")
+
+        html_seconds, html_results = run("html", files)
+        spans_seconds, spans_results = run("spans", files)
+
+        n_pages = len(html_results)
+        mismatches = sum(a != b for a, b in zip(html_results, spans_results))
+        print(f"{len(files)} documents, {n_pages} pages")
+        print(f"Pages with different NGOs: {mismatches}")
+        print(f"{'engine':<10}{'seconds':>9}{'pages/s':>10}")
+        print(f"{'html':<10}{html_seconds:>9.2f}{n_pages / html_seconds:>10.1f}")
+        print(f"{'spans':<10}{spans_seconds:>9.2f}{n_pages / spans_seconds:>10.1f}")
+        print(f"Speedup: {html_seconds / spans_seconds:.1f}x")
+
+        if args.tables:
+            run_tables(files)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the html and spans text engines of NGOExtractor")
+    parser.add_argument("--pdf-dir", type=Path, default=None, help="A folder holding hearing lists (*liste*.pdf)")
+    parser.add_argument("--documents", type=int, default=20, help="Number of generated lists, without --pdf-dir")
+    parser.add_argument("--rows", type=int, default=150, help="Rows per generated list")
+    parser.add_argument("--tables", action="store_true", default=False, help="Also time the table detectors")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    benchmark(parse_args())
@@ -0,0 +1,298 @@
+"""
+A local stand-in for hoeringsportalen.dk, for measuring HPScraper without hitting the real portal.
+
+Replays a corpus folder with the layout
+    corpus/hearings.json       the hearing rows as returned by /hearing/gethearings
+    corpus/details/{id}.html   the Details pages
+    corpus/zips/{id}.zip       the zip files of the hearings
+A synthetic corpus can be generated with --make-corpus.
+
+Run standalone with:
+    python scripts/benchmark/mock_portal.py --corpus /tmp/corpus --make-corpus 200 --port 8800
+and point the scraper at it with HPScraper(base_url="http://localhost:8800").
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+DETAILS_TEMPLATE = """<html><body><fieldset>
+<h3>Høringsdetaljer</h3>
+<div class="fieldContainer"><label>Officiel titel</label><span>Forslag til lov nr. {id}</span></div>
+<div class="fieldContainer"><label>Høringstype</label><span>{type}</span></div>
+<div class="fieldContainer"><label>Myndighed</label><span>{authority}</span></div>
+<div class="fieldContainer"><label>Område</label><span>Erhverv</span></div>
+<div class="fieldContainer"><label>Høringsfrist</label><span>01-03-2024</span></div>
+<div class="fieldContainer"><label>Arkiveringsdato</label><span>01-06-2024</span></div>
+<div class="fieldContainer"><label>Høringsår</label><span>2023/2024</span></div>
+<div class="fieldContainer"><label>Publiceringsdato</label><span>{published}</span></div>
+</fieldset>
+<ul>{documents}</ul>
+</body></html>"""
+
+DOCUMENT_NAMES = [
+    "hoeringsliste.pdf",
+    "hoeringsbrev.pdf",
+    "udkast_til_lovforslag.pdf",
+    "hoeringssvar_{n}.pdf",
+]
+
+
+def make_corpus(corpus_dir, n_hearings, document_size=200_000, seed=170497):
+    """Generate a synthetic corpus of n_hearings hearings with zip files of roughly 4 x document_size bytes."""
+    rng = random.Random(seed)
+    corpus_dir = Path(corpus_dir)
+    (corpus_dir / "details").mkdir(parents=True, exist_ok=True)
+    (corpus_dir / "zips").mkdir(parents=True, exist_ok=True)
+    (corpus_dir / "documents").mkdir(parents=True, exist_ok=True)
+
+    hearings = []
+    for i in range(n_hearings):
+        _id = 70000 - i
+        hearing_type = rng.choice(["Lovforslag", "Bekendtgørelser", "EU-Dokumenter"])
+        authority = rng.choice(["Skatteministeriet", "Miljøstyrelsen", "Finanstilsynet"])
+        published = f"{rng.randint(1, 28):02d}-{rng.randint(1, 12):02d}-2024"
+        hearings.append(
+            {
+                "Id": _id,
+                "Title": f"Forslag til lov nr. {_id}",
+                "HearingType": hearing_type,
+                "Authority": authority,
+                "PublicationDate": "-".join(reversed(published.split("-"))) + "T00:00:00",
+            }
+        )
+
+        names = [x.format(n=n) for n, x in enumerate(DOCUMENT_NAMES)]
+        with zipfile.ZipFile(corpus_dir / "zips" / f"{_id}.zip", "w") as zf:
+            for name in names:
+                # Incompressible content, like scanned attachments
+                data = rng.randbytes(document_size)
+                zf.writestr(name, data)
+                (corpus_dir / "documents" / f"{_id}_{name}").write_bytes(data)
+
+        documents = "".join(
+            f'<li><a href="/Hearing/DownloadDocument?hearingId={_id}&name={name}" title="{name}">{name}</a></li>'
+            for name in names
+        )
+        (corpus_dir / "details" / f"{_id}.html").write_text(
+            DETAILS_TEMPLATE.format(
+                id=_id,
+                type=hearing_type,
+                authority=authority,
+                published=published,
+                documents=documents,
+            ),
+            encoding="utf-8",
+        )
+
+    with open(corpus_dir / "hearings.json", "w") as f:
+        json.dump(hearings, f)
+
+
+class MockPortal:
+    def __init__(
+        self,
+        corpus_dir,
+        port=0,
+        latency=0.0,
+        error_rate=0.0,
+        bandwidth=None,
+        seed=170497,
+    ):
+        """
+        Serve a corpus like hoeringsportalen.dk.
+
+        corpus_dir: the corpus folder (see module docstring).
+        port: the port to listen on. 0 picks a free port.
+        latency: seconds added before every response.
+        error_rate: the share of requests answered with 503.
+        bandwidth: bytes per second per response body. None for unlimited.
+        """
+        self.corpus_dir = Path(corpus_dir)
+        with open(self.corpus_dir / "hearings.json", "r") as f:
+            self.hearings = json.load(f)
+        # Served newest first, as the portal sorts the search by PublicationDate
+        self.hearings.sort(key=lambda x: x.get("PublicationDate", ""), reverse=True)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.bandwidth = bandwidth
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self.handler())
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.thread = None
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = {"requests": 0, "errors": 0, "bytes_sent": 0}
+
+    def count(self, key, n=1):
+        with self.lock:
+            self.stats[key] += n
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handler(self):
+        portal = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def delay_or_fail(self):
+                portal.count("requests")
+                if portal.latency:
+                    time.sleep(portal.latency)
+                with portal.lock:
+                    fail = portal.rng.random() < portal.error_rate
+                if fail:
+                    portal.count("errors")
+                    self.send_response(503)
+                    self.send_header("Content-Length", "0")
+                    self.send_header("Retry-After", "1")
+                    self.end_headers()
+                return fail
+
+            def send_body(self, body, status=200, content_type="text/html", headers=None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+
+                chunk_size = 64 * 1024
+                for i in range(0, len(body), chunk_size):
+                    chunk = body[i : i + chunk_size]
+                    self.wfile.write(chunk)
+                    if portal.bandwidth:
+                        time.sleep(len(chunk) / portal.bandwidth)
+                portal.count("bytes_sent", len(body))
+
+            def not_found(self):
+                self.send_body(b"", status=404)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if self.delay_or_fail():
+                    return
+                if urlparse(self.path).path.lower() != "/hearing/gethearings":
+                    return self.not_found()
+
+                skip, take = int(payload.get("skip", 0)), int(payload.get("take", 500))
+                body = json.dumps(
+                    {
+                        "Hearings": portal.hearings[skip : skip + take],
+                        "TotalCount": len(portal.hearings),
+                    }
+                ).encode("utf-8")
+                self.send_body(body, content_type="application/json")
+
+            def do_GET(self):
+                if self.delay_or_fail():
+                    return
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+
+                if url.path.startswith("/Hearing/Details/"):
+                    _id = url.path.rsplit("/", 1)[-1]
+                    return self.send_file(portal.corpus_dir / "details" / f"{_id}.html")
+                if url.path == "/Hearing/DownloadDocumentsAsZipFile":
+                    _id = query.get("hearingId", [""])[0]
+                    return self.send_file(
+                        portal.corpus_dir / "zips" / f"{_id}.zip", "application/zip"
+                    )
+                if url.path == "/Hearing/DownloadDocument":
+                    _id = query.get("hearingId", [""])[0]
+                    name = query.get("name", [""])[0]
+                    return self.send_file(
+                        portal.corpus_dir / "documents" / f"{_id}_{name}",
+                        "application/octet-stream",
+                    )
+                return self.not_found()
+
+            def send_file(self, path, content_type="text/html"):
+                """Send a file, with ETag/If-None-Match and Range support."""
+                if not path.exists():
+                    return self.not_found()
+                body = path.read_bytes()
+                etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                range_header = self.headers.get("Range", "")
+                if range_header.startswith("bytes="):
+                    start = int(range_header[6:].split("-")[0])
+                    if start >= len(body):
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{len(body)}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    return self.send_body(
+                        body[start:],
+                        status=206,
+                        content_type=content_type,
+                        headers={
+                            "Content-Range": f"bytes {start}-{len(body) - 1}/{len(body)}",
+                            "ETag": etag,
+                        },
+                    )
+                self.send_body(body, content_type=content_type, headers={"ETag": etag})
+
+        return Handler
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for hoeringsportalen.dk")
+    parser.add_argument("--corpus", type=Path, required=True, help="Path to the corpus folder")
+    parser.add_argument("--make-corpus", type=int, default=None, help="Generate a synthetic corpus with this many hearings first")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added before every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--bandwidth", type=float, default=None, help="Bytes per second per response")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.make_corpus:
+        make_corpus(args.corpus, args.make_corpus)
+    portal = MockPortal(
+        args.corpus,
+        port=args.port,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        bandwidth=args.bandwidth,
+    )
+    print(f"Serving {len(portal.hearings)} hearings on {portal.base_url}")
+    try:
+        portal.server.serve_forever()
+    except KeyboardInterrupt:
+        portal.stop()
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import uuid
+from pathlib import Path
+from typing import Optional
+
+
+class BlobStore:
+    def __init__(self, root):
+        """
+        A content-addressed store of the files of the hearings, keyed by SHA-256.
+        Identical attachments (standard høringslister, ministry templates, campaign responses) are stored once
+        under root/objects/{sha[:2]}/{sha}, and the hearing folders hold hardlinks to them
+        (copies where hardlinks are not possible). blobs.sqlite maps every file path to its blob, and keeps
+        the results of downstream stages per blob, so work done for identical bytes is not done again.
+
+        root: the folder of the store. Created if it does not exist. Must be on the same filesystem
+            as the hearing folders for hardlinks to work.
+        """
+        self.root = Path(root)
+        (self.root / "objects").mkdir(parents=True, exist_ok=True)
+        (self.root / "tmp").mkdir(exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(
+            self.root / "blobs.sqlite",
+            timeout=60,
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.lock:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS refs (path TEXT PRIMARY KEY, sha256 TEXT NOT NULL, size INTEGER)"
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_refs_sha256 ON refs (sha256)"
+            )
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS derived (
+                    sha256 TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    value TEXT,
+                    PRIMARY KEY (sha256, kind)
+                )
+                """
+            )
+
+    def close(self):
+        self.conn.close()
+
+    def blob_path(self, sha: str) -> Path:
+        return self.root / "objects" / sha[:2] / sha
+
+    def put_stream(self, src, chunk_size=1024 * 1024) -> tuple[str, int]:
+        """Store the content of a binary file object. Returns (sha256, size)."""
+        tmp_path = self.root / "tmp" / uuid.uuid4().hex
+        digest = hashlib.sha256()
+        size = 0
+        with open(tmp_path, "wb") as dst:
+            while chunk := src.read(chunk_size):
+                digest.update(chunk)
+                dst.write(chunk)
+                size += len(chunk)
+
+        sha = digest.hexdigest()
+        blob_path = self.blob_path(sha)
+        if blob_path.exists():
+            os.remove(tmp_path)
+        else:
+            blob_path.parent.mkdir(exist_ok=True)
+            os.replace(tmp_path, blob_path)
+        return sha, size
+
+    def link(self, sha: str, dest) -> Path:
+        """Put a blob at dest, as a hardlink if possible."""
+        dest = Path(dest)
+        tmp_path = dest.with_name(f"{dest.name}.{uuid.uuid4().hex[:8]}.tmp")
+        try:
+            os.link(self.blob_path(sha), tmp_path)
+        except OSError:
+            shutil.copyfile(self.blob_path(sha), tmp_path)
+        os.replace(tmp_path, dest)
+        return dest
+
+    def store(self, src, dest) -> str:
+        """Store the content of a binary file object and put it at dest. Returns the sha256."""
+        sha, size = self.put_stream(src)
+        self.link(sha, dest)
+        self.add_ref(dest, sha, size)
+        return sha
+
+    def store_bytes(self, data: bytes, dest) -> str:
+        sha = hashlib.sha256(data).hexdigest()
+        if not self.blob_path(sha).exists():
+            tmp_path = self.root / "tmp" / uuid.uuid4().hex
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            self.blob_path(sha).parent.mkdir(exist_ok=True)
+            os.replace(tmp_path, self.blob_path(sha))
+        self.link(sha, dest)
+        self.add_ref(dest, sha, len(data))
+        return sha
+
+    def store_file(self, path) -> str:
+        """Move an existing file into the store and replace it with a link. Returns the sha256."""
+        with open(path, "rb") as f:
+            return self.store(f, path)
+
+    def add_ref(self, path, sha: str, size: int):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO refs (path, sha256, size) VALUES (?, ?, ?)",
+                (os.path.abspath(path), sha, size),
+            )
+
+    def sha_of(self, path) -> str:
+        """The sha256 of a file: looked up if the file is a known reference of the right size, otherwise hashed."""
+        rows = self.query(
+            "SELECT sha256, size FROM refs WHERE path = ?", (os.path.abspath(path),)
+        )
+        if rows and rows[0][1] == os.path.getsize(path):
+            return rows[0][0]
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            while chunk := f.read(1024 * 1024):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def get_derived(self, sha: str, kind: str):
+        """The result of a stage (kind) for a blob, eg. the converted files or the extracted NGOs. None if not done."""
+        rows = self.query(
+            "SELECT value FROM derived WHERE sha256 = ? AND kind = ?", (sha, kind)
+        )
+        return json.loads(rows[0][0]) if rows else None
+
+    def set_derived(self, sha: str, kind: str, value):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO derived (sha256, kind, value) VALUES (?, ?, ?)",
+                (sha, kind, json.dumps(value)),
+            )
+
+    def query(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def summary(self) -> dict:
+        """The number of references and blobs, and the bytes saved by storing identical files once."""
+        n_refs, ref_bytes = self.query("SELECT COUNT(*), SUM(size) FROM refs")[0]
+        n_blobs, blob_bytes = self.query(
+            "SELECT COUNT(*), SUM(size) FROM (SELECT DISTINCT sha256, size FROM refs)"
+        )[0]
+        return {
+            "references": n_refs,
+            "blobs": n_blobs,
+            "bytes_saved": (ref_bytes or 0) - (blob_bytes or 0),
+        }
@@ -0,0 +1,188 @@
+import datetime
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterable, Optional
+
+# The stages a hearing passes through, in order
+STAGES = (
+    "listed",
+    "meta_fetched",
+    "zip_downloaded",
+    "unzipped",
+    "converted",
+    "extracted",
+)
+
+
+class HearingCatalog:
+    def __init__(self, db_path):
+        """
+        A SQLite catalog with one row per hearing and a status column per stage.
+        Every stage has a flag, a timestamp and a byte count (`{stage}`, `{stage}_at`, `{stage}_bytes`).
+        The database runs in WAL mode, so the scraper, FileConverter and NGOExtractor can use it at the same time.
+
+        db_path: the path of the database file. Created if it does not exist.
+        """
+        self.db_path = Path(db_path)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(
+            self.db_path, timeout=60, check_same_thread=False, isolation_level=None
+        )
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.create_tables()
+
+    def create_tables(self):
+        stage_columns = ",\n".join(
+            f"{stage} INTEGER NOT NULL DEFAULT 0, {stage}_at TEXT, {stage}_bytes INTEGER"
+            for stage in STAGES
+        )
+        with self.lock:
+            self.conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS hearings (
+                    id INTEGER PRIMARY KEY,
+                    publication_date TEXT,
+                    data TEXT,
+                    {stage_columns}
+                )
+                """
+            )
+            for stage in STAGES:
+                self.conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_hearings_{stage} ON hearings ({stage})"
+                )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT)"
+            )
+
+    def close(self):
+        self.conn.close()
+
+    def query(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def now(self):
+        return datetime.datetime.now().isoformat(timespec="seconds")
+
+    def add_hearings(self, hearings: Iterable[dict]):
+        """
+        Insert or update hearings from the search results of hoeringsportalen.dk and mark them as listed.
+        Stage columns of already known hearings are kept.
+        """
+        now = self.now()
+        rows = [
+            (h["Id"], h.get("PublicationDate"), json.dumps(h), now) for h in hearings
+        ]
+        with self.lock:
+            self.conn.execute("BEGIN")
+            self.conn.executemany(
+                """
+                INSERT INTO hearings (id, publication_date, data, listed, listed_at)
+                VALUES (?, ?, ?, 1, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    publication_date = excluded.publication_date,
+                    data = excluded.data,
+                    listed = 1,
+                    listed_at = excluded.listed_at
+                """,
+                rows,
+            )
+            self.conn.execute("COMMIT")
+
+    def subpages(self) -> list[dict]:
+        """All listed hearings as returned by the search, newest first."""
+        rows = self.query(
+            "SELECT data FROM hearings WHERE data IS NOT NULL ORDER BY id DESC"
+        )
+        return [json.loads(row["data"]) for row in rows]
+
+    def ids(self) -> set[int]:
+        return {row[0] for row in self.query("SELECT id FROM hearings")}
+
+    def done(self, stage: str) -> set[int]:
+        """The hearing-ids that have completed a stage."""
+        self.check_stage(stage)
+        rows = self.query(f"SELECT id FROM hearings WHERE {stage} = 1")
+        return {row[0] for row in rows}
+
+    def pending(self, stage: str, after: Optional[str] = None) -> list[int]:
+        """
+        The hearing-ids that have not completed a stage.
+        after: only include hearings that have completed this (earlier) stage.
+        """
+        self.check_stage(stage)
+        query = f"SELECT id FROM hearings WHERE {stage} = 0"
+        if after:
+            self.check_stage(after)
+            query += f" AND {after} = 1"
+        return [row[0] for row in self.query(query + " ORDER BY id DESC")]
+
+    def mark(self, _id, stage: str, n_bytes: Optional[int] = None, done=True):
+        """Set the status of a stage for a hearing, creating the row if needed."""
+        self.check_stage(stage)
+        with self.lock:
+            self.conn.execute(
+                f"""
+                INSERT INTO hearings (id, {stage}, {stage}_at, {stage}_bytes)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    {stage} = excluded.{stage},
+                    {stage}_at = excluded.{stage}_at,
+                    {stage}_bytes = excluded.{stage}_bytes
+                """,
+                (int(_id), int(done), self.now(), n_bytes),
+            )
+
+    def status(self, _id) -> Optional[dict]:
+        rows = self.query("SELECT * FROM hearings WHERE id = ?", (int(_id),))
+        return dict(rows[0]) if rows else None
+
+    def summary(self) -> dict:
+        """The number of hearings that have completed each stage."""
+        row = self.query(
+            "SELECT COUNT(*), " + ", ".join(f"SUM({stage})" for stage in STAGES)
+            + " FROM hearings"
+        )[0]
+        return {"total": row[0], **{s: row[i + 1] or 0 for i, s in enumerate(STAGES)}}
+
+    def get_state(self, key, default=None):
+        rows = self.query("SELECT value FROM state WHERE key = ?", (key,))
+        return json.loads(rows[0][0]) if rows else default
+
+    def set_state(self, key, value):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)",
+                (key, json.dumps(value)),
+            )
+
+    def import_folders(self, mainpath):
+        """
+        Mark the stages of hearings already on disk, from folders made by an earlier run without the catalog.
+        Walks mainpath once.
+        """
+        mainpath = Path(mainpath)
+        count = 0
+        for folder in os.listdir(mainpath):
+            if not folder.isnumeric():
+                continue
+            files = os.listdir(mainpath / folder)
+            if f"{folder}_meta.json" in files:
+                self.mark(folder, "meta_fetched")
+            if f"{folder}.zip" in files:
+                n_bytes = os.path.getsize(mainpath / folder / f"{folder}.zip")
+                self.mark(folder, "zip_downloaded", n_bytes)
+            if len(files) > 2:
+                self.mark(folder, "unzipped")
+            count += 1
+        print(f"Imported {count} hearing folders into the catalog")
+
+    def check_stage(self, stage):
+        if stage not in STAGES:
+            raise ValueError(f"Unknown stage '{stage}'. Must be one of {STAGES}")
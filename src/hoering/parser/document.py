@@ -0,0 +1,64 @@
+import mmap
+
+import fitz
+import pdfplumber
+
+from hoering.parser import spans
+
+
+class DocumentContext:
+    def __init__(self, path):
+        """
+        A hearing list, read once for every backend. The file is memory-mapped, and the same buffer is handed
+        to PyMuPDF (`doc`) and pdfplumber (`plumber`), instead of each of them opening and reading the file.
+        What is derived from a page (its text, span lines and drawings) is cached while the context is open,
+        so the table detector, the text engines and the table extraction do not compute it again.
+
+        camelot only takes a path, so it is given `path`.
+
+        Use as a context manager, or call `close`.
+        """
+        self.path = str(path)
+        self.file = open(path, "rb")
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.buffer)
+        self.doc = fitz.open(stream=self.view, filetype="pdf")
+        self.pdf = None
+        self.cache = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def cached(self, kind: str, number: int, func):
+        key = (kind, number)
+        if key not in self.cache:
+            self.cache[key] = func(self.doc[number])
+        return self.cache[key]
+
+    def text(self, number: int) -> str:
+        return self.cached("text", number, lambda page: page.get_text())
+
+    def lines(self, number: int) -> list[dict]:
+        """The lines of a page for the spans engine of NGOExtractor."""
+        return self.cached("lines", number, spans.page_lines)
+
+    def drawings(self, number: int) -> list[dict]:
+        return self.cached("drawings", number, lambda page: page.get_drawings())
+
+    def plumber(self):
+        """The document opened with pdfplumber, on the same buffer."""
+        if self.pdf is None:
+            self.pdf = pdfplumber.open(self.buffer)
+        return self.pdf
+
+    def close(self):
+        if self.pdf is not None:
+            self.pdf.close()
+        self.doc.close()
+        self.cache.clear()
+        self.view.release()
+        self.buffer.close()
+        self.file.close()
@@ -1,11 +1,17 @@
 import glob
+import hashlib
 import json
 import logging
+import logging.handlers
+import multiprocessing
 import os
 import re
 import time
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
 from enum import StrEnum
+from pathlib import Path
 
 import pandas as pd
 from bs4 import BeautifulSoup as bs
@@ -25,6 +31,13 @@ import pdfplumber  # Best at extracting the actual contents of the table
 # OCR on PDFs
 import ocrmypdf
 
+from hoering.blobstore import BlobStore
+from hoering.catalog import HearingCatalog
+from hoering.parser import spans, tables
+from hoering.parser.document import DocumentContext
+from hoering.scraper.metadata import load_metadata
+from hoering.zipfs import HearingArchives
+
 
 def create_logger():
     logger = logging.getLogger(__name__)
@@ -34,9 +47,11 @@ def create_logger():
         fmt="%(asctime)s %(levelname)s: %(message)s", datefmt="%Y-%m-%d - %H:%M:%S"
     )
 
+    # Opened on the first record, so worker processes importing this module do not truncate the log
     fh = logging.FileHandler(
         filename="extractor.log",
         mode="w",
+        delay=True,
     )
     fh.setFormatter(formatter)
     fh.setLevel(logging.INFO)
@@ -52,18 +67,69 @@ def create_logger():
 
 logger = create_logger()
 
+# The NGOExtractor of a worker process of `NGOExtractor.extract`
+worker_extractor = None
+
+
+@contextmanager
+def worker_logging():
+    """
+    Write the log records of worker processes with the handlers of the logger in this process, so the workers
+    do not each open extractor.log. Gives the arguments of `init_worker_logging`.
+    """
+    with multiprocessing.Manager() as manager:
+        log_queue = manager.Queue()
+        listener = logging.handlers.QueueListener(
+            log_queue, *logger.handlers, respect_handler_level=True
+        )
+        listener.start()
+        try:
+            yield log_queue, min(x.level for x in logger.handlers)
+        finally:
+            listener.stop()
+
+
+def init_worker_logging(log_queue, log_level):
+    """Send the log records of a worker process to the main process (`worker_logging`)."""
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    handler = logging.handlers.QueueHandler(log_queue)
+    # Records no handler in the main process would write are not sent at all
+    handler.setLevel(log_level)
+    logger.addHandler(handler)
+
+
+def init_worker(log_queue, log_level, options):
+    """Set up a worker process of `NGOExtractor.extract`."""
+    global worker_extractor
+    worker_extractor = NGOExtractor(**options)
+    init_worker_logging(log_queue, log_level)
 
-def get_list_files(mainpath, pattern, hearing_ids=False, greedy=False):
-    """Returns a list of files for hearings based on a pattern matching file names"""
+
+def extract_file_worker(file):
+    return worker_extractor.extract_file(file)
+
+
+def get_list_files(mainpath, pattern, hearing_ids=False, greedy=False, catalog=None, archives=None):
+    """Returns a list of files for hearings based on a pattern matching file names
+
+    If a HearingCatalog is given, only the unzipped hearings in the catalog are searched, instead of listing mainpath.
+    If a HearingArchives is given, the files are found inside the zip file of each hearing, and only the
+    matching files are written to its scratch folder. The returned paths point there.
+    """
     høringsfiler = {}
 
-    if hearing_ids:
-        folders = [
-            folder for folder in os.listdir(mainpath) if int(folder) in hearing_ids
-        ]
+    if archives:
+        folders = archives.folders()
+    elif catalog:
+        folders = [str(x) for x in catalog.done("unzipped")]
     else:
         folders = os.listdir(mainpath)
 
+    if hearing_ids:
+        hearing_ids = set(hearing_ids)
+        folders = [folder for folder in folders if int(folder) in hearing_ids]
+
     if isinstance(pattern, str):
         desc = f"Extracting PDF-files containing '{pattern}'"
     elif isinstance(pattern, list):
@@ -75,7 +141,10 @@ def get_list_files(mainpath, pattern, hearing_ids=False, greedy=False):
         raise TypeError("pattern must be either str or list")
 
     for folder in tqdm(folders, desc=print(desc), smoothing=0):
-        folderfiles = glob.glob(f"{mainpath}/{folder}/*.pdf")
+        if archives:
+            folderfiles = [f"{mainpath}/{folder}/{file}" for file in archives.listdir(folder, "*.pdf")]
+        else:
+            folderfiles = glob.glob(f"{mainpath}/{folder}/*.pdf")
 
         if type(pattern) == str:
             høringsfiler[folder] = [file for file in folderfiles if pattern in file]
@@ -97,21 +166,70 @@ def get_list_files(mainpath, pattern, hearing_ids=False, greedy=False):
 
     files = [høringsfiler[x] for x in høringsfiler if len(høringsfiler[x]) > 0]
     files = [x for y in files for x in y]
+    if archives:
+        files = [
+            str(archives.materialize(Path(file).parent.name, Path(file).name))
+            for file in files
+        ]
     files = [file.replace("\\", "/") for file in files]
     print(f"{len(files)} files found")
     return files
 
 
 class NGOExtractor:
-    def __init__(self):
+    def __init__(
+        self,
+        catalog: HearingCatalog = None,
+        store: BlobStore = None,
+        engine="html",
+        row_tolerance: float = 0.0,
+        table_detector="vector",
+    ):
         """
         Provide the list of files to extract NGOs from.
 
         Initialized with:
             - an empty dict `ngos_list´ to be populated,
+            - an optional HearingCatalog in which extracted hearings are marked
+            - an optional BlobStore keeping the NGOs extracted per file content, so identical lists are extracted once
+            - the engine reading the text of the pages: "html" parses the html of `page.get_text("html")`,
+              "spans" reads the span data of `page.get_text("dict")` directly and gives the same NGOs, faster
+            - the tolerance (in pt) within which the top margins of text on the same row may differ.
+              With 0, text is only joined into a row if its top margin is the same when rounded to 0.1pt
+            - how to decide whether a list is a table: "vector" reads the ruling lines of the first page and only
+              runs camelot if they are ambiguous, "camelot" always runs camelot (which rasterizes the page)
         """
+        if table_detector not in ("vector", "camelot"):
+            raise ValueError(f"Unknown table detector: {table_detector}")
+        if engine not in ("html", "spans"):
+            raise ValueError(f"Unknown engine: {engine}")
         # A dictionary of hearing and NGOs. Hearing-id as key and list of NGOs as value
         self.ngos_list = {}
+        self.catalog = catalog
+        self.store = store
+        self.engine = engine
+        self.row_tolerance = row_tolerance
+        self.table_detector = table_detector
+        # The lines of the last page read by the spans engine, as (document, page number, lines)
+        self.page_cache = None
+        # The DocumentContext of the file extract_file is reading
+        self.context = None
+
+    def worker_options(self) -> dict:
+        """The settings a worker process builds its own NGOExtractor from (the catalog and store are not picklable)."""
+        return {
+            "engine": self.engine,
+            "row_tolerance": self.row_tolerance,
+            "table_detector": self.table_detector,
+        }
+
+    def derived_kind(self) -> str:
+        """
+        The kind the NGOs of a file are kept under in the BlobStore. Includes a hash of `worker_options`,
+        so NGOs extracted with other settings are not reused.
+        """
+        options = json.dumps(self.worker_options(), sort_keys=True)
+        return f"ngos:{hashlib.sha256(options.encode()).hexdigest()[:16]}"
 
     def mean_commas(self, ngos):
         """Counts the mean number of commas"""
@@ -164,6 +282,8 @@ class NGOExtractor:
 
     def extract_page(self, page, most_common_style):
         """Extract a list of NGOs from a PDF-page object"""
+        if self.engine == "spans":
+            return self.extract_page_spans(page, most_common_style)
 
         # Create a soup instance of the html-representation of the pdf
         soup = bs(page.get_text("html"), features="lxml")
@@ -226,27 +346,133 @@ class NGOExtractor:
             )
             logger.debug(f"Number of rows based on top style: {len(top_margins)}")
 
-            for margin in top_margins:
-                ngos.append(
-                    "".join(
-                        [
-                            x.text
-                            for x in elems
-                            if margin in x["style"]
-                            and x.span["style"] == most_common_style
-                            and not x.span.parent.name == "b"
-                        ]
-                    )
-                )
+            # The text of the elements in the most common style, with their top margin
+            rows = [
+                (re.findall("top:[\d\.]*pt", x["style"]), x.text)
+                for x in elems
+                if x.span is not None
+                and x.span["style"] == most_common_style
+                and not x.span.parent.name == "b"
+            ]
+            ngos = self.assemble_rows(
+                [(top[0], text) for top, text in rows if top], top_margins
+            )
         else:
             logger.warn("No recognizable text found in HTML")
 
         return ngos
 
+    def page_lines(self, page):
+        """The lines of a page for the spans engine. The first page is read once for its style and its NGOs."""
+        if self.context is not None and page.parent is self.context.doc:
+            return self.context.lines(page.number)
+        if (
+            self.page_cache
+            and self.page_cache[0] is page.parent
+            and self.page_cache[1] == page.number
+        ):
+            return self.page_cache[2]
+        lines = spans.page_lines(page)
+        self.page_cache = (page.parent, page.number, lines)
+        return lines
+
+    def extract_page_spans(self, page, most_common_style):
+        """
+        `extract_page` on the span data of a page instead of its html. The lines and spans are the <p> and <span>
+        elements of the html, with the same top and left margins and styles, so the same NGOs are found.
+        """
+        lines = self.page_lines(page)
+
+        # An empty list to store the NGOs in
+        ngos = []
+
+        if not any(span["text"].strip() for line in lines for span in line["spans"]):
+            logger.warn("No recognizable text found in HTML")
+            return ngos
+
+        # Delete symbols
+        lines = spans.remove_symbols(lines)
+
+        # Extract the most common left margin
+        c = Counter(line["left"] for line in lines)
+        left_margin = float(c.most_common()[0][0])
+
+        logger.debug(f"Most common left margin: {left_margin}")
+
+        left_margin_elems = []
+        for line in lines:
+            if left_margin - 1 <= (elem_left_margin := float(line["left"])) <= left_margin + 1:
+                left_margin_elems.append(line)
+            logger.debug(f"Element left margin: {elem_left_margin}")
+
+        logger.debug(f"Number of rows based on left margin: {len(left_margin_elems)}")
+
+        # The html only holds non-negative top margins in the form the regex of `extract_page` matches
+        top_margins = [x["top"] for x in left_margin_elems if not x["top"].startswith("-")]
+        logger.debug(f"Number of rows based on top style: {len(top_margins)}")
+
+        rows = [
+            (x["top"], spans.line_text(x))
+            for x in lines
+            if x["spans"]
+            and x["spans"][0]["style"] == most_common_style
+            and not x["spans"][0]["wrapper"] == "b"
+        ]
+        return self.assemble_rows(rows, top_margins)
+
+    def assemble_rows(self, texts, top_margins):
+        """
+        Join the texts on the row of each top margin, in one pass over the texts.
+        texts: (top margin, text) in the order of the page.
+        top_margins: the top margins of the rows, eg. of the elements at the most common left margin.
+
+        With a row_tolerance, top margins within the tolerance of each other make one row,
+        and a row is only returned once, however many of top_margins fall in it.
+        """
+        if self.row_tolerance:
+            row_of = self.row_buckets([top for top, _ in texts] + list(top_margins))
+            margins = []
+            for margin in top_margins:
+                if row_of[margin] not in margins:
+                    margins.append(row_of[margin])
+            top_margins = margins
+        else:
+            row_of = None
+
+        rows = {}
+        for top, text in texts:
+            rows.setdefault(row_of[top] if row_of else top, []).append(text)
+        return ["".join(rows.get(margin, [])) for margin in top_margins]
+
+    def row_buckets(self, tops):
+        """
+        Map top margins (as in the html, eg. "top:72.0pt") to rows: margins are sorted, and a row runs
+        until the gap to the next margin is larger than row_tolerance.
+        """
+        values = sorted({(float(re.findall(r"-?[\d\.]+", x)[0]), x) for x in tops})
+        row_of = {}
+        row = None
+        previous = None
+        for value, top in values:
+            if previous is None or value - previous > self.row_tolerance:
+                row = top
+            row_of[top] = row
+            previous = value
+        return row_of
+
     def get_most_common_style(self, first_page):
         """
         Get the most common used style for the first page
         """
+        if self.engine == "spans":
+            styles = [
+                span["style"]
+                for line in self.page_lines(first_page)
+                for span in line["spans"]
+                if spans.is_style_candidate(span)
+            ]
+            return Counter(styles).most_common()[0][0] if styles else None
+
         soup = bs(first_page.get_text("html"), features="lxml")
 
         # Extract the most common style:
@@ -288,15 +514,21 @@ class NGOExtractor:
             logger.debug("could not find most common style")
         return ngos
 
-    def table_extract(self, file):
-        """Extract a list of NGOs from PDF-tables"""
+    def table_extract(self, file, pages=None, pdf=None):
+        """
+        Extract a list of NGOs from PDF-tables
+        pages: the numbers of the pages to extract tables from. Defaults to every page.
+        pdf: the file already opened with pdfplumber (eg. `DocumentContext.plumber()`). Left open.
+        """
 
-        tables = []
-        with pdfplumber.open(file) as pdf:
-            for page in pdf.pages:
-                tables += page.extract_tables()
+        found_tables = []
+        if pdf is None:
+            with pdfplumber.open(file) as pdf:
+                return self.table_extract(file, pages, pdf)
+        for page in pdf.pages if pages is None else [pdf.pages[i] for i in pages]:
+            found_tables += page.extract_tables()
 
-        ngos = [str(ngo[0]).replace("\n", "") for y in tables for ngo in y]
+        ngos = [str(ngo[0]).replace("\n", "") for y in found_tables for ngo in y]
 
         return ngos
 
@@ -410,67 +642,151 @@ class NGOExtractor:
 
         return file
 
-    def extract(self, files):
-        # Changing the file-type to list in order to function properly in the loop and storing them in self
-        if isinstance(files, list):
-            pass
-        else:
-            files = [files]
-
-        for file in tqdm(
-            files, smoothing=0, desc="Extracting NGOs from hearings lists"
-        ):
-            # Opening the PDF
-            with fitz.open(file) as doc:
-                hearing = file.split("/")[-2]
-
-                # 1 - Check if the file has any regocnized text on the first page
-
-                if len(doc[0].get_text()) < 10:
-                    # If the PDF-file is empty skip. [Currently OCR does not yield a good enough result]
-
-                    self.ngos_list[hearing] = []
-                    logger.warn(f"{hearing} - No text found on first page for")
-
-                    continue
-
-                #                 try:
-                #                     file = self.ocr(file, doc)
-                #                 except ImportError:
-                #                     print('ImportError')
-                #                     hearing = file.split('/')[-2]
-                #                     self.ngos_list[hearing] = []
-
-                #                     continue
+    def extract_file(self, file):
+        """
+        Extract the NGOs of one hearing list. Opens its own DocumentContext, so it can run in a worker process:
+        the file is mapped once and shared by PyMuPDF and pdfplumber, and the pages are read once.
+        Returns (hearing, ngos). ngos is None if the file has no text or Ghostscript fails on it.
+        """
+        hearing = file.split("/")[-2]
+
+        # Opening the PDF
+        with DocumentContext(file) as ctx:
+            doc = ctx.doc
+            self.context = ctx
+            # 1 - Check if the file has any regocnized text on the first page
+
+            if len(ctx.text(0)) < 10:
+                # If the PDF-file is empty skip. [Currently OCR does not yield a good enough result]
+                logger.warn(f"{hearing} - No text found on first page for")
+                return hearing, None
+
+            #                 try:
+            #                     file = self.ocr(file, doc)
+            #                 except ImportError:
+            #                     print('ImportError')
+            #                     hearing = file.split('/')[-2]
+            #                     self.ngos_list[hearing] = []
+
+            #                     continue
+
+            # 2 - Method 1 - Table Extraction
+            verdict = tables.AMBIGUOUS
+            if self.table_detector == "vector":
+                started = time.perf_counter()
+                verdict = tables.classify_page(doc[0], line_scale=25, drawings=ctx.drawings(0))
+                logger.info(
+                    f"{hearing} - Table detection from rulings: {verdict} "
+                    f"({(time.perf_counter() - started) * 1000:.0f} ms)"
+                )
 
-                # 2 - Method 1 - Table Extraction
+            if verdict == tables.AMBIGUOUS:
                 try:
-                    table = camelot.read_pdf(file, line_scale=25, resolution=500)
+                    # camelot (and the Ghostscript it runs) only reads from a path
+                    table = camelot.read_pdf(ctx.path, line_scale=25, resolution=500)
                 except GhostscriptError as e:
-                    self.ngos_list[hearing] = []
                     logger.warn(f"{hearing} - GhostscriptError: {e}")
-                    continue
+                    return hearing, None
+            else:
+                table = verdict == tables.TABLE
 
-                if table:
-                    ngos = self.table_extract(file)
-                    logger.info(f"{hearing} - Extracted list from table")
+            if table:
+                # pdfplumber only reads the pages with ruling lines, the others cannot hold its tables
+                ngos = self.table_extract(
+                    file, tables.table_pages(doc, ctx.drawings), ctx.plumber()
+                )
+                logger.info(f"{hearing} - Extracted list from table")
 
-                # 3 - Method 2 - from text
-                else:
-                    ngos = self.extract_document(doc)
-                    logger.info(f"{hearing} - Extracted list from text")
+            # 3 - Method 2 - from text
+            else:
+                ngos = self.extract_document(doc)
+                logger.info(f"{hearing} - Extracted list from text")
 
-                ngos_cleaned = self.ngo_cleaner(ngos)
-                logger.info(
-                    f"Finished cleaning NGO list from document ({len(ngos)} --> {len(ngos_cleaned)})"
-                )
+        ngos_cleaned = self.ngo_cleaner(ngos)
+        logger.info(
+            f"Finished cleaning NGO list from document ({len(ngos)} --> {len(ngos_cleaned)})"
+        )
+        return hearing, ngos_cleaned
 
-                # Adding the list of NGO's to the hearing-id
-                if hearing in self.ngos_list:
-                    self.ngos_list[hearing] += ngos_cleaned
+    def merge(self, hearing, ngos):
+        """Add the NGOs of a list to its hearing. A file without a list (ngos None) empties the hearing."""
+        if ngos is None:
+            self.ngos_list[hearing] = []
+            return
 
-                else:
-                    self.ngos_list[hearing] = ngos_cleaned
+        # Adding the list of NGO's to the hearing-id
+        if hearing in self.ngos_list:
+            self.ngos_list[hearing] += ngos
+        else:
+            self.ngos_list[hearing] = ngos
+
+        if self.catalog:
+            self.catalog.mark(hearing, "extracted", len(self.ngos_list[hearing]))
+
+    def extract(self, files, workers=None):
+        """
+        Extract the NGOs of hearing lists into `ngos_list`.
+        workers: the number of worker processes. If None or 1, the files are extracted in this process.
+            Results are merged in the order of the files either way, so `ngos_list` does not depend on workers.
+        """
+        # Changing the file-type to list in order to function properly in the loop and storing them in self
+        if isinstance(files, list):
+            pass
+        else:
+            files = [files]
+
+        # Lists extracted before from identical files are reused, the rest is extracted
+        results = {}
+        shas = {}
+        kind = self.derived_kind()
+        for i, file in enumerate(files):
+            sha = self.store.sha_of(file) if self.store else None
+            cached_ngos = self.store.get_derived(sha, kind) if sha else None
+            if cached_ngos is not None:
+                results[i] = (file.split("/")[-2], cached_ngos)
+                logger.info(f"{file.split('/')[-2]} - Reused list extracted from identical file")
+            shas[i] = sha
+        todo = [i for i in range(len(files)) if i not in results]
+
+        next_merge = 0
+
+        def merge_ready():
+            # Merge every result up to the first file still being extracted
+            nonlocal next_merge
+            while next_merge in results:
+                self.merge(*results.pop(next_merge))
+                next_merge += 1
+
+        def done(i, result):
+            hearing, ngos = result
+            if shas[i] and ngos is not None:
+                self.store.set_derived(shas[i], kind, ngos)
+            results[i] = result
+            merge_ready()
+
+        with tqdm(
+            total=len(files), smoothing=0, desc="Extracting NGOs from hearings lists"
+        ) as pbar:
+            pbar.update(len(files) - len(todo))
+            merge_ready()
+
+            if not workers or workers == 1:
+                for i in todo:
+                    done(i, self.extract_file(files[i]))
+                    pbar.update(1)
+            else:
+                with worker_logging() as log_args:
+                    with ProcessPoolExecutor(
+                        max_workers=workers,
+                        initializer=init_worker,
+                        initargs=(*log_args, self.worker_options()),
+                    ) as pool:
+                        futures = {
+                            pool.submit(extract_file_worker, files[i]): i for i in todo
+                        }
+                        for future in as_completed(futures):
+                            done(futures[future], future.result())
+                            pbar.update(1)
 
     def save_file(self, filename):
         with open(filename, "w") as f:
@@ -495,12 +811,54 @@ def parse_args():
         help="Run all the commands in chronological order",
     )
     parser.add_argument("--type", type=HearingType, default="all", help="Hearing type")
+    parser.add_argument(
+        "--catalog",
+        action="store_true",
+        default=False,
+        help="Use data-dir/catalog.sqlite to find unzipped hearings and record extracted ones",
+    )
+    parser.add_argument(
+        "--blob-store",
+        action="store_true",
+        default=False,
+        help="Reuse NGOs extracted from identical files, kept in the blob store in data-dir/blobs",
+    )
+    parser.add_argument(
+        "--from-zip",
+        action="store_true",
+        default=False,
+        help="Read the hearing lists directly from the zip files. Only the lists are written, to data-dir/scratch",
+    )
     parser.add_argument(
         "--extract",
         action="store_true",
         default=False,
         help="Extract entities and save them in a .json file",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes extracting NGOs. If not set, lists are extracted one at a time",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["html", "spans"],
+        default="html",
+        help="Read the text of the pages from their html, or directly from the span data of PyMuPDF (faster)",
+    )
+    parser.add_argument(
+        "--row-tolerance",
+        type=float,
+        default=0.0,
+        help="Join text into one row if the top margins differ by at most this many pt (for misaligned baselines)",
+    )
+    parser.add_argument(
+        "--table-detector",
+        choices=["vector", "camelot"],
+        default="vector",
+        help="Detect tables from the ruling lines of the PDF (camelot only for ambiguous pages), or always with camelot",
+    )
     parser.add_argument(
         "--count", action="store_true", default=False, help="Count entities"
     )
@@ -511,7 +869,11 @@ def parse_args():
 if __name__ == "__main__":
     args = parse_args()
 
-    metadata = pd.read_csv(args.data_dir / "metadata.csv", index_col=0)
+    # The Parquet dataset from scrape.py --extract-meta, or the metadata.csv of earlier runs
+    if (args.data_dir / "metadata.parquet").exists():
+        metadata = load_metadata(args.data_dir / "metadata.parquet")
+    else:
+        metadata = load_metadata(args.data_dir / "metadata.csv")
     if args.type == HearingType.bill:
         hearing_ids = metadata[metadata["Høringstype"] == "Lovforslag"][
             "Høringsnr"
@@ -523,16 +885,35 @@ if __name__ == "__main__":
     else:
         raise ValueError("Invalid hearing type")
 
+    catalog = HearingCatalog(args.data_dir / "catalog.sqlite") if args.catalog else None
+
+    archives = (
+        HearingArchives(args.data_dir / "hearings", args.data_dir / "scratch")
+        if args.from_zip
+        else None
+    )
+
     if args.all or args.extract:
         files = get_list_files(
-            args.data_dir / "hearings", "liste", hearing_ids=hearing_ids
+            args.data_dir / "hearings",
+            "liste",
+            hearing_ids=hearing_ids,
+            catalog=catalog,
+            archives=archives,
         )
 
         høringslistefiler = [file for file in files if "liste" in file]
         høringssvarfiler = [file for file in files if "svar" in file]
 
-        ngo_extractor = NGOExtractor()
-        ngo_extractor.extract(høringslistefiler)
+        store = BlobStore(args.data_dir / "blobs") if args.blob_store else None
+        ngo_extractor = NGOExtractor(
+            catalog=catalog,
+            store=store,
+            engine=args.engine,
+            row_tolerance=args.row_tolerance,
+            table_detector=args.table_detector,
+        )
+        ngo_extractor.extract(høringslistefiler, workers=args.workers)
         filepath = args.data_dir / f"{filename}.json"
         ngo_extractor.save_file(filepath)
         print(f"Saved file to {filepath}")
@@ -20,8 +20,12 @@ import threading
 import logging
 
 from hoering.parser.file_convert.resources.msg_oft_conversion import convert_msg_input
-from hoering.parser.file_convert.resources.remove_files_rules import match_and_remove_files
+from hoering.parser.file_convert.resources.remove_files_rules import match_and_remove_files, match_rules, get_matching_members, process_log_to_csv
 from hoering.models.vl_openai import ImageClassifier
+from hoering.blobstore import BlobStore
+from hoering.catalog import HearingCatalog
+from hoering.scraper.unzip import get_valid_filename
+from hoering.zipfs import HearingArchives
 
 #Todo Todo Todo:
 #1 - Update processbar for "Processing Files"
@@ -29,13 +33,23 @@ from hoering.models.vl_openai import ImageClassifier
 
 
 class FileConverter:
-    def __init__(self, input_dir, output_dir, output_format, patterns, make_copy=False, copy_sample_size: Optional[int] = None):
+    def __init__(self, input_dir, output_dir, output_format, patterns, make_copy=False, copy_sample_size: Optional[int] = None, catalog: Optional[HearingCatalog] = None, from_zip=False, scratch_dir=None, store: Optional[BlobStore] = None):
+        """
+        from_zip: read the files directly from the {id}.zip file of each hearing folder instead of the unzipped files.
+            Only the files being converted are written to scratch_dir, and nothing is copied or deleted in input_dir.
+        scratch_dir: a local folder for the files read from the zip files, and for the copies of the hearing folders
+            converted by `run_case_folder`. Defaults to a folder in the output folder.
+        store: a BlobStore. If given, the outputs of a conversion are stored by the sha256 of the input,
+            and files with the same bytes as an already converted file are linked instead of converted again.
+        """
         self.input_dir = Path(input_dir)
         self.output_dir = Path(output_dir)
         self.output_format = output_format
         self.patterns = patterns.split(",") if patterns else []
         self.file_extension_summary = {}
         self.keep_thinking = True
+        self.catalog = catalog
+        self.store = store
 
         # Create output folder
         self.output_format_dir = self.create_output_folder()
@@ -46,8 +60,20 @@ class FileConverter:
         # Validate directories
         self.validate_directories()
 
-        # Optionally make a copy of the input directory
-        if make_copy:
+        self.scratch_dir = Path(scratch_dir) if scratch_dir else self.output_format_dir / "scratch"
+
+        # Members of the zip files already converted (only used with from_zip)
+        self.archives = None
+        self.converted_members = set()
+        if from_zip:
+            self.archives = HearingArchives(
+                self.input_dir,
+                self.scratch_dir,
+                rename=lambda name: self.fix_filename(get_valid_filename(name)),
+            )
+
+        # Optionally make a copy of the input directory. Not needed when reading from the zip files, which are never changed.
+        if make_copy and not from_zip:
             self.input_dir = self.make_copy_input_dir(self.input_dir, sample_size=copy_sample_size)
             print(f"Copy of input directory created at {self.input_dir}")
 
@@ -103,6 +129,12 @@ class FileConverter:
         """Counts files in a directory (including nested ones) and groups them by extension.
         Can filter based on filename substrings or count all files if pattern='all'."""
 
+        if self.archives:
+            file_counts = self.archives.count_by_extension(pattern if isinstance(pattern, list) else None)
+            self.logger.info(f"Total files counted: {sum(file_counts.values())} in the zip files of {self.input_dir}")
+            self.logger.info(f"File counts by extension: {file_counts}")
+            return file_counts
+
         try:
             if isinstance(pattern, list):
                 pattern_string = "|".join(pattern)
@@ -151,20 +183,109 @@ class FileConverter:
             outputted_files = []
             input_filepaths = []
 
+            # Hearings already converted in an earlier run
+            converted = self.catalog.done("converted") if self.catalog else set()
+
             with tqdm(total=total_files_to_parse, desc="Processing Files", unit="file", dynamic_ncols=True, mininterval=0.5) as pbar:
+                if self.archives:
+                    for folder_name in self.archives.folders():
+                        if int(folder_name) in converted:
+                            continue
+                        output_case_folder = self.output_format_dir / folder_name
+                        n_converted = 0
+                        for file in self.archives.listdir(folder_name):
+                            if not any(pattern.lower() in file.lower() for pattern in self.patterns):
+                                continue
+                            # Only the files to convert are written to disk
+                            input_path = self.archives.materialize(folder_name, file)
+                            file_output, input_filepath_to_be_removed = self.process_file(Path(file), input_path.parent, output_case_folder, pbar)
+                            self.converted_members.add((folder_name, file))
+                            if isinstance(file_output, list) and isinstance(input_filepath_to_be_removed, Path):
+                                outputted_files.extend(file_output)
+                                input_filepaths.append(input_filepath_to_be_removed)
+                                n_converted += 1
+
+                        if self.catalog:
+                            self.catalog.mark(folder_name, "converted", n_converted)
+
+                    return outputted_files, input_filepaths
+
                 for root, _, files in os.walk(self.input_dir):
                     folder_name = Path(root).name
-                    output_case_folder = self.output_format_dir / folder_name
+                    if folder_name.isnumeric() and int(folder_name) in converted:
+                        continue
 
-                    for file in files:
-                        file_output, input_filepath_to_be_removed = self.process_file(Path(file), Path(root), output_case_folder, pbar)
-                        if isinstance(file_output, list) and isinstance(input_filepath_to_be_removed, Path):
-                            outputted_files.extend(file_output)
-                            input_filepaths.append(input_filepath_to_be_removed)
-                        else:
-                            continue
+                    folder_outputs, folder_inputs = self.process_case_folder(Path(root), files, pbar)
+                    outputted_files.extend(folder_outputs)
+                    input_filepaths.extend(folder_inputs)
             
             return outputted_files, input_filepaths
+
+    def process_case_folder(self, root: Path, files, pbar=None):
+        """
+        Process the files of a single folder into the output folder of its case.
+        Used by process_directory, and by the pipeline runner one hearing at a time.
+        """
+        folder_name = root.name
+        output_case_folder = self.output_format_dir / folder_name
+
+        outputted_files = []
+        input_filepaths = []
+        for file in files:
+            file_output, input_filepath_to_be_removed = self.process_file(Path(file), root, output_case_folder, pbar)
+            if isinstance(file_output, list) and isinstance(input_filepath_to_be_removed, Path):
+                outputted_files.extend(file_output)
+                input_filepaths.append(input_filepath_to_be_removed)
+
+        if self.catalog and folder_name.isnumeric():
+            self.catalog.mark(folder_name, "converted", len(input_filepaths))
+
+        return outputted_files, input_filepaths
+
+    def case_work_dir(self, folder_name) -> Path:
+        """The copy of a hearing folder `run_case_folder` works on. Holds the remaining files as PDF and PNG afterwards."""
+        return self.scratch_dir / "cases" / str(folder_name) / str(folder_name)
+
+    def run_case_folder(self, folder_name):
+        """
+        The steps of `run` for the folder of a single hearing. Used by the pipeline runner, one hearing at a time.
+
+        The steps delete files, so they work on a copy of the hearing folder in the scratch folder (`case_work_dir`),
+        and the unzipped files in input_dir, and the unzip manifest listing them, stay valid:
+            0 - rename the files
+            1 - remove standard files (logged per hearing in logs/cases)
+            2 - convert the files matching the patterns into output_format_dir, like process_directory
+            3 - convert the remaining files to PDF and PNG, in the copy, for the classifier
+
+        Returns the PDFs of the remaining files.
+        """
+        folder_name = str(folder_name)
+        work_dir = self.case_work_dir(folder_name)
+        # Left over from an interrupted run
+        if work_dir.exists():
+            shutil.rmtree(work_dir)
+        shutil.copytree(
+            self.input_dir / folder_name,
+            work_dir,
+            ignore=shutil.ignore_patterns(f"{folder_name}.zip", "*.part"),
+        )
+
+        # Step 0 - Rename the files
+        for file_path in list(work_dir.iterdir()):
+            if file_path.is_file():
+                self.manual_fix_filename(file_path)
+
+        # Step 1 - Remove files that are not høringssvar based on known file-patterns (and the meta and manifest files)
+        match_and_remove_files(work_dir.parent, self.log_dir / "cases" / folder_name)
+
+        # Step 2 - Parse høringssvar files known to be valid
+        self.process_case_folder(work_dir, sorted(x.name for x in work_dir.iterdir() if x.is_file()))
+
+        # Step 3 - Convert remaining files to pdf, and the pdfs to png
+        file_output_paths, original_file_names = self.transform_unknowns_into_pdfs(work_dir.parent)
+        self.remove_remaining_files(original_file_names)
+        self.pdfs_to_png(file_output_paths, work_dir.parent)
+        return file_output_paths
     
     def process_file(self, file: Path, input_root: Path, output_case_folder, pbar):
         """Process each file."""
@@ -172,22 +293,33 @@ class FileConverter:
         file_name = file.name
         if any(pattern.lower() in file_name.lower() for pattern in self.patterns):
             output_case_folder.mkdir(parents=True, exist_ok=True)
-            converted_output = self.convert_to_format(file, input_root, output_case_folder)
-            if isinstance(converted_output, list):
-                converted_output = [file.name for file in converted_output]
-                file_outputs.extend(converted_output)
-            elif isinstance(converted_output, Path):
-                file_outputs.append(converted_output.name)
-
-            if self.output_format != "pdf":
-                path_to_pdf = Path(output_case_folder) / f"{file.stem}.pdf"
-                if path_to_pdf.exists():
-                    image_files = self.convert_single_pdf_to_png(path_to_pdf, output_case_folder)
-                    file_outputs.extend(image_files)
-                else:
-                    self.logger.error(f"PDF file not found for converting to {self.output_format}: {path_to_pdf}")
-            
-            if len(file_outputs) > 0:
+
+            # Identical bytes converted before are linked from the store
+            sha = self.store.sha_of(Path(input_root) / file) if self.store else None
+            linked_outputs = self.link_converted(sha, file, output_case_folder) if sha else None
+            if linked_outputs is not None:
+                file_outputs.extend(linked_outputs)
+            else:
+                files_before = set(output_case_folder.rglob("*")) if sha else None
+                converted_output = self.convert_to_format(file, input_root, output_case_folder)
+                if isinstance(converted_output, list):
+                    converted_output = [file.name for file in converted_output]
+                    file_outputs.extend(converted_output)
+                elif isinstance(converted_output, Path):
+                    file_outputs.append(converted_output.name)
+
+                if self.output_format != "pdf":
+                    path_to_pdf = Path(output_case_folder) / f"{file.stem}.pdf"
+                    if path_to_pdf.exists():
+                        image_files = self.convert_single_pdf_to_png(path_to_pdf, output_case_folder)
+                        file_outputs.extend(image_files)
+                    else:
+                        self.logger.error(f"PDF file not found for converting to {self.output_format}: {path_to_pdf}")
+
+                if sha:
+                    self.store_converted(sha, file, output_case_folder, files_before)
+
+            if len(file_outputs) > 0 and pbar is not None:
                 no_of_files_converted = len(file_outputs)
                 pbar.update(no_of_files_converted)
 
@@ -199,6 +331,41 @@ class FileConverter:
 
         return file_outputs, input_filepath_to_be_removed
     
+    def link_converted(self, sha: str, file: Path, output_case_folder: Path):
+        """Link the outputs of an earlier conversion of the same bytes into the output folder. None if there is none."""
+        outputs = self.store.get_derived(sha, f"converted:{self.output_format}")
+        if outputs is None:
+            return None
+
+        names = []
+        for rel_path, output_sha in outputs:
+            rel_path = rel_path.replace("{case}", output_case_folder.name).replace("{stem}", file.stem)
+            output_path = output_case_folder / rel_path
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            self.store.link(output_sha, output_path)
+            names.append(output_path.name)
+        self.logger.info(f"Linked {len(names)} converted files for {file} from the blob store")
+        return names
+
+    def store_converted(self, sha: str, file: Path, output_case_folder: Path, files_before: set):
+        """
+        Store the files a conversion added to the output folder, under the sha256 of the input.
+        The case folder name and the file stem are kept as placeholders, so the outputs can be linked for another hearing.
+        Failed conversions (no outputs) are not stored, so they are tried again.
+        """
+        outputs = []
+        for path in sorted(set(output_case_folder.rglob("*")) - files_before):
+            if not path.is_file():
+                continue
+            parts = [
+                "{case}" if part == output_case_folder.name else part.replace(file.stem, "{stem}", 1)
+                for part in path.relative_to(output_case_folder).parts
+            ]
+            outputs.append(["/".join(parts), self.store.store_file(path)])
+
+        if outputs:
+            self.store.set_derived(sha, f"converted:{self.output_format}", outputs)
+
     def remove_parsed_answer_file(self, filepath: Path):
         """Remove the parsed answer file."""
         try:
@@ -233,7 +400,7 @@ class FileConverter:
                 pass  # Not implemented
 
             elif ext in [".msg", ".oft"]:
-                file_output = convert_msg_input(file_name, input_root, output_case_folder, self.output_format, self.patterns)
+                file_output = convert_msg_input(file_name, input_root, output_case_folder, self.output_format, self.patterns, self.store)
                 return file_output
 
             elif ext in [".tif", ".jpg", ".jpeg", ".png"]:
@@ -297,8 +464,11 @@ class FileConverter:
                 return
             
         try:
-            with open(input_path, "w", encoding="utf-8") as f:
+            # Written to a new file and moved in place, so a file hardlinked from the blob store is not changed for other hearings
+            tmp_path = input_path.with_name(f"{input_path.name}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
                 f.write(content)
+            os.replace(tmp_path, input_path)
             self.logger.info(f"Re-encoded {input_path} from {detected_encoding} to UTF-8")
         except Exception as e:
             self.logger.error(f"Failed to re-encode {input_path}: {e}")
@@ -387,16 +557,21 @@ class FileConverter:
             os.rmdir(output_case_folder)
             self.logger.info(f"Removed empty folder: {output_case_folder}")
 
+    def fix_filename(self, file_name: str) -> str:
+        """Fix known corrupted characters in a filename."""
+        file_stem, extension = os.path.splitext(file_name)
+        return f"{file_stem.replace('�', 'oe').lower()}{extension.lower()}"
+
     def manual_fix_filename(self, file_input: Path) -> None:
         """
         Fix known corrupted characters in the filename.
         If changes are made, rename the file on disk.
         """
-        file_stem, extension = file_input.stem, file_input.suffix.lower()
+        file_stem = file_input.stem
         fixed_file_stem = file_stem.replace("�", "oe").lower()
 
         if fixed_file_stem != file_stem:
-            new_file_name = f"{fixed_file_stem}{extension}"
+            new_file_name = self.fix_filename(file_input.name)
             new_file_path = file_input.parent / new_file_name
 
             if file_input.exists():
@@ -408,6 +583,10 @@ class FileConverter:
 
     def rename_all_files(self):
         """Rename all files in the input directory to avoid special characters."""
+        if self.archives:
+            # Members of the zip files are listed under their fixed names
+            return
+
         filename_change_count = 0
         for root, _, files in os.walk(self.input_dir):
             for file in files:
@@ -420,6 +599,13 @@ class FileConverter:
 
     def remove_standard_files(self):
         """Check if the file name contains standard file patterns."""
+        if self.archives:
+            # Nothing is deleted: matching members are left out of the listing of the zip files
+            log_entries, rule_to_filenames = get_matching_members(self.archives)
+            process_log_to_csv(self.log_dir, log_entries, rule_to_filenames)
+            self.archives.set_exclude(lambda name: bool(match_rules(os.path.splitext(name)[0])))
+            return sum(len(files) for files in rule_to_filenames.values())
+
         no_files_deleted = match_and_remove_files(self.input_dir, self.log_dir)
 
         return no_files_deleted
@@ -520,6 +706,9 @@ class FileConverter:
     
     def parse_response_from_vl_classfier(self):
         """Parse høringssvar files using Qwen classification."""
+        if self.archives:
+            self.materialize_remaining_members()
+
         # Count how many files are left in the directory
         total_files_left = self.count_files_by_extension()
         total_files_left_to_parse = sum(total_files_left.values())
@@ -531,22 +720,38 @@ class FileConverter:
         self.remove_remaining_files(original_file_names)
 
         # Transform into PNG
-        for file_path in file_output_paths:
+        self.pdfs_to_png(file_output_paths, self.input_dir)
+
+        return file_output_paths, original_file_names
+
+    def pdfs_to_png(self, file_paths, output_path: Path):
+        """Convert PDFs to PNGs for the classifier, into the folder of their case under output_path."""
+        for file_path in file_paths:
             self.logger.info(f"Converting {file_path} to PNG.")
             if file_path.exists():
-                self.convert_single_pdf_to_png(file_path, self.input_dir, method="both")
+                self.convert_single_pdf_to_png(file_path, output_path, method="both")
                 self.logger.info(f"Converted {file_path} to PNG.")
             else:
                 self.logger.error(f"File not found for conversion: {file_path}")
 
-        return file_output_paths, original_file_names
-
-    def transform_unknowns_into_pdfs(self):
-        """Convert unknown file types to PDF and return their full paths."""
+    def materialize_remaining_members(self):
+        """
+        Write the members of the zip files not yet converted to the scratch folder, and continue from there.
+        The classifier needs every remaining file on disk.
+        """
+        for folder_name in self.archives.folders():
+            for file in self.archives.listdir(folder_name):
+                if (folder_name, file) not in self.converted_members:
+                    self.archives.materialize(folder_name, file)
+        self.input_dir = self.archives.scratch_dir
+        self.archives = None
+
+    def transform_unknowns_into_pdfs(self, input_dir=None):
+        """Convert unknown file types to PDF and return their full paths. input_dir defaults to the input folder."""
         file_output_paths = []
         original_file_names = []
 
-        for root, _, files in os.walk(self.input_dir):
+        for root, _, files in os.walk(input_dir or self.input_dir):
             root_path = Path(root)
             for file in files:
                 file = Path(file)
@@ -700,12 +905,19 @@ def main():
     parser.add_argument("--copy-sample-size", "-sample", type=int, help="Number of subdirectories to sample when copying", default=None)
     parser.add_argument("--format", "-f", choices=["pdf", "png", "jpg"], help="Output format: pdf, png, or jpg", default="pdf")
     parser.add_argument("--patterns", "-p", help="Comma-separated list of filename patterns to match (e.g., 'svar')", default="")
+    parser.add_argument("--catalog", "-c", help="Path to the hearing catalog (catalog.sqlite) to record and skip converted hearings", default=None)
+    parser.add_argument("--blob-store", "-b", help="Path to a blob store (eg. data-dir/blobs) to store outputs by content and skip converting identical files", default=None)
+    parser.add_argument("--from-zip", "-z", action='store_true', help="Read the files directly from the zip file of each hearing instead of unzipped folders")
+    parser.add_argument("--scratch-dir", help="Local folder for the files read from the zip files (with --from-zip)", default=None)
 
     args = parser.parse_args()
     input_dir  = Path(args.input_dir)
     output_dir = Path(args.output_dir)
 
-    converter = FileConverter(input_dir, output_dir, args.format, args.patterns, make_copy=args.make_copy_of_input, copy_sample_size=args.copy_sample_size)
+    catalog = HearingCatalog(args.catalog) if args.catalog else None
+    store = BlobStore(args.blob_store) if args.blob_store else None
+
+    converter = FileConverter(input_dir, output_dir, args.format, args.patterns, make_copy=args.make_copy_of_input, copy_sample_size=args.copy_sample_size, catalog=catalog, from_zip=args.from_zip, scratch_dir=args.scratch_dir, store=store)
     converter.run()
 
 if __name__ == "__main__":
@@ -12,6 +12,8 @@ from PyPDF2 import PdfReader, PdfWriter
 from PIL import Image
 import shutil
 
+from hoering.blobstore import BlobStore
+
 class CustomPDF(FPDF):
     def __init__(self):
         super().__init__()
@@ -49,7 +51,7 @@ class CustomPDF(FPDF):
 
 
 def convert_email_file(
-    input_file: Path, output_dir: Path, patterns: list, output_format: str = "pdf"
+    input_file: Path, output_dir: Path, patterns: list, output_format: str = "pdf", store: Optional[BlobStore] = None
 ) -> None:
     """Converts an email file (.msg or .oft) to a PDF and optionally to an image format (png/jpg)."""
     if input_file.suffix.lower() not in [".msg", ".oft"]:
@@ -60,7 +62,7 @@ def convert_email_file(
     if not eml_file:
         return None
 
-    email_data, attachments = parse_eml_file(eml_file, output_dir, patterns)
+    email_data, attachments = parse_eml_file(eml_file, output_dir, patterns, store)
     if not email_data:
         return None
 
@@ -92,7 +94,7 @@ def convert_msg_to_eml(input_file: Path, output_dir: Path, msgconvert_path: str
         return None
 
 def parse_eml_file(
-    eml_file: Path, output_dir: Path, patterns: list
+    eml_file: Path, output_dir: Path, patterns: list, store: Optional[BlobStore] = None
 ) -> Optional[Dict[str, Union[str, None]]]:
     """Parses an .eml file and extracts relevant email information, including attachments."""
     try:
@@ -114,7 +116,7 @@ def parse_eml_file(
 
         # Handle attachments only if filename contains specified patterns
         attachments = [
-            save_attachment(part, output_dir)
+            save_attachment(part, output_dir, store)
             for part in msg.iter_attachments()
             if (filename := part.get_filename())
             and any(pattern in filename.lower() for pattern in patterns)
@@ -129,8 +131,8 @@ def parse_eml_file(
         return None, []
 
 
-def save_attachment(part, output_dir: Path) -> Optional[Path]:
-    """Saves an attachment to the specified output directory."""
+def save_attachment(part, output_dir: Path, store: Optional[BlobStore] = None) -> Optional[Path]:
+    """Saves an attachment to the specified output directory. With a BlobStore, the attachment is stored once per content and linked."""
     try:
         attachment_filename = part.get_filename()
         if not attachment_filename:
@@ -144,8 +146,11 @@ def save_attachment(part, output_dir: Path) -> Optional[Path]:
             base, extension = attachment_filename.rsplit(".", 1)
             attachment_path = output_dir / f"{base}_1.{extension}"
 
-        with open(attachment_path, "wb") as attachment_file:
-            attachment_file.write(part.get_payload(decode=True))
+        if store:
+            store.store_bytes(part.get_payload(decode=True), attachment_path)
+        else:
+            with open(attachment_path, "wb") as attachment_file:
+                attachment_file.write(part.get_payload(decode=True))
 
         logging.info(f"Saved attachment: {attachment_path}")
         return attachment_path
@@ -357,22 +362,22 @@ def convert_pdf_to_image(
 
 
 def convert_msg_input(
-    file_folder_name: Path, input_root: Path, output_dir: Path, output_format: str, patterns: list
+    file_folder_name: Path, input_root: Path, output_dir: Path, output_format: str, patterns: list, store: Optional[BlobStore] = None
 ) -> None:
     """Processes the input path (file or folder) and manages output structure."""
     input_path = input_root / file_folder_name
     if input_path.is_dir():
-        folder_files = process_folder(input_path, output_dir, output_format, patterns)
+        folder_files = process_folder(input_path, output_dir, output_format, patterns, store)
         return folder_files
     elif input_path.is_file():
-        file = process_file(input_path, output_dir, output_format, patterns)
+        file = process_file(input_path, output_dir, output_format, patterns, store)
         return file
     else:
         logging.error("Invalid input path. Please provide a valid file or folder.")
 
 
 def process_folder(
-    input_folder: Path, output_dir: Path, output_format: str, patterns: list
+    input_folder: Path, output_dir: Path, output_format: str, patterns: list, store: Optional[BlobStore] = None
 ) -> None:
     """Processes all .msg and .oft files inside a given folder."""
     files = list(input_folder.glob("*.msg")) + list(input_folder.glob("*.oft"))
@@ -386,19 +391,19 @@ def process_folder(
         output_dir = output_dir / file.stem
         output_dir.mkdir(parents=True, exist_ok=True)
 
-        file = convert_email_file(file, output_dir, patterns, output_format)
+        file = convert_email_file(file, output_dir, patterns, output_format, store)
         folder_files.append(file)
     return folder_files
 
 def process_file(
-        input_file: Path, output_dir: Path, output_format: str, patterns: list
+        input_file: Path, output_dir: Path, output_format: str, patterns: list, store: Optional[BlobStore] = None
         ) -> None:
     """Processes a single .msg or .oft file."""
     if input_file.suffix.lower() not in [".msg", ".oft"]:
         logging.error("Unsupported file format. Please provide a .msg or .oft file.")
         return
 
-    file = convert_email_file(input_file, output_dir, patterns, output_format)
+    file = convert_email_file(input_file, output_dir, patterns, output_format, store)
     return file
 
 
@@ -138,6 +138,26 @@ def get_matching_files(input_dir: Path) -> List[Dict[str, str]]:
     
     return log_entries, rule_to_filenames
 
+def get_matching_members(archives) -> List[Dict[str, str]]:
+    """Match the members of the hearing zip files (a HearingArchives) against the rules, without extracting them."""
+    log_entries = []
+    rule_to_filenames = defaultdict(list)
+
+    for folder in archives.folders():
+        for name in archives.listdir(folder):
+            filepath = archives.mainpath / folder / name  # The path the file would have if unzipped
+            matches = match_rules(os.path.splitext(name)[0])
+
+            for match in matches:
+                log_entries.append({
+                    'filename': filepath,
+                    'rule': match['rule'],
+                    'description': match['description']
+                })
+                rule_to_filenames[(match['rule'], match['description'])].append(filepath)
+
+    return log_entries, rule_to_filenames
+
 def save_log_to_csv(log_entries: List[Dict[str, str]], output_dir: Path):
     """Save matched files log to CSV."""
     if log_entries:
@@ -184,15 +204,17 @@ def delete_matched_files(rule_to_filenames: defaultdict):
     return deleted_count
 
 def delete_known_named_files(input_dir: Path):
-    """Delete *_meta.json and .zip files based on folder names. Returns count of deleted files."""
+    """Delete *_meta.json, *_manifest.json, *_documents.json and .zip files based on folder names. Returns count of deleted files."""
     deleted_count = 0
     for folder in input_dir.iterdir():
         if folder.is_dir():
             folder_name = folder.name
             meta_file = folder / f"{folder_name}_meta.json"
             zip_file = folder / f"{folder_name}.zip"
+            manifest_file = folder / f"{folder_name}_manifest.json"
+            documents_file = folder / f"{folder_name}_documents.json"
 
-            for file_path in [meta_file, zip_file]:
+            for file_path in [meta_file, zip_file, manifest_file, documents_file]:
                 try:
                     if file_path.exists():
                         file_path.unlink()
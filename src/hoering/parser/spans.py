@@ -0,0 +1,130 @@
+import struct
+
+import fitz
+
+# Span flags of PyMuPDF
+SUPERSCRIPT = 1
+ITALIC = 2
+SERIF = 4
+MONOSPACED = 8
+BOLD = 16
+
+
+def f32(x: float) -> float:
+    """Round to single precision, as MuPDF computes coordinates."""
+    return struct.unpack("f", struct.pack("f", x))[0]
+
+
+def font_family(font: str, flags: int) -> str:
+    """The font-family MuPDF writes for a font in the html of `page.get_text("html")`."""
+    # Subset prefix, eg. ABCDEF+Calibri
+    name = font.split("+", 1)[1] if "+" in font else font
+    if "Times" in name:
+        name = "Times New Roman"
+    elif "Arial" in name or "Helvetica" in name:
+        name = "Arial Narrow" if "Narrow" in name or "Condensed" in name else "Arial"
+    elif "Courier" in name:
+        name = "Courier"
+    elif "-" in name:
+        name = name.rsplit("-", 1)[0]
+
+    if flags & MONOSPACED:
+        return f"{name},monospace"
+    return f"{name},serif" if flags & SERIF else f"{name},sans-serif"
+
+
+def span_style(span: dict) -> str:
+    """The style attribute of the <span> MuPDF writes for a span."""
+    return (
+        f"font-family:{font_family(span['font'], span['flags'])};"
+        f"font-size:{span['size']:.1f}pt;color:#{span['color']:06x}"
+    )
+
+
+def span_wrapper(flags: int) -> str:
+    """
+    The tag a <span> sits directly in: MuPDF wraps spans in <sup>, <tt>, <b> and <i> (outermost first)
+    for superscript, monospaced, bold and italic fonts.
+    """
+    for flag, tag in ((ITALIC, "i"), (BOLD, "b"), (MONOSPACED, "tt"), (SUPERSCRIPT, "sup")):
+        if flags & flag:
+            return tag
+    return "p"
+
+
+def page_lines(page) -> list[dict]:
+    """
+    The text lines of a page from PyMuPDF's span data, as they appear as <p> elements in `page.get_text("html")`:
+    {"top": "60.8", "left": "72.0", "spans": [{"style": ..., "text": ..., "wrapper": "b"}, ...]}.
+    Coordinates are formatted like the html, and spans are merged where the html has one <span>
+    (the html only starts a new span when the font, size or superscript changes, not the color).
+    """
+    lines = []
+    blocks = page.get_text("dict", flags=fitz.TEXTFLAGS_HTML)["blocks"]
+    for block in blocks:
+        for line in block.get("lines", []):
+            raw_spans = line["spans"]
+            if not raw_spans:
+                continue
+
+            first = raw_spans[0]
+            top = f32(f32(first["origin"][1]) - f32(f32(first["size"]) * f32(0.8)))
+            spans = []
+            previous = None
+            for span in raw_spans:
+                key = (span["font"], span["size"], span["flags"] & SUPERSCRIPT)
+                if previous == key:
+                    spans[-1]["text"] += span["text"]
+                    continue
+                previous = key
+                spans.append(
+                    {
+                        "style": span_style(span),
+                        "text": span["text"],
+                        "wrapper": span_wrapper(span["flags"]),
+                    }
+                )
+
+            lines.append(
+                {"top": f"{top:.1f}", "left": f"{line['bbox'][0]:.1f}", "spans": spans}
+            )
+    return lines
+
+
+def line_text(line: dict) -> str:
+    return "".join(span["text"] for span in line["spans"])
+
+
+def remove_symbols(lines: list[dict]) -> list[dict]:
+    """
+    Remove the spans in symbol fonts (list bullets) like `extract_page` removes them from the html:
+    a span directly in its <p> takes the whole line with it if the line holds less than 4 characters.
+    """
+    kept = []
+    for line in lines:
+        spans = line["spans"]
+        removed = set()
+        for i, span in enumerate(spans):
+            if "symbol" not in span["style"].lower():
+                continue
+            if span["wrapper"] == "p":
+                text = "".join(x["text"] for j, x in enumerate(spans) if j not in removed)
+                if len(text) < 4:
+                    break
+            removed.add(i)
+        else:
+            kept.append(
+                {**line, "spans": [x for j, x in enumerate(spans) if j not in removed]}
+            )
+    return kept
+
+
+def is_style_candidate(span: dict) -> bool:
+    """Whether a span counts towards the most common style of a page, as in `get_most_common_style`."""
+    text = span["text"]
+    return (
+        "symbol" not in span["style"].lower()
+        and len(text.strip()) > 1
+        and "@" not in text
+    )
+
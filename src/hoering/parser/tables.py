@@ -0,0 +1,111 @@
+TABLE = "table"
+NO_TABLE = "no_table"
+AMBIGUOUS = "ambiguous"
+
+
+def merge_segments(segments, tolerance=2) -> list[float]:
+    """
+    The lengths of the lines formed by segments (position, start, end) on the same position that touch or overlap,
+    like the edges of neighbouring cells, which are one line once the page is rendered.
+    """
+    lines = []
+    for segment in sorted(segments):
+        if lines and segment[0] - lines[-1][-1][0] <= tolerance:
+            lines[-1].append(segment)
+        else:
+            lines.append([segment])
+
+    lengths = []
+    for line in lines:
+        start = end = None
+        for _, x0, x1 in sorted(line, key=lambda x: x[1]):
+            if end is not None and x0 <= end + tolerance:
+                end = max(end, x1)
+                continue
+            if end is not None:
+                lengths.append(end - start)
+            start, end = x0, x1
+        lengths.append(end - start)
+    return lengths
+
+
+def rulings(drawings, width, height, line_scale=25) -> tuple[int, int]:
+    """
+    The number of horizontal and vertical ruling lines in the vector drawings of a page (`page.get_drawings()`).
+    Lines, and the edges of rectangles, are joined where they continue each other (eg. a table drawn cell by cell),
+    and count if they are at least as long as camelot's lattice parser requires:
+    the page width (or height) divided by line_scale.
+    """
+    horizontal = []
+    vertical = []
+
+    def add(x0, y0, x1, y1):
+        if abs(y1 - y0) < 2:
+            horizontal.append((round((y0 + y1) / 2, 1), min(x0, x1), max(x0, x1)))
+        elif abs(x1 - x0) < 2:
+            vertical.append((round((x0 + x1) / 2, 1), min(y0, y1), max(y0, y1)))
+
+    for drawing in drawings:
+        for item in drawing["items"]:
+            if item[0] == "l":
+                add(item[1].x, item[1].y, item[2].x, item[2].y)
+            elif item[0] in ("re", "qu"):
+                rect = item[1].rect if item[0] == "qu" else item[1]
+                if rect.height < 2 or rect.width < 2:
+                    # A filled bar drawn as a thin rectangle
+                    add(rect.x0, rect.y0, rect.x1, rect.y1)
+                else:
+                    add(rect.x0, rect.y0, rect.x1, rect.y0)
+                    add(rect.x0, rect.y1, rect.x1, rect.y1)
+                    add(rect.x0, rect.y0, rect.x0, rect.y1)
+                    add(rect.x1, rect.y0, rect.x1, rect.y1)
+
+    min_h = width / line_scale
+    min_v = height / line_scale
+    return (
+        sum(x >= min_h for x in merge_segments(horizontal)),
+        sum(x >= min_v for x in merge_segments(vertical)),
+    )
+
+
+def classify_page(page, line_scale=25, image_share=0.2, drawings=None) -> str:
+    """
+    Decide from the vector drawings of a page whether it holds a ruled table, without rasterizing it:
+        - TABLE: the ruling lines form a grid in which `page.find_tables` finds a table of 2x2 cells or more.
+        - NO_TABLE: there are too few horizontal or vertical rulings for camelot's lattice parser
+          to find the joints of a table, and no large images a table could be drawn in.
+        - AMBIGUOUS: anything else, eg. rulings that do not form a table PyMuPDF recognizes, or a scanned page.
+          Left to camelot.
+
+    image_share: the share of the page images must cover before a table could be hidden in them.
+    drawings: the drawings of the page, if already read (eg. `DocumentContext.drawings`).
+    """
+    area = page.rect.width * page.rect.height
+    image_area = sum(
+        abs(x["bbox"][2] - x["bbox"][0]) * abs(x["bbox"][3] - x["bbox"][1])
+        for x in page.get_image_info()
+    )
+    if image_area > image_share * area:
+        return AMBIGUOUS
+
+    if drawings is None:
+        drawings = page.get_drawings()
+    horizontal, vertical = rulings(drawings, page.rect.width, page.rect.height, line_scale)
+    if horizontal < 2 or vertical < 2:
+        return NO_TABLE
+
+    tables = page.find_tables(strategy="lines").tables
+    if any(x.row_count >= 2 and x.col_count >= 2 for x in tables):
+        return TABLE
+    return AMBIGUOUS
+
+
+def table_pages(doc, drawings=None) -> list[int]:
+    """
+    The numbers of the pages pdfplumber could find tables on. Its default ("lines") strategy builds tables
+    from the lines, rectangles and curves of a page, so pages without vector drawings have none.
+    drawings: a function returning the drawings of a page number, eg. `DocumentContext.drawings`.
+    """
+    if drawings is None:
+        return [page.number for page in doc if page.get_drawings()]
+    return [number for number in range(doc.page_count) if drawings(number)]
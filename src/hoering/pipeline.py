@@ -0,0 +1,228 @@
+"""
+A streaming pipeline across the stages of the project, at hearing granularity:
+populate -> unzip -> FileConverter -> NGOExtractor.extract (-> ImageClassifier)
+
+Every stage has its own worker pool, and the stages are connected by bounded queues, so a hearing flows
+through end to end as soon as its zip file lands, and the network and the CPU-heavy stages are busy at the same time.
+"""
+
+import glob
+from functools import partial
+from pathlib import Path
+from typing import Optional
+
+from hoering.blobstore import BlobStore
+from hoering.catalog import HearingCatalog
+from hoering.models.vl_openai import ImageClassifier
+from hoering.parser.extract import NGOExtractor, init_worker_logging, worker_logging
+from hoering.parser.file_convert.file_to_format_convert import FileConverter
+from hoering.runner import Pipeline, Stage
+from hoering.scraper.scrape import HPScraper
+from hoering.scraper.unzip import unzip_folder
+
+# The BlobStore of a worker process of the extract stage, per store folder
+worker_stores = {}
+
+
+def unzip_hearing(mainpath, store_dir, _id):
+    """Unzip the zip file of a hearing. Runs in a worker process."""
+    return unzip_folder(Path(mainpath) / str(_id), False, store_dir)
+
+
+def extract_hearing(mainpath, options, store_dir, _id) -> dict:
+    """
+    Extract the NGOs from the hearing lists of a hearing. Runs in a worker process.
+    options: the settings of the NGOExtractor of the pipeline (`NGOExtractor.worker_options`).
+    store_dir: the folder of its BlobStore, or None. Opened once per worker process.
+    """
+    files = [
+        x.replace("\\", "/")
+        for x in glob.glob(f"{mainpath}/{_id}/*.pdf")
+        if "liste" in Path(x).name
+    ]
+    store = None
+    if store_dir:
+        if store_dir not in worker_stores:
+            worker_stores[store_dir] = BlobStore(store_dir)
+        store = worker_stores[store_dir]
+    extractor = NGOExtractor(store=store, **options)
+    extractor.extract(files)
+    return extractor.ngos_list
+
+
+def hearing_stages(
+    scraper: HPScraper,
+    mainpath,
+    converter: Optional[FileConverter] = None,
+    extractor: Optional[NGOExtractor] = None,
+    classifier_output: Optional[Path] = None,
+    catalog: Optional[HearingCatalog] = None,
+    concurrency: int = 4,
+    unzip_workers: int = 2,
+    convert_workers: int = 1,
+    extract_workers: int = 2,
+    store_dir=None,
+    meta_from_search=False,
+) -> list[Stage]:
+    """
+    The stages from a hearing-id to its extracted NGOs. Stages left out (converter, extractor, classifier_output None)
+    are skipped.
+
+    converter: runs the steps of `FileConverter.run` per hearing (`run_case_folder`), on a copy of the hearing folder.
+    extractor: its settings and store are used by the extract workers, and the results are merged into it.
+    classifier_output: classify the remaining files of each hearing (converted to PNG by the converter).
+
+    concurrency: the number of hearings downloaded at once, paced by the rate limit of the scraper.
+    convert_workers: LibreOffice does not run twice at once with the same profile, so keep this at 1
+        unless every worker has its own profile.
+    """
+    mainpath = Path(mainpath)
+    hearings = {x["Id"]: x for x in scraper.subpages}
+    scraper.set_concurrency(concurrency)
+
+    def populate(_id):
+        return scraper.populate_hearing(
+            mainpath, _id, hearings.get(_id), meta_from_search=meta_from_search
+        )
+
+    def unzipped(_id, result):
+        folder, n_bytes, _ = result
+        if catalog:
+            catalog.mark(folder, "unzipped", n_bytes)
+        return _id
+
+    def convert(_id):
+        converter.run_case_folder(_id)
+        return _id
+
+    def extracted(_id, ngos_list):
+        # Same += semantics as NGOExtractor.extract for hearings with several lists
+        for hearing, ngos in ngos_list.items():
+            extractor.ngos_list[hearing] = extractor.ngos_list.get(hearing, []) + ngos
+        # Also hearings without lists, or whose lists gave no NGOs, so they are not extracted again on resume
+        if catalog:
+            catalog.mark(_id, "extracted", len(extractor.ngos_list.get(str(_id), [])))
+        return _id
+
+    def classify(_id):
+        image_dir = converter.case_work_dir(_id)
+        if image_dir.exists():
+            ImageClassifier(
+                image_dir=str(image_dir), output_dir=str(classifier_output)
+            ).classify_images()
+        return _id
+
+    stages = [
+        Stage("populate", populate, workers=concurrency),
+        Stage(
+            "unzip",
+            partial(unzip_hearing, str(mainpath), store_dir),
+            workers=unzip_workers,
+            processes=True,
+            on_result=unzipped,
+        ),
+    ]
+    if converter:
+        stages.append(Stage("convert", convert, workers=convert_workers))
+    if extractor:
+        stages.append(
+            Stage(
+                "extract",
+                partial(
+                    extract_hearing,
+                    str(mainpath),
+                    extractor.worker_options(),
+                    str(extractor.store.root) if extractor.store else None,
+                ),
+                workers=extract_workers,
+                processes=True,
+                on_result=extracted,
+                # The workers log through the handlers here, instead of each opening extractor.log
+                initializer=init_worker_logging,
+                context=worker_logging,
+            )
+        )
+    if converter and classifier_output:
+        stages.append(Stage("classify", classify, workers=1))
+    return stages
+
+
+def parse_args():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Run populate, unzip, file conversion and NGO extraction as one streaming pipeline"
+    )
+    parser.add_argument("--data-dir", type=Path, required=True)
+    parser.add_argument("--catalog", action="store_true", default=False, help="Keep the state of every hearing in data-dir/catalog.sqlite")
+    parser.add_argument("--concurrency", type=int, default=4, help="Number of hearings downloaded at once")
+    parser.add_argument("--rate-limit", type=float, default=2.0, help="Maximum number of requests per second against hoeringsportalen.dk")
+    parser.add_argument("--meta-from-search", action="store_true", default=False)
+    parser.add_argument("--unzip-workers", type=int, default=2)
+    parser.add_argument("--convert-workers", type=int, default=1)
+    parser.add_argument("--extract-workers", type=int, default=2)
+    parser.add_argument("--queue-size", type=int, default=8, help="Number of hearings waiting in front of each stage")
+    parser.add_argument("--blob-store", action="store_true", default=False, help="Unzip into the blob store in data-dir/blobs, and reuse NGOs extracted from identical lists")
+    parser.add_argument("--convert", action="store_true", default=False, help="Convert the files matching --patterns")
+    parser.add_argument("--patterns", default="svar", help="Comma-separated file name patterns to convert")
+    parser.add_argument("--format", choices=["pdf", "png", "jpg"], default="pdf")
+    parser.add_argument("--classify", action="store_true", default=False, help="Classify the remaining files of each hearing with the vision model")
+    parser.add_argument("--extract", action="store_true", default=False, help="Extract NGOs from the hearing lists")
+    parser.add_argument("--engine", choices=["html", "spans"], default="html", help="The text engine of the NGO extraction")
+    parser.add_argument("--table-detector", choices=["vector", "camelot"], default="vector", help="How the NGO extraction detects tables")
+    parser.add_argument("--metrics", action="store_true", default=False, help="Write crawl metrics to data-dir/metrics")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    catalog = HearingCatalog(args.data_dir / "catalog.sqlite") if args.catalog else None
+    scraper = HPScraper(rate_limit=args.rate_limit, catalog=catalog)
+    scraper.load_subpages(args.data_dir / "subpages.json")
+
+    converter = (
+        FileConverter(args.data_dir / "hearings", args.data_dir, args.format, args.patterns, catalog=catalog)
+        if args.convert or args.classify
+        else None
+    )
+    extractor = (
+        NGOExtractor(
+            catalog=catalog,
+            store=BlobStore(args.data_dir / "blobs") if args.blob_store else None,
+            engine=args.engine,
+            table_detector=args.table_detector,
+        )
+        if args.extract
+        else None
+    )
+
+    stages = hearing_stages(
+        scraper,
+        args.data_dir / "hearings",
+        converter=converter,
+        extractor=extractor,
+        classifier_output=args.data_dir / "classification" if args.classify else None,
+        catalog=catalog,
+        concurrency=args.concurrency,
+        unzip_workers=args.unzip_workers,
+        convert_workers=args.convert_workers,
+        extract_workers=args.extract_workers,
+        store_dir=args.data_dir / "blobs" if args.blob_store else None,
+        meta_from_search=args.meta_from_search,
+    )
+
+    ids = [x["Id"] for x in scraper.subpages]
+    if catalog:
+        last_stage = "extracted" if extractor else "converted" if converter else "unzipped"
+        done = catalog.done(last_stage)
+        ids = [x for x in ids if x not in done]
+
+    Pipeline(stages, queue_size=args.queue_size).run(ids)
+    scraper.report()
+    if args.metrics:
+        scraper.write_metrics(args.data_dir / "metrics")
+
+    if extractor:
+        extractor.save_file(args.data_dir / "all_hearings.json")
+        print("Saved file to:", args.data_dir / "all_hearings.json")
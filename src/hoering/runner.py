@@ -0,0 +1,152 @@
+"""
+Stages connected by bounded queues, each with its own pool of workers. Used by `hoering.pipeline`, which
+chains the stages of the project; kept apart from it so running stages does not import them.
+"""
+
+import contextlib
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, ContextManager, Iterable, Optional
+
+from tqdm import tqdm
+
+# Put on a queue when the stage before it has finished
+STOP = object()
+
+
+class Stage:
+    def __init__(
+        self,
+        name: str,
+        func: Callable,
+        workers: int = 1,
+        processes: bool = False,
+        on_result: Optional[Callable[[Any, Any], Any]] = None,
+        initializer: Optional[Callable] = None,
+        context: Optional[Callable[[], ContextManager[tuple]]] = None,
+    ):
+        """
+        A stage of a Pipeline.
+
+        name: the name shown in progress and stats.
+        func: called with each item. Returns the item passed on to the next stage, or None to drop it.
+        workers: the number of items processed at once.
+        processes: run func in a process pool instead of threads. func and the items must be picklable.
+        on_result: called in the main process with (item, result of func), eg. to record the result.
+            Returns the item passed on. Defaults to the result of func.
+        initializer: called in every worker process of the process pool when it starts.
+        context: returns a context manager that is entered while the pipeline runs. The tuple it gives is
+            passed to initializer, eg. the log queue of `worker_logging` for `init_worker_logging`.
+        """
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.processes = processes
+        self.on_result = on_result
+        self.initializer = initializer
+        self.context = context
+        self.stats = {"done": 0, "failed": 0, "busy": 0.0}
+
+
+class Pipeline:
+    def __init__(self, stages: list[Stage], queue_size: int = 8):
+        """
+        Run items through stages connected by bounded queues.
+        queue_size: the number of items waiting in front of a stage. A full queue holds back the stage before it.
+        """
+        self.stages = stages
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+        self.lock = threading.Lock()
+
+    def run(self, items: Iterable) -> list:
+        """Run the items through the pipeline. Returns the items that made it through the last stage."""
+        results = []
+        start = time.monotonic()
+        threads = []
+        pools = []
+
+        # The contexts of the stages are left after their pools have shut down
+        with contextlib.ExitStack() as contexts:
+            for i, stage in enumerate(self.stages):
+                pool = None
+                if stage.processes:
+                    initargs = contexts.enter_context(stage.context()) if stage.context else ()
+                    pool = ProcessPoolExecutor(
+                        stage.workers, initializer=stage.initializer, initargs=initargs
+                    )
+                pools.append(pool)
+                remaining = [stage.workers]
+                for _ in range(stage.workers):
+                    thread = threading.Thread(
+                        target=self.worker, args=(i, pool, remaining, results), daemon=True
+                    )
+                    thread.start()
+                    threads.append(thread)
+
+            items = list(items)
+            with tqdm(total=len(items), smoothing=0, desc="Pipeline") as self.pbar:
+                for item in items:
+                    self.queues[0].put(item)
+                self.queues[0].put(STOP)
+                for thread in threads:
+                    thread.join()
+
+            for pool in pools:
+                if pool:
+                    pool.shutdown()
+
+        self.report(time.monotonic() - start)
+        return results
+
+    def worker(self, i, pool, remaining, results):
+        stage = self.stages[i]
+        in_queue = self.queues[i]
+        out_queue = self.queues[i + 1] if i + 1 < len(self.stages) else None
+
+        while True:
+            item = in_queue.get()
+            if item is STOP:
+                # Let the other workers of the stage see it, and pass it on when the last one stops
+                in_queue.put(STOP)
+                with self.lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last and out_queue:
+                    out_queue.put(STOP)
+                return
+
+            started = time.monotonic()
+            try:
+                if pool:
+                    result = pool.submit(stage.func, item).result()
+                else:
+                    result = stage.func(item)
+                if stage.on_result:
+                    result = stage.on_result(item, result)
+            except Exception as e:
+                print(f"{stage.name} failed for {item}: {e}")
+                result = None
+
+            with self.lock:
+                stage.stats["busy"] += time.monotonic() - started
+                stage.stats["done" if result is not None else "failed"] += 1
+
+            if result is None:
+                self.pbar.update(1)
+            elif out_queue:
+                out_queue.put(result)
+            else:
+                with self.lock:
+                    results.append(result)
+                self.pbar.update(1)
+
+    def report(self, wall_time):
+        print(f"Pipeline finished in {wall_time:.1f}s")
+        for stage in self.stages:
+            stats = stage.stats
+            print(
+                f"  {stage.name:<10} done: {stats['done']:>6}, failed: {stats['failed']:>5}, "
+                f"busy: {stats['busy']:.1f}s over {stage.workers} workers"
+            )
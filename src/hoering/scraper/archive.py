@@ -0,0 +1,186 @@
+import datetime
+import gzip
+import json
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from tqdm import tqdm
+
+from hoering.scraper.meta import parse_details
+
+try:
+    import zstandard
+except ImportError:  # Falls back to gzip segments
+    zstandard = None
+
+
+class ResponseArchive:
+    def __init__(self, archive_dir, segment_size=256 * 1024 * 1024):
+        """
+        A compressed, append-only archive of raw responses from hoeringsportalen.dk.
+        Responses are appended to segment files as independently compressed records (zstd frames, or gzip
+        members if zstandard is not installed), and index.jsonl maps (kind, key) to segment, offset and length.
+        The latest record of a key wins.
+
+        archive_dir: the folder holding the segments and the index.
+        segment_size: start a new segment when the current one grows beyond this many bytes.
+        """
+        self.archive_dir = Path(archive_dir)
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        self.segment_size = segment_size
+        self.extension = ".zst" if zstandard else ".gz"
+        self.index_path = self.archive_dir / "index.jsonl"
+        self.lock = threading.Lock()
+        self.segment = self.current_segment()
+
+    def current_segment(self):
+        segments = sorted(self.archive_dir.glob(f"segment-*{self.extension}"))
+        if segments and segments[-1].stat().st_size < self.segment_size:
+            return segments[-1]
+        return self.archive_dir / f"segment-{len(segments):05d}{self.extension}"
+
+    def put(self, kind: str, key, body: bytes, url: str = None):
+        """
+        Append a response body to the archive.
+        kind: the kind of response, eg. "details" or "search".
+        key: the key to look the response up by, eg. the hearing-id.
+        """
+        header = {
+            "kind": kind,
+            "key": str(key),
+            "url": url,
+            "fetched_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        }
+        record = compress(json.dumps(header).encode("utf-8") + b"\n" + body)
+
+        with self.lock:
+            if (
+                self.segment.exists()
+                and self.segment.stat().st_size >= self.segment_size
+            ):
+                self.segment = self.current_segment()
+
+            with open(self.segment, "ab") as f:
+                offset = f.tell()
+                f.write(record)
+
+            entry = {
+                "kind": kind,
+                "key": str(key),
+                "segment": self.segment.name,
+                "offset": offset,
+                "length": len(record),
+            }
+            with open(self.index_path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def index(self, kind: str = None) -> dict:
+        """The latest index entry of each key, as {(kind, key): entry}."""
+        entries = {}
+        if not self.index_path.exists():
+            return entries
+        with open(self.index_path, "r") as f:
+            for line in f:
+                entry = json.loads(line)
+                if kind is None or entry["kind"] == kind:
+                    entries[(entry["kind"], entry["key"])] = entry
+        return entries
+
+    def get(self, kind: str, key):
+        """The latest archived body for a key, or None."""
+        entry = self.index(kind).get((kind, str(key)))
+        if entry is None:
+            return None
+        return read_record(self.archive_dir / entry["segment"], entry)[1]
+
+
+def compress(data: bytes) -> bytes:
+    if zstandard:
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data)
+
+
+def read_record(segment_path, entry):
+    """Read a record from a segment. Returns (header, body)."""
+    with open(segment_path, "rb") as f:
+        f.seek(entry["offset"])
+        record = f.read(entry["length"])
+
+    if str(segment_path).endswith(".zst"):
+        data = zstandard.ZstdDecompressor().decompress(record)
+    else:
+        data = gzip.decompress(record)
+
+    header, body = data.split(b"\n", 1)
+    return json.loads(header), body
+
+
+def reparse_segment(segment_path, entries, mainpath):
+    """
+    Rebuild the _meta.json files of a batch of Details pages in a segment. Runs in a worker process.
+    Pages that cannot be parsed (eg. error or maintenance pages archived in their place) are skipped,
+    and their _meta.json is left as it is.
+    Returns (the number of files written, {hearing-id: error} of the skipped pages).
+    """
+    count = 0
+    failed = {}
+    for entry in sorted(entries, key=lambda x: x["offset"]):
+        _, body = read_record(segment_path, entry)
+        _id = entry["key"]
+        try:
+            meta_info = parse_details(body)
+        except ValueError as e:
+            failed[_id] = str(e)
+            continue
+        path = Path(mainpath) / _id
+        path.mkdir(parents=True, exist_ok=True)
+        with open(path / f"{_id}_meta.json", "w") as f:
+            json.dump(meta_info, f)
+        count += 1
+    return count, failed
+
+
+def reparse(archive_dir, mainpath, workers=None, batch_size=500):
+    """
+    Rebuild every _meta.json in mainpath from the archived Details pages, without network traffic.
+    The pages are parsed in batches by a process pool.
+
+    archive_dir: the folder of the ResponseArchive.
+    mainpath: the folder holding the hearing folders.
+    workers: the number of worker processes. Defaults to the number of CPUs.
+    batch_size: the number of pages handed to a worker at a time.
+    """
+    archive = ResponseArchive(archive_dir)
+    by_segment = defaultdict(list)
+    for entry in archive.index("details").values():
+        by_segment[entry["segment"]].append(entry)
+
+    count = 0
+    failed = {}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = [
+            pool.submit(
+                reparse_segment,
+                archive.archive_dir / segment,
+                entries[i : i + batch_size],
+                mainpath,
+            )
+            for segment, entries in by_segment.items()
+            for i in range(0, len(entries), batch_size)
+        ]
+        for future in tqdm(
+            as_completed(futures), total=len(futures), desc="Reparsing meta data"
+        ):
+            written, skipped = future.result()
+            count += written
+            failed.update(skipped)
+
+    for _id, error in sorted(failed.items()):
+        print(f"{_id} - Skipped archived Details page: {error}")
+    print(
+        f"Rebuilt {count} meta files from {archive.archive_dir}, skipped {len(failed)} pages that could not be parsed"
+    )
+    return count
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+
+import requests
+
+
+class CachedSession(requests.Session):
+    def __init__(self, cache_dir, url_pattern: str = r"/Hearing/Details/"):
+        """
+        A requests session with an on-disk HTTP cache for conditional requests.
+        For GET requests to urls matching url_pattern, the body and validators (ETag/Last-Modified) are stored,
+        and later requests are sent with If-None-Match/If-Modified-Since.
+        On a 304 response the cached body is returned on the response, which keeps status_code 304
+        and gets `from_cache = True`, so callers can skip re-parsing unchanged pages.
+        Streamed requests (eg. zip files) are never cached.
+
+        cache_dir: the folder holding the cache.
+        url_pattern: a regular expression for the urls to cache.
+        """
+        super().__init__()
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.url_pattern = re.compile(url_pattern)
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def cache_path(self, url):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return self.cache_dir / key[:2] / key
+
+    def request(self, method, url, *args, **kwargs):
+        if (
+            method.upper() != "GET"
+            or kwargs.get("stream")
+            or not self.url_pattern.search(url)
+        ):
+            return super().request(method, url, *args, **kwargs)
+
+        path = self.cache_path(url)
+        validators = self.load_validators(path)
+
+        headers = dict(kwargs.pop("headers", None) or {})
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+        response = super().request(method, url, *args, headers=headers, **kwargs)
+
+        if response.status_code == 304 and validators:
+            with open(f"{path}.body", "rb") as f:
+                response._content = f.read()
+            response.from_cache = True
+            self.count(hit=True)
+        else:
+            self.count(hit=False)
+            if response.status_code == 200 and (
+                "ETag" in response.headers or "Last-Modified" in response.headers
+            ):
+                self.store(path, url, response)
+
+        return response
+
+    def load_validators(self, path):
+        try:
+            with open(f"{path}.json", "r") as f:
+                validators = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        if not os.path.exists(f"{path}.body"):
+            return {}
+        return validators
+
+    def store(self, path, url, response):
+        """Write the body and validators of a response. Files are replaced atomically."""
+        path.parent.mkdir(exist_ok=True)
+        validators = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+        for suffix, mode, data in [
+            (".body", "wb", response.content),
+            (".json", "w", json.dumps(validators)),
+        ]:
+            tmp_path = f"{path}{suffix}.{threading.get_ident()}.tmp"
+            with open(tmp_path, mode) as f:
+                f.write(data)
+            os.replace(tmp_path, f"{path}{suffix}")
+
+    def count(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def report(self):
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0
+        print(f"HTTP cache: {self.hits} hits, {self.misses} misses ({rate:.0%} hit rate)")
+        return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,244 @@
+import datetime
+import re
+from typing import Callable, Iterable, Optional
+from zoneinfo import ZoneInfo
+
+from bs4 import UnicodeDammit
+from lxml import etree
+
+# The labels of the meta info on the Details page of a hearing, and the keys that may hold the same value
+# in a hearing returned by the search API (gethearings). The first key present in the hearing is used.
+# The key names are not documented by the portal, so a value is only used if it has the format of the Details page
+# (see `search_value`).
+SEARCH_META_FIELDS = {
+    "Officiel titel": ("OfficialTitle", "Title"),
+    "Beskrivelse": ("Description", "ShortDescription"),
+    "Høringstype": ("HearingType", "HearingTypeName", "Type"),
+    "Myndighed": ("Authority", "AuthorityName", "Organization"),
+    "Område": ("Area", "AreaName", "SubjectArea"),
+    "Høringsfrist": ("Deadline", "HearingDeadline", "ResponseDeadline"),
+    "Arkiveringsdato": ("ArchiveDate", "ArchivingDate"),
+    "Høringsår": ("HearingYear", "Year"),
+    "Publiceringsdato": ("PublicationDate", "PublishedDate"),
+    "Ikrafttrædelsesdato": ("EffectiveDate", "EntryIntoForceDate"),
+}
+
+# Fields every Details page has. If the search payload lacks one of them, the Details page is fetched.
+REQUIRED_META_FIELDS = (
+    "Høringstype",
+    "Myndighed",
+    "Område",
+    "Høringsfrist",
+    "Arkiveringsdato",
+    "Høringsår",
+    "Publiceringsdato",
+)
+
+# Fields only found on the Details page
+DETAILS_ONLY_FIELDS = ("Kontaktperson", "Kontaktperson e-mail", "Bemærkninger")
+
+DATE_FIELDS = (
+    "Høringsfrist",
+    "Arkiveringsdato",
+    "Publiceringsdato",
+    "Ikrafttrædelsesdato",
+)
+
+# Fields the Details page shows as names. The search API may hold ids for them instead.
+NAME_FIELDS = ("Høringstype", "Myndighed", "Område")
+
+
+def has_class(tag: str, name: str) -> str:
+    """An XPath matching a descendant tag with a class, like bs4's `find(tag, {"class": name})`."""
+    return f".//{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {name} ')]"
+
+
+def text_of(element) -> str:
+    return "".join(element.itertext()).strip()
+
+
+def find_fieldset(content, chunk_size=16 * 1024):
+    """
+    The first fieldset of a page. The page is parsed incrementally and parsing stops at the end of the fieldset,
+    so the rest of the page is never parsed.
+    """
+    if isinstance(content, bytes):
+        try:
+            content = content.decode("utf-8")
+        except UnicodeDecodeError:
+            content = UnicodeDammit(content).unicode_markup
+
+    parser = etree.HTMLPullParser(events=("start", "end"), tag="fieldset")
+    fieldset = None
+    for i in range(0, len(content), chunk_size):
+        parser.feed(content[i : i + chunk_size])
+        for event, element in parser.read_events():
+            if event == "start" and fieldset is None:
+                fieldset = element
+            elif event == "end" and element is fieldset:
+                return fieldset
+    parser.close()
+    return fieldset
+
+
+def parse_details(content) -> dict:
+    """
+    Parse the meta info of a hearing from the content of its Details page.
+    Every value is a plain string, `details` included (the text of the Høringsdetaljer heading, or "").
+    """
+    fieldset = find_fieldset(content)
+    if fieldset is None:
+        raise ValueError("The Details page has no fieldset")
+
+    meta_info = {}
+    for container in fieldset.xpath(has_class("div", "fieldContainer")):
+        label = container.find(".//label")
+        span = container.find(".//span")
+        if label is None or span is None:
+            continue
+        meta_info[text_of(label)] = text_of(span)
+
+    details = fieldset.xpath(has_class("h3", "Høringsdetaljer"))
+    meta_info["details"] = text_of(details[0]) if details else ""
+    return meta_info
+
+
+def format_date(value):
+    """
+    Format a date from the search API the way the Details page shows it (dd-mm-yyyy).
+    Handles ISO dates and .NET json dates (/Date(1514761200000)/). Other values are returned as is.
+    """
+    if not isinstance(value, str):
+        return value
+
+    match = re.fullmatch(r"/Date\((-?\d+)([+-]\d{4})?\)/", value)
+    if match:
+        date = datetime.datetime.fromtimestamp(
+            int(match.group(1)) / 1000, tz=ZoneInfo("Europe/Copenhagen")
+        )
+        return date.strftime("%d-%m-%Y")
+
+    try:
+        return datetime.datetime.fromisoformat(value).strftime("%d-%m-%Y")
+    except ValueError:
+        return value
+
+
+def search_value(label: str, value) -> Optional[str]:
+    """
+    A value from the search API as the Details page shows it, or None if it does not have the expected format:
+        - dates: dd-mm-yyyy, after `format_date`.
+        - Høringsår: a season, eg. 2011/2012. A single year cannot be told apart from the season it ends.
+        - Høringstype, Myndighed and Område: names. Numeric ids cannot be mapped to the names.
+    """
+    if isinstance(value, dict):
+        # Lookup values (type, authority, area) may come as objects
+        value = value.get("Name") or value.get("Title")
+    if value is None or isinstance(value, (bool, int, float)):
+        return None
+
+    value = str(value).strip()
+    if label in DATE_FIELDS:
+        value = format_date(value)
+        return value if parse_date(value) else None
+    if label == "Høringsår":
+        return value if re.fullmatch(r"\d{4}/\d{4}", value) else None
+    if label in NAME_FIELDS and (value.isnumeric() or not value):
+        return None
+    return value or None
+
+
+def build_meta(hearing: dict) -> dict:
+    """
+    Build the meta info of a hearing from its search result, with the same labels as the Details page.
+    Fields the search result does not carry, or not in the format of the Details page, are left out,
+    so `missing_fields` sends the hearing to its Details page instead.
+    """
+    meta_info = {}
+    for label, keys in SEARCH_META_FIELDS.items():
+        value = next((hearing[k] for k in keys if hearing.get(k) is not None), None)
+        value = search_value(label, value)
+        if value is not None:
+            meta_info[label] = value
+
+    meta_info["details"] = ""
+    meta_info["source"] = "search"
+    return meta_info
+
+
+def missing_fields(meta_info: dict, fields=REQUIRED_META_FIELDS) -> list:
+    return [field for field in fields if field not in meta_info]
+
+
+def parse_date(value) -> Optional[datetime.date]:
+    """Parse a dd-mm-yyyy date as shown on the Details page. Returns None if it cannot be parsed."""
+    try:
+        return datetime.datetime.strptime(value, "%d-%m-%Y").date()
+    except (TypeError, ValueError):
+        return None
+
+
+def make_filter(
+    authorities: Optional[Iterable[str]] = None,
+    since: Optional[datetime.date] = None,
+    until: Optional[datetime.date] = None,
+    hearing_types: Optional[Iterable[str]] = None,
+) -> Callable[[dict], bool]:
+    """
+    Make a predicate on a hearing from the search results, to select hearings before anything is downloaded.
+    The hearing is matched on its meta info as built by `build_meta`.
+    Hearings lacking a field that is filtered on are left out. The fields are listed in `predicate.fields`,
+    for `apply_filters` to check that the search results have them at all.
+
+    authorities: keep hearings from these authorities (Myndighed). Case-insensitive.
+    since: keep hearings published on or after this date (Publiceringsdato).
+    until: keep hearings published on or before this date (Publiceringsdato).
+    hearing_types: keep hearings of these types (Høringstype), eg. Lovforslag. Case-insensitive.
+        The portal can also filter on type ids while collecting the subpages (`HPScraper.search_hearings`).
+    """
+    authorities = {x.lower() for x in authorities} if authorities else None
+    hearing_types = {x.lower() for x in hearing_types} if hearing_types else None
+
+    def predicate(hearing: dict) -> bool:
+        meta_info = build_meta(hearing)
+
+        if authorities and meta_info.get("Myndighed", "").lower() not in authorities:
+            return False
+        if hearing_types and meta_info.get("Høringstype", "").lower() not in hearing_types:
+            return False
+        if since or until:
+            published = parse_date(meta_info.get("Publiceringsdato"))
+            if published is None:
+                return False
+            if since and published < since:
+                return False
+            if until and published > until:
+                return False
+        return True
+
+    predicate.fields = []
+    if authorities:
+        predicate.fields.append("Myndighed")
+    if since or until:
+        predicate.fields.append("Publiceringsdato")
+    if hearing_types:
+        predicate.fields.append("Høringstype")
+    return predicate
+
+
+def apply_filters(hearings: list[dict], filters: list[Callable[[dict], bool]]) -> list[dict]:
+    """
+    The hearings matching all filters.
+    Raises a ValueError if a filter is on a field (`predicate.fields`) that no hearing has in its search result,
+    as every hearing would then be left out, eg. because the search API names the field differently.
+    """
+    if hearings:
+        metas = [build_meta(x) for x in hearings]
+        for f in filters:
+            for field in getattr(f, "fields", []):
+                if not any(field in meta_info for meta_info in metas):
+                    raise ValueError(
+                        f"No hearing in the search results has {field} (see SEARCH_META_FIELDS), "
+                        "so the filter would leave out every hearing"
+                    )
+    return [x for x in hearings if all(f(x) for f in filters)]
@@ -0,0 +1,160 @@
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+from tqdm import tqdm
+
+from hoering.scraper.meta import DATE_FIELDS, DETAILS_ONLY_FIELDS, SEARCH_META_FIELDS
+
+try:
+    import pyarrow as pa
+except ImportError:  # Needed to write and read the Parquet dataset
+    pa = None
+
+# Meta fields with few distinct values, stored as categoricals
+CATEGORY_FIELDS = ("Høringstype", "Myndighed", "Område")
+
+# Every part file gets exactly these columns, so the parts share a schema.
+# Fields of a _meta.json not listed here are kept as a json object in "extra".
+META_COLUMNS = [
+    "Høringsnr",
+    *SEARCH_META_FIELDS,
+    *DETAILS_ONLY_FIELDS,
+    "details",
+    "source",
+    "extra",
+]
+
+
+def meta_schema():
+    """The Arrow schema of the part files, matching the types of `to_frame`."""
+    fields = []
+    for column in META_COLUMNS:
+        if column == "Høringsnr":
+            kind = pa.int64()
+        elif column in DATE_FIELDS:
+            kind = pa.timestamp("ms")
+        elif column in CATEGORY_FIELDS:
+            kind = pa.dictionary(pa.int32(), pa.string())
+        else:
+            kind = pa.string()
+        fields.append(pa.field(column, kind))
+    return pa.schema(fields)
+
+
+def read_meta_batch(mainpath, folders) -> list[dict]:
+    """Read the _meta.json files of a batch of hearing folders. Runs in a worker process."""
+    rows = []
+    for folder in folders:
+        try:
+            with open(Path(mainpath) / folder / f"{folder}_meta.json", "r") as f:
+                meta_info = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            continue
+        meta_info["Høringsnr"] = int(folder)
+        rows.append(meta_info)
+    return rows
+
+
+def to_frame(rows: list[dict]) -> pd.DataFrame:
+    """
+    Make a typed DataFrame of meta info with the columns of META_COLUMNS: Høringsnr as int,
+    the dates (dd-mm-yyyy) as datetimes, hearing type, authority and area as categoricals,
+    and everything else as strings. Other fields are collected in "extra" as json.
+    """
+    rows = [
+        {
+            **{k: v for k, v in row.items() if k in META_COLUMNS},
+            "extra": json.dumps(
+                {k: v for k, v in row.items() if k not in META_COLUMNS},
+                ensure_ascii=False,
+            )
+            if any(k not in META_COLUMNS for k in row)
+            else None,
+        }
+        for row in rows
+    ]
+    df = pd.DataFrame(rows).reindex(columns=META_COLUMNS)
+    for column in df.columns:
+        if column == "Høringsnr":
+            df[column] = df[column].astype("int64")
+        elif column in DATE_FIELDS:
+            df[column] = pd.to_datetime(
+                df[column], format="%d-%m-%Y", errors="coerce"
+            ).astype("datetime64[ms]")
+        elif column in CATEGORY_FIELDS:
+            df[column] = df[column].astype("string").astype("category")
+        else:
+            df[column] = df[column].astype("string")
+    return df
+
+
+def consolidate_meta(
+    mainpath, dataset_path, workers=None, batch_size=2000, incremental=True
+) -> int:
+    """
+    Consolidate the _meta.json files of the hearing folders into a Parquet dataset (a folder of part files).
+    The files are read in batches by a process pool, and every batch is written as a part file as soon as it is read,
+    so the meta info of the whole corpus is never held in memory at once.
+
+    mainpath: the folder holding the hearing folders.
+    dataset_path: the folder of the Parquet dataset, eg. data-dir/metadata.parquet.
+    workers: the number of worker processes. Defaults to the number of CPUs.
+    batch_size: the number of folders per part file.
+    incremental: only read the folders of hearings not in the dataset yet. If False, the dataset is rebuilt.
+
+    Returns the number of hearings added.
+    """
+    dataset_path = Path(dataset_path)
+    if not incremental and dataset_path.exists():
+        shutil.rmtree(dataset_path)
+    dataset_path.mkdir(parents=True, exist_ok=True)
+
+    parts = sorted(dataset_path.glob("part-*.parquet"))
+    known = set()
+    if parts:
+        known = set(pd.read_parquet(dataset_path, columns=["Høringsnr"])["Høringsnr"])
+
+    folders = [x for x in os.listdir(mainpath) if x.isnumeric() and int(x) not in known]
+    batches = [folders[i : i + batch_size] for i in range(0, len(folders), batch_size)]
+    next_part = int(parts[-1].stem.split("-")[1]) + 1 if parts else 0
+
+    count = 0
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = [pool.submit(read_meta_batch, mainpath, batch) for batch in batches]
+        for future in tqdm(
+            as_completed(futures), total=len(futures), desc="Merging metadata"
+        ):
+            rows = future.result()
+            if not rows:
+                continue
+            to_frame(rows).to_parquet(
+                dataset_path / f"part-{next_part:05d}.parquet",
+                index=False,
+                schema=meta_schema(),
+            )
+            next_part += 1
+            count += len(rows)
+
+    print(f"Added {count} hearings to {dataset_path}")
+    return count
+
+
+def load_metadata(dataset_path) -> pd.DataFrame:
+    """
+    Load the consolidated meta info. Reads a Parquet dataset made by `consolidate_meta`,
+    or a metadata.csv made by earlier versions.
+    """
+    dataset_path = Path(dataset_path)
+    if dataset_path.suffix == ".csv":
+        return pd.read_csv(dataset_path, index_col=0)
+
+    # The schema is given, so part files written before a column was added are read with it as missing values
+    df = pd.read_parquet(dataset_path, schema=meta_schema())
+    for column in CATEGORY_FIELDS:
+        if column in df.columns:
+            df[column] = df[column].astype("category")
+    return df.sort_values("Høringsnr", ascending=False, ignore_index=True)
@@ -0,0 +1,231 @@
+import json
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlparse
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Upper bounds of the archive size histogram buckets, in bytes
+SIZE_BUCKETS = tuple(2**x for x in range(16, 34, 2))
+
+
+def endpoint_of(url: str) -> str:
+    """The endpoint of a url: its path with ids replaced, eg. /Hearing/Details/{id}."""
+    path = urlparse(url).path or "/"
+    return re.sub(r"/\d+(?=/|$)", "/{id}", path)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # The last count is for values above every bucket (+Inf)
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q) -> Optional[float]:
+        """An estimate of a quantile: the upper bound of the bucket holding it."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+    def cumulative(self):
+        """(upper bound, count of values at or below it) per bucket, as Prometheus histograms are written."""
+        total = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            total += count
+            yield bound, total
+
+
+class CrawlMetrics:
+    def __init__(self):
+        """
+        Counters of a crawl, per endpoint: request latencies (a histogram of the time until the response headers),
+        bytes received on the wire, HTTP status codes, responses served from the HTTP cache and retries.
+        Also the size of the zip file of every hearing.
+        Streamed downloads also get a histogram of the time spent reading the body.
+        Thread-safe. Written at the end of a run as a Prometheus textfile and a json summary.
+        """
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.transfer = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.bytes = defaultdict(int)
+        self.cache_hits = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.retries = defaultdict(lambda: defaultdict(int))
+        self.archive_sizes = {}
+        self.gauges = {}
+
+    def observe_request(self, url, status_code: Optional[int], latency: float):
+        """Record a request. status_code is None for a connection error or timeout."""
+        endpoint = endpoint_of(url)
+        with self.lock:
+            self.latency[endpoint].observe(latency)
+            self.statuses[endpoint][str(status_code or "error")] += 1
+
+    def observe_transfer(self, url, seconds: float):
+        """Record the time spent reading the body of a streamed download."""
+        with self.lock:
+            self.transfer[endpoint_of(url)].observe(seconds)
+
+    def add_bytes(self, url, n_bytes: int):
+        with self.lock:
+            self.bytes[endpoint_of(url)] += n_bytes
+
+    def cache_hit(self, url):
+        """Record a response whose body was served from the HTTP cache (a 304), so no body was received."""
+        with self.lock:
+            self.cache_hits[endpoint_of(url)] += 1
+
+    def retry(self, url, reason):
+        """Record a retry. reason: the status code, or the kind of error."""
+        with self.lock:
+            self.retries[endpoint_of(url)][str(reason)] += 1
+
+    def archive_size(self, _id, n_bytes: int):
+        with self.lock:
+            self.archive_sizes[str(_id)] = n_bytes
+
+    def set_gauge(self, name, value):
+        with self.lock:
+            self.gauges[name] = value
+
+    def summary(self) -> dict:
+        with self.lock:
+            endpoints = {}
+            for endpoint in sorted(set(self.latency) | set(self.bytes)):
+                histogram = self.latency.get(endpoint) or Histogram(LATENCY_BUCKETS)
+                endpoints[endpoint] = {
+                    "requests": histogram.count,
+                    "seconds": round(histogram.sum, 3),
+                    "mean_latency": round(histogram.sum / histogram.count, 4)
+                    if histogram.count
+                    else None,
+                    "p50_latency": histogram.quantile(0.5),
+                    "p95_latency": histogram.quantile(0.95),
+                    "p99_latency": histogram.quantile(0.99),
+                    "transfer_seconds": round(self.transfer[endpoint].sum, 3)
+                    if endpoint in self.transfer
+                    else None,
+                    "bytes": self.bytes.get(endpoint, 0),
+                    "cache_hits": self.cache_hits.get(endpoint, 0),
+                    "statuses": dict(self.statuses.get(endpoint, {})),
+                    "retries": dict(self.retries.get(endpoint, {})),
+                }
+
+            sizes = sorted(self.archive_sizes.values())
+            archives = {
+                "hearings": len(sizes),
+                "bytes": sum(sizes),
+                "median": sizes[len(sizes) // 2] if sizes else None,
+                "p95": sizes[int(len(sizes) * 0.95)] if sizes else None,
+                "max": sizes[-1] if sizes else None,
+                "largest": dict(
+                    sorted(self.archive_sizes.items(), key=lambda x: -x[1])[:20]
+                ),
+            }
+            return {
+                "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+                "wall_seconds": round(time.time() - self.started, 1),
+                "endpoints": endpoints,
+                "archives": archives,
+                "archive_sizes": dict(self.archive_sizes),
+                **self.gauges,
+            }
+
+    def prometheus(self) -> str:
+        """The metrics in the Prometheus text format."""
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self.lock:
+            metric("hoering_request_duration_seconds", "histogram", "Time until the response headers, per endpoint")
+            for endpoint, histogram in sorted(self.latency.items()):
+                for bound, count in histogram.cumulative():
+                    lines.append(
+                        f'hoering_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {count}'
+                    )
+                lines.append(f'hoering_request_duration_seconds_sum{{endpoint="{endpoint}"}} {histogram.sum}')
+                lines.append(f'hoering_request_duration_seconds_count{{endpoint="{endpoint}"}} {histogram.count}')
+
+            metric("hoering_transfer_duration_seconds", "histogram", "Time spent reading the body of streamed downloads, per endpoint")
+            for endpoint, histogram in sorted(self.transfer.items()):
+                for bound, count in histogram.cumulative():
+                    lines.append(
+                        f'hoering_transfer_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {count}'
+                    )
+                lines.append(f'hoering_transfer_duration_seconds_sum{{endpoint="{endpoint}"}} {histogram.sum}')
+                lines.append(f'hoering_transfer_duration_seconds_count{{endpoint="{endpoint}"}} {histogram.count}')
+
+            metric("hoering_response_bytes_total", "counter", "Bytes received on the wire, per endpoint")
+            for endpoint, n_bytes in sorted(self.bytes.items()):
+                lines.append(f'hoering_response_bytes_total{{endpoint="{endpoint}"}} {n_bytes}')
+
+            metric("hoering_cache_hits_total", "counter", "Responses served from the HTTP cache, per endpoint")
+            for endpoint, count in sorted(self.cache_hits.items()):
+                lines.append(f'hoering_cache_hits_total{{endpoint="{endpoint}"}} {count}')
+
+            metric("hoering_responses_total", "counter", "Responses per endpoint and status code")
+            for endpoint, statuses in sorted(self.statuses.items()):
+                for status, count in sorted(statuses.items()):
+                    lines.append(f'hoering_responses_total{{endpoint="{endpoint}",status="{status}"}} {count}')
+
+            metric("hoering_retries_total", "counter", "Retried requests per endpoint and reason")
+            for endpoint, reasons in sorted(self.retries.items()):
+                for reason, count in sorted(reasons.items()):
+                    lines.append(f'hoering_retries_total{{endpoint="{endpoint}",reason="{reason}"}} {count}')
+
+            metric("hoering_archive_bytes", "histogram", "Size of the zip file of a hearing")
+            histogram = Histogram(SIZE_BUCKETS)
+            for n_bytes in self.archive_sizes.values():
+                histogram.observe(n_bytes)
+            for bound, count in histogram.cumulative():
+                lines.append(f'hoering_archive_bytes_bucket{{le="{bound}"}} {count}')
+            lines.append(f"hoering_archive_bytes_sum {int(histogram.sum)}")
+            lines.append(f"hoering_archive_bytes_count {histogram.count}")
+
+            for name, value in sorted(self.gauges.items()):
+                metric(f"hoering_{name}", "gauge", name.replace("_", " "))
+                lines.append(f"hoering_{name} {value}")
+
+            metric("hoering_crawl_started_seconds", "gauge", "Start of the crawl as a unix timestamp")
+            lines.append(f"hoering_crawl_started_seconds {self.started}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, metrics_dir, name="crawl"):
+        """
+        Write {name}.prom (for the textfile collector of node_exporter) and {name}.json to metrics_dir.
+        The files are replaced atomically, so a collector never reads half a file.
+        """
+        metrics_dir = Path(metrics_dir)
+        metrics_dir.mkdir(parents=True, exist_ok=True)
+        for path, text in (
+            (metrics_dir / f"{name}.prom", self.prometheus()),
+            (metrics_dir / f"{name}.json", json.dumps(self.summary(), indent=2)),
+        ):
+            tmp_path = path.with_name(f"{path.name}.tmp")
+            with open(tmp_path, "w") as f:
+                f.write(text)
+            os.replace(tmp_path, path)
@@ -0,0 +1,209 @@
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = None):
+        """
+        A token bucket refilling `rate` tokens per second up to `capacity`.
+        Every request takes one token. When the bucket is empty the token is borrowed,
+        and the caller is told how long to wait before it may send the request.
+        Thread-safe, so it can be shared between worker threads and the event loop.
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token and return the number of seconds to wait before using it."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.rate)
+
+    def acquire(self):
+        time.sleep(self.reserve())
+
+    async def acquire_async(self):
+        await asyncio.sleep(self.reserve())
+
+
+class HostRateLimiter:
+    def __init__(self, rate: float, capacity: float = None):
+        """
+        One token bucket per host, shared by every request made through the scraper.
+        rate: requests per second allowed against a single host.
+        capacity: the burst size. Defaults to one second worth of requests.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, url: str) -> TokenBucket:
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.rate, self.capacity)
+            return self.buckets[host]
+
+    def acquire(self, url: str):
+        self.bucket(url).acquire()
+
+    async def acquire_async(self, url: str):
+        await self.bucket(url).acquire_async()
+
+
+class AdaptiveConcurrency:
+    def __init__(
+        self,
+        max_limit: int,
+        min_limit: int = 1,
+        initial_limit: float = None,
+        decrease_factor: float = 0.5,
+        latency_factor: float = 3.0,
+        cooldown: float = 2.0,
+        max_backoff: float = 120.0,
+    ):
+        """
+        An AIMD (additive increase, multiplicative decrease) controller of the number of requests in flight.
+        While responses are healthy the limit grows by one per limit-worth of responses.
+        On a 429 or 5xx response, a connection error, or latency above latency_factor times the best
+        latency seen, the limit is multiplied by decrease_factor (at most once per cooldown seconds).
+        Retries wait for Retry-After if the portal sends it, otherwise for an exponential backoff with full jitter.
+        With one request in flight (the sequential modes) the limit cannot change, so `pause` paces the requests
+        instead: a fixed interval that doubles with every unhealthy response in a row.
+
+        max_limit: the highest number of requests in flight.
+        min_limit: the lowest number of requests in flight.
+        initial_limit: the limit to start from. Defaults to min_limit.
+        """
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(initial_limit or min_limit)
+        self.decrease_factor = decrease_factor
+        self.latency_factor = latency_factor
+        self.cooldown = cooldown
+        self.max_backoff = max_backoff
+
+        self.in_flight = 0
+        self.latency = None
+        self.best_latency = None
+        self.last_decrease = 0.0
+        # Unhealthy responses since the last healthy one
+        self.strikes = 0
+        self.counts = {
+            "responses": 0,
+            "retries": 0,
+            "throttled": 0,
+            "errors": 0,
+            "decreases": 0,
+        }
+        self.condition = threading.Condition()
+
+    @property
+    def current_limit(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    def try_acquire(self) -> bool:
+        with self.condition:
+            if self.in_flight < self.current_limit:
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= self.current_limit:
+                self.condition.wait()
+            self.in_flight += 1
+
+    async def acquire_async(self, poll_interval=0.01):
+        while not self.try_acquire():
+            await asyncio.sleep(poll_interval)
+
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def record(self, status_code: Optional[int], latency: Optional[float] = None):
+        """
+        Record the outcome of a request. status_code is None for connection errors and timeouts.
+        """
+        with self.condition:
+            self.counts["responses"] += 1
+            unhealthy = status_code is None or status_code == 429 or status_code >= 500
+
+            if status_code == 429:
+                self.counts["throttled"] += 1
+            elif unhealthy:
+                self.counts["errors"] += 1
+
+            if latency is not None and not unhealthy:
+                self.latency = (
+                    latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+                )
+                self.best_latency = min(self.best_latency or self.latency, self.latency)
+                if self.latency > self.latency_factor * self.best_latency:
+                    unhealthy = True
+
+            self.strikes = self.strikes + 1 if unhealthy else 0
+            if unhealthy:
+                now = time.monotonic()
+                if now - self.last_decrease >= self.cooldown:
+                    self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                    self.last_decrease = now
+                    self.counts["decreases"] += 1
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.condition.notify_all()
+
+    def backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """
+        The number of seconds to wait before retry number `attempt` (starting from 0).
+        """
+        with self.condition:
+            self.counts["retries"] += 1
+
+        if retry_after:
+            try:
+                return min(self.max_backoff, float(retry_after))
+            except ValueError:
+                try:
+                    date = parsedate_to_datetime(retry_after)
+                    return min(
+                        self.max_backoff,
+                        max(0.0, date.timestamp() - time.time()),
+                    )
+                except (TypeError, ValueError):
+                    pass
+        return random.uniform(0, min(self.max_backoff, 2**attempt))
+
+    def pause(self, interval: float) -> float:
+        """
+        The number of seconds to wait before the next request of a sequential crawl:
+        interval while the portal is healthy, doubled for every unhealthy response in a row (up to max_backoff).
+        """
+        with self.condition:
+            return min(self.max_backoff, interval * 2**self.strikes)
+
+    def stats(self) -> dict:
+        with self.condition:
+            return {
+                "limit": self.current_limit,
+                "in_flight": self.in_flight,
+                "latency": self.latency,
+                **self.counts,
+            }
@@ -1,19 +1,46 @@
+import asyncio
 import datetime
 import json
 import os
 import re
 import subprocess
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Literal, Optional
-from zipfile import ZipFile
+from typing import Callable, Literal, Optional
+from urllib.parse import urljoin, urlparse
+from zipfile import BadZipFile, ZipFile
 
 import numpy as np
-import pandas as pd
 import requests
 from bs4 import BeautifulSoup as bs
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
 
+from hoering.blobstore import BlobStore
+from hoering.catalog import HearingCatalog
+from hoering.parser.file_convert.resources.remove_files_rules import match_rules
+from hoering.scraper.archive import ResponseArchive, reparse
+from hoering.scraper.cache import CachedSession
+from hoering.scraper.metadata import consolidate_meta
+from hoering.scraper.metrics import CrawlMetrics
+from hoering.scraper.meta import (
+    DETAILS_ONLY_FIELDS,
+    apply_filters,
+    build_meta,
+    make_filter,
+    missing_fields,
+    parse_details,
+)
+from hoering.scraper.ratelimit import AdaptiveConcurrency, HostRateLimiter
+from hoering.scraper.unzip import get_valid_filename, unzip_folder
+from hoering.scraper.workqueue import (
+    SQLiteLeaseStore,
+    SharedRateLimiter,
+    crawl_worker,
+    default_worker_id,
+)
+
 # Working with word docs
 # Through windows API and Word
 # import win32com.client
@@ -48,17 +75,168 @@ def get_year_array(n_years: Optional[int]) -> list[int]:
         return year_array
 
 
+BASE_URL = "https://hoeringsportalen.dk"
+
+SEARCH_HEADERS = {
+    "Host": "hoeringsportalen.dk",
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:80.0) Gecko/20100101 Firefox/80.0",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Accept-Language": "da,en;q=0.7,en-US;q=0.3",
+    "Accept-Encoding": "gzip, deflate, br",
+    "Referer": "https://hoeringsportalen.dk/About",
+    "Connection": "keep-alive",
+    "Upgrade-Insecure-Requests": "1",
+    "Cache-Control": "max-age=0",
+}
+
+# The keys the search API may use for the total number of matching hearings
+SEARCH_TOTAL_KEYS = ("TotalCount", "Total", "TotalHearings", "Count")
+
+
+def publication_date(hearing: dict) -> Optional[datetime.datetime]:
+    """The PublicationDate of a hearing from the search API (eg. 2024-05-01T00:00:00), or None if missing or unreadable."""
+    try:
+        return datetime.datetime.fromisoformat(hearing["PublicationDate"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def wire_bytes(response) -> int:
+    """The number of bytes of a response body received on the wire, before it is decompressed."""
+    try:
+        return response.raw.tell()
+    except AttributeError:
+        return len(response.content)
+
+
 class HPScraper:
-    def __init__(self):
+    def __init__(
+        self,
+        rate_limit: float = 2.0,
+        catalog: Optional[HearingCatalog] = None,
+        cache_dir=None,
+        archive_dir=None,
+        max_retries: int = 5,
+        base_url: str = BASE_URL,
+    ):
         """
         Starts a session and
         creates an empty list to store webpages.
+
+        rate_limit: the number of requests per second allowed against a host. In the sequential modes,
+            the interval between requests, stretched by the concurrency controller while the portal is unhealthy.
+        catalog: a HearingCatalog keeping the state of every hearing. If None, then state is kept in
+            subpages.json and read from the folders on disk.
+        cache_dir: a folder for an HTTP cache of the Details pages. If given, Details pages are
+            requested conditionally (ETag/Last-Modified), and unchanged pages are not parsed again.
+        archive_dir: a folder for a ResponseArchive. If given, every Details page and search response is archived,
+            so the metadata can be rebuilt offline with `archive.reparse`.
+        max_retries: the number of times a request is retried after a 429 or 5xx response or a connection error.
+        base_url: the address of the portal. Can be pointed at a local stand-in, eg. for benchmarks.
         """
-        self.session = requests.Session()
+        self.session = CachedSession(cache_dir) if cache_dir else requests.Session()
         self.subpages = []
+        self.rate_limiter = HostRateLimiter(rate_limit)
+        self.catalog = catalog
+        self.archive = ResponseArchive(archive_dir) if archive_dir else None
+        self.max_retries = max_retries
+        self.base_url = base_url.rstrip("/")
+        self.search_url = f"{self.base_url}/hearing/gethearings"
+        self.search_headers = {
+            **SEARCH_HEADERS,
+            "Host": urlparse(self.base_url).netloc,
+            "Referer": f"{self.base_url}/About",
+        }
+        # Adapts the number of requests in flight to the health of the portal.
+        # The upper limit is raised to the concurrency of the concurrent modes.
+        # The sequential modes keep one request in flight, and wait `controller.pause(interval)` between requests.
+        self.controller = AdaptiveConcurrency(max_limit=1)
+        self.interval = 1 / rate_limit
+        # Latencies, bytes, status codes and retries per endpoint, and the size of every zip file
+        self.metrics = CrawlMetrics()
+
+    def request(self, method, url, **kwargs):
+        """
+        Make a request through the session, under the adaptive concurrency limit.
+        429 and 5xx responses and connection errors are retried after the Retry-After header,
+        or an exponential backoff with jitter. The last response is returned, or the last error raised.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.controller.acquire()
+            start = time.monotonic()
+            error = None
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+            ) as e:
+                error = e
+            finally:
+                self.controller.release()
+            latency = time.monotonic() - start
+
+            if error is not None:
+                self.controller.record(None)
+                self.metrics.observe_request(url, None, latency)
+                if attempt == self.max_retries:
+                    raise error
+                self.metrics.retry(url, type(error).__name__)
+                time.sleep(self.controller.backoff(attempt))
+                continue
+
+            self.controller.record(response.status_code, latency)
+            self.metrics.observe_request(url, response.status_code, latency)
+            if getattr(response, "from_cache", False):
+                self.metrics.cache_hit(url)
+            elif not kwargs.get("stream"):
+                # Streamed bodies are counted as they are read, by download_file
+                self.metrics.add_bytes(url, wire_bytes(response))
+            if response.status_code != 429 and response.status_code < 500:
+                return response
+            if attempt == self.max_retries:
+                return response
+            self.metrics.retry(url, response.status_code)
+
+            retry_after = response.headers.get("Retry-After")
+            response.close()
+            time.sleep(self.controller.backoff(attempt, retry_after))
+
+    def set_concurrency(self, concurrency):
+        """Mount a connection pool for `concurrency` connections and let the controller grow up to it."""
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.controller.max_limit = concurrency
+
+    def report(self):
+        """Print the state of the concurrency controller and the HTTP cache."""
+        stats = self.controller.stats()
+        print(
+            f"Concurrency limit: {stats['limit']}, responses: {stats['responses']}, "
+            f"retries: {stats['retries']}, throttled (429): {stats['throttled']}, errors: {stats['errors']}"
+        )
+        if isinstance(self.session, CachedSession):
+            self.session.report()
+
+    def write_metrics(self, metrics_dir, name="crawl"):
+        """Write the metrics of the run as {name}.prom (Prometheus textfile) and {name}.json to metrics_dir."""
+        stats = self.controller.stats()
+        self.metrics.set_gauge("concurrency_limit", stats["limit"])
+        self.metrics.set_gauge("throttled_responses", stats["throttled"])
+        self.metrics.write(metrics_dir, name)
+        print("Saved metrics to:", metrics_dir)
 
     def get_subpages(
-        self, total=np.inf, page_size=500, years: Optional[int] = None, query: str = ""
+        self,
+        total=np.inf,
+        page_size=500,
+        years: Optional[int] = None,
+        query: str = "",
+        known_ids: Optional[set] = None,
+        concurrency: Optional[int] = None,
+        since: Optional[str] = None,
+        hearing_types: Optional[list[str]] = None,
     ):
         """
         Collect all hearing-subpages from hoeringsportalen.dk.
@@ -67,75 +245,280 @@ class HPScraper:
         page_size: the number of hearings to collect per request.
         years: the number of years to iterate over. If None, then iterate over all years. From current year and back.
         query: the search query to use. If empty, then all hearings will be collected.
+        known_ids: hearing-ids collected in an earlier run. If given, stop at the first page containing only known hearings.
+        concurrency: the number of pages to request at once. If None, then pages are requested one at a time.
+            Not used together with known_ids or since, where pages have to be walked in order.
+        since: a PublicationDate. If given, stop after the first page reaching hearings published before it.
+            The pages are sorted by publication date, newest first, so the following pages only hold older hearings.
+        hearing_types: only collect hearings of these types. See `search_hearings`.
         """
+        since = publication_date({"PublicationDate": since})
+        if concurrency and known_ids is None and since is None:
+            self.get_subpages_parallel(
+                total, page_size, years, query, concurrency, hearing_types
+            )
+            return
 
         hearing_count = 0
 
-        request_headers = {
-            "Host": "hoeringsportalen.dk",
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:80.0) Gecko/20100101 Firefox/80.0",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-            "Accept-Language": "da,en;q=0.7,en-US;q=0.3",
-            "Accept-Encoding": "gzip, deflate, br",
-            "Referer": "https://hoeringsportalen.dk/About",
-            "Connection": "keep-alive",
-            "Upgrade-Insecure-Requests": "1",
-            "Cache-Control": "max-age=0",
-        }
-
         while True:
-            payload = {
-                "filters": {
-                    "SearchString": query,
-                    "SelectedHearingYears": get_year_array(years),
-                },  # "SelectedHearingTypes":["2","1"]
-                "skip": hearing_count,
-                "take": page_size,
-                "sortParameter": "PublicationDate",
-                "sortAscending": "false",
-            }
-
-            response = self.session.post(
-                "https://hoeringsportalen.dk/hearing/gethearings",
-                json=payload,
-                headers=request_headers,
-            )
-
-            hearings = json.loads(response.text)["Hearings"]
+            hearings = self.search_hearings(
+                hearing_count, page_size, years, query, hearing_types
+            )["Hearings"]
 
             if len(hearings) == 0 or len(self.subpages) >= total:
                 print(f"Finished collecting {len(self.subpages)} subpages")
                 break
+            elif known_ids is not None and all(h["Id"] in known_ids for h in hearings):
+                print(
+                    f"Reached already collected hearings. Finished collecting {len(self.subpages)} subpages"
+                )
+                break
             else:
                 self.subpages += hearings
 
-            hearing_count += 500
+            oldest = publication_date(hearings[-1])
+            if since is not None and oldest is not None and oldest < since:
+                print(
+                    f"Reached hearings published before {since:%Y-%m-%d}. "
+                    f"Finished collecting {len(self.subpages)} subpages"
+                )
+                break
+
+            hearing_count += page_size
 
             print(f"Collected {hearing_count} hearing subpages", end="\r")
 
-            time.sleep(0.5)
+            time.sleep(self.controller.pause(self.interval))
 
-    def save_subpages(self, file_name):
+    def get_subpages_parallel(
+        self, total, page_size, years, query, concurrency, hearing_types=None
+    ):
         """
-        Save the subpages as a json file.
+        Parallel version of `get_subpages`. The first page tells how many hearings there are,
+        and the remaining skip-windows are then requested concurrently, paced by the per-host rate limiter.
+        If the portal does not report a total, windows are requested in batches until an empty page comes back.
+        The pages are put back together in order and de-duplicated by hearing-id.
         """
+        first_page = self.search_hearings(0, page_size, years, query, hearing_types)
+        pages = {0: first_page["Hearings"]}
+        hearing_total = next(
+            (first_page[k] for k in SEARCH_TOTAL_KEYS if k in first_page), None
+        )
+        if total != np.inf:
+            hearing_total = min(hearing_total or total, total)
+
+        self.set_concurrency(concurrency)
+
+        def fetch(skip):
+            self.rate_limiter.acquire(self.search_url)
+            return skip, self.search_hearings(
+                skip, page_size, years, query, hearing_types
+            )["Hearings"]
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            if hearing_total is not None:
+                skips = range(page_size, int(hearing_total), page_size)
+                for skip, hearings in tqdm(
+                    pool.map(fetch, skips),
+                    total=len(skips),
+                    smoothing=0,
+                    desc="Collecting subpages",
+                ):
+                    pages[skip] = hearings
+            elif pages[0]:
+                # Unknown total: request a batch of windows at a time until a page is empty
+                skip = page_size
+                while True:
+                    batch = range(skip, skip + concurrency * page_size, page_size)
+                    results = dict(pool.map(fetch, batch))
+                    pages.update(results)
+                    print(f"Collected {len(pages) * page_size} hearing subpages", end="\r")
+                    if any(len(results[s]) == 0 for s in batch):
+                        break
+                    skip += concurrency * page_size
+
+        seen = set()
+        subpages = []
+        for skip in sorted(pages):
+            for hearing in pages[skip]:
+                if hearing["Id"] not in seen:
+                    seen.add(hearing["Id"])
+                    subpages.append(hearing)
+
+        if total != np.inf:
+            subpages = subpages[: int(total)]
+        self.subpages += subpages
+        print(f"Finished collecting {len(self.subpages)} subpages")
+        self.report()
+
+    def search_hearings(
+        self,
+        skip,
+        page_size=500,
+        years: Optional[int] = None,
+        query: str = "",
+        hearing_types: Optional[list[str]] = None,
+    ):
+        """
+        Request a single page of hearings from the search API of hoeringsportalen.dk.
+        hearing_types: the ids of the hearing types to search for (SelectedHearingTypes), eg. ["1", "2"].
+            If None, then hearings of every type are returned.
+        Returns the decoded json response.
+        """
+        filters = {
+            "SearchString": query,
+            "SelectedHearingYears": get_year_array(years),
+        }
+        if hearing_types:
+            filters["SelectedHearingTypes"] = [str(x) for x in hearing_types]
+        payload = {
+            "filters": filters,
+            "skip": skip,
+            "take": page_size,
+            "sortParameter": "PublicationDate",
+            "sortAscending": "false",
+        }
+
+        response = self.request(
+            "POST",
+            self.search_url,
+            json=payload,
+            headers=self.search_headers,
+        )
+
+        if self.archive:
+            key = json.dumps(payload, sort_keys=True)
+            self.archive.put("search", key, response.content, self.search_url)
+
+        return json.loads(response.text)
+
+    def save_subpages(self, file_name=None):
+        """
+        Save the subpages as a json file, or to the catalog if the scraper has one.
+        """
+        if self.catalog:
+            self.catalog.add_hearings(self.subpages)
+            return
+
         with open(file_name, "w") as f:
             f.write(json.dumps(self.subpages))
 
-    def load_subpages(self, file_name):
+    def load_subpages(self, file_name=None):
         """
-        Load the subpages from a json file.
+        Load the subpages from a json file, or from the catalog if the scraper has one.
         """
+        if self.catalog:
+            self.subpages = self.catalog.subpages()
+            return
+
         with open(file_name, "r") as f:
             self.subpages = json.load(f)
 
-    def populate(self, mainpath, zip_files=True):
+    def update_subpages(
+        self,
+        file_name=None,
+        state_file=None,
+        years: Optional[int] = None,
+        query: str = "",
+        hearing_types: Optional[list[str]] = None,
+    ):
+        """
+        Incremental version of `get_subpages` + `save_subpages`.
+        Only pages through the hearings published since the last run, and merges them into the stored subpages.
+        The high-water mark (last seen publication date and the set of collected hearing-ids) is kept in state_file,
+        or in the catalog if the scraper has one. Paging stops at the first page holding only known hearings,
+        or reaching hearings published before the last seen publication date.
+
+        file_name: the subpages file to update. Required without a catalog.
+        state_file: the json file holding the high-water mark. Required without a catalog.
+        years: the number of years to iterate over. If None, then iterate over all years. From current year and back.
+        query: the search query to use. If empty, then all hearings will be collected.
+        hearing_types: only collect hearings of these types. See `search_hearings`.
+
+        Returns: the hearings not seen in an earlier run.
+        """
+        if not self.catalog and (file_name is None or state_file is None):
+            raise ValueError(
+                "update_subpages needs file_name and state_file when the scraper has no catalog"
+            )
+
+        stored = []
+        state = {"last_publication_date": None, "ids": []}
+
+        if self.catalog:
+            state = self.catalog.get_state("high_water_mark", state)
+            known_ids = self.catalog.ids()
+        else:
+            if os.path.exists(file_name):
+                with open(file_name, "r") as f:
+                    stored = json.load(f)
+            if os.path.exists(state_file):
+                with open(state_file, "r") as f:
+                    state = json.load(f)
+
+            # Hearings in the stored subpages count as known, also when the state file is missing
+            known_ids = set(state["ids"]) | {x["Id"] for x in stored}
+
+        self.subpages = []
+        self.get_subpages(
+            years=years,
+            query=query,
+            known_ids=known_ids,
+            since=state["last_publication_date"],
+            hearing_types=hearing_types,
+        )
+        new_hearings = [x for x in self.subpages if x["Id"] not in known_ids]
+        fetched_ids = {x["Id"] for x in self.subpages}
+
+        if self.subpages:
+            state["last_publication_date"] = self.subpages[0].get(
+                "PublicationDate", state["last_publication_date"]
+            )
+
+        if self.catalog:
+            # The catalog rows are the id set, so only the publication date is kept as state
+            self.catalog.add_hearings(self.subpages)
+            self.catalog.set_state(
+                "high_water_mark",
+                {"last_publication_date": state["last_publication_date"]},
+            )
+            self.subpages = self.catalog.subpages()
+        else:
+            # Newest first, as returned by the portal. Fresh rows replace stored rows with the same id.
+            self.subpages = self.subpages + [
+                x for x in stored if x["Id"] not in fetched_ids
+            ]
+            self.save_subpages(file_name)
+
+            state["ids"] = sorted(known_ids | fetched_ids)
+            with open(state_file, "w") as f:
+                json.dump(state, f)
+
+        print(f"Found {len(new_hearings)} new hearings, {len(self.subpages)} in total")
+        return new_hearings
+
+    def populate(
+        self,
+        mainpath,
+        zip_files=True,
+        concurrency: Optional[int] = None,
+        meta_from_search=False,
+        filters: Optional[list[Callable[[dict], bool]]] = None,
+    ):
         """
         Download .zip-files & metadata (.json format) from the subpages, and store them in folders named after the hearing-id from the subpages file.
         Skips already collected folders.
         Params:
             mainpath: the folder in which the folders and content from the subpages will be created.
             zip_files: whether to download the zip files or not. If False just download metadata.
+            concurrency: the number of requests in flight at once. If None, then hearings are fetched one at a time.
+                If set, requests are paced by the shared per-host rate limit, otherwise by `controller.pause`.
+            meta_from_search: build the metadata from the search results in the subpages instead of the Details page.
+                The Details page is only fetched for hearings where the search results lack a required field.
+                Fields only found on the Details page can be filled in later with `complete_meta`.
+            filters: predicates on the hearings in the subpages (eg. made with `meta.make_filter`).
+                Only hearings matching all of them are populated, so nothing is downloaded for the rest.
 
         """
         Path(mainpath).mkdir(exist_ok=True)
@@ -143,18 +526,40 @@ class HPScraper:
         if not zip_files:
             done = []
             desc = "Updating meta-data"
+        elif self.catalog:
+            done = self.catalog.done("zip_downloaded")
+            desc = "Populating folders"
         else:
-            # Get the hearing-id of the folders already created
+            # Get the hearing-id of the folders already holding a complete zip file.
+            # Interrupted downloads only leave a .part file, so they are resumed.
             done = os.listdir(mainpath)
-            done = [int(x) for x in done if x.isnumeric()]
+            done = {
+                int(x)
+                for x in done
+                if x.isnumeric() and os.path.exists(f"{mainpath}/{x}/{x}.zip")
+            }
             desc = "Populating folders"
 
+        hearings = {x["Id"]: x for x in self.subpages}
+        ids = [
+            x["Id"]
+            for x in apply_filters(
+                [x for x in self.subpages if x["Id"] not in done], filters or []
+            )
+        ]
+        if filters:
+            print(f"{len(ids)} hearings left to populate after filtering")
+
+        if concurrency:
+            asyncio.run(
+                self.populate_async(
+                    mainpath, ids, zip_files, concurrency, desc, hearings, meta_from_search
+                )
+            )
+            return
+
         # Loop over the rest of the hearing-ids
-        for _id in tqdm(
-            [x["Id"] for x in self.subpages if x["Id"] not in done],
-            smoothing=0,
-            desc=desc,
-        ):
+        for _id in tqdm(ids, smoothing=0, desc=desc):
             # The path for the new folder to save the content.
             path = f"{mainpath}/{_id}"
 
@@ -164,68 +569,476 @@ class HPScraper:
             except FileExistsError:
                 pass
 
-            # Get the content from the url of the hearing
-            url = f"https://hoeringsportalen.dk/Hearing/Details/{_id}"
-            r = self.session.get(url)
+            meta_info = build_meta(hearings[_id]) if meta_from_search else None
 
-            # Meta info:
-            fieldset = bs(r.content, features="lxml").find("fieldset")
-            details = fieldset.find("h3", {"class": "Høringsdetaljer"})
-            containers = fieldset.find_all("div", {"class": "fieldContainer"})
-            meta_info = {k.label.text.strip(): k.span.text.strip() for k in containers}
-            meta_info["details"] = details if details else ""
-
-            with open(f"{path}/{_id}_meta.json", "w") as f:
-                json.dump(meta_info, f)
+            if meta_info and not missing_fields(meta_info):
+                self.write_meta(path, _id, meta_info)
+            else:
+                # Get the content from the url of the hearing
+                r = self.request("GET", self.details_url(_id))
+                if not self.is_unchanged(r, path, _id):
+                    self.save_meta(path, _id, r.content)
 
-            time.sleep(0.5)
+                time.sleep(self.controller.pause(self.interval))
 
             if zip_files:
                 # Zip file:
-                r = self.session.get(
-                    f"https://hoeringsportalen.dk/Hearing/DownloadDocumentsAsZipFile?hearingId={_id}&includeHidden=False"
+                self.save_zip(self.zip_url(_id), path, _id)
+
+                time.sleep(self.controller.pause(self.interval))
+
+        self.report()
+
+    async def populate_async(
+        self, mainpath, ids, zip_files, concurrency, desc, hearings, meta_from_search
+    ):
+        """
+        Concurrent version of `populate`. At most `concurrency` requests are in flight at once,
+        and every request waits for a token from the per-host rate limiter.
+        Blocking work (requests, parsing and writing files) runs in a thread pool of the same size.
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        # Allow as many pooled connections as there are requests in flight
+        self.set_concurrency(concurrency)
+
+        async def fetch(url, func, *args):
+            async with semaphore:
+                await self.rate_limiter.acquire_async(url)
+                return await loop.run_in_executor(pool, func, *args)
+
+        async def populate_hearing(_id):
+            path = f"{mainpath}/{_id}"
+            os.makedirs(path, exist_ok=True)
+
+            meta_info = build_meta(hearings[_id]) if meta_from_search else None
+
+            if meta_info and not missing_fields(meta_info):
+                await loop.run_in_executor(pool, self.write_meta, path, _id, meta_info)
+            else:
+                url = self.details_url(_id)
+                r = await fetch(url, self.request, "GET", url)
+                if not self.is_unchanged(r, path, _id):
+                    await loop.run_in_executor(pool, self.save_meta, path, _id, r.content)
+
+            if zip_files:
+                url = self.zip_url(_id)
+                await fetch(url, self.save_zip, url, path, _id)
+            return _id
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            tasks = [asyncio.ensure_future(populate_hearing(_id)) for _id in ids]
+            for task in tqdm(
+                asyncio.as_completed(tasks), total=len(tasks), smoothing=0, desc=desc
+            ):
+                try:
+                    await task
+                except Exception as e:
+                    print(e)
+
+        self.report()
+
+    def populate_hearing(
+        self, mainpath, _id, hearing=None, zip_files=True, meta_from_search=False
+    ):
+        """
+        Download the metadata and zip file of a single hearing, paced by the per-host rate limiter.
+        The metadata and zip file are skipped if they are already in the folder.
+        Used by the pipeline runner, which feeds hearings one at a time from several threads.
+
+        hearing: the hearing from the subpages, for `meta_from_search`.
+        Returns the hearing-id.
+        """
+        path = f"{mainpath}/{_id}"
+        os.makedirs(path, exist_ok=True)
+
+        if not os.path.exists(f"{path}/{_id}_meta.json"):
+            meta_info = build_meta(hearing) if meta_from_search and hearing else None
+            if meta_info and not missing_fields(meta_info):
+                self.write_meta(path, _id, meta_info)
+            else:
+                url = self.details_url(_id)
+                self.rate_limiter.acquire(url)
+                r = self.request("GET", url)
+                if not self.is_unchanged(r, path, _id):
+                    self.save_meta(path, _id, r.content)
+
+        if zip_files and not os.path.exists(f"{path}/{_id}.zip"):
+            url = self.zip_url(_id)
+            self.rate_limiter.acquire(url)
+            self.save_zip(url, path, _id)
+        return _id
+
+    def populate_documents(
+        self,
+        mainpath,
+        patterns: list[str],
+        apply_remove_rules=False,
+        concurrency: int = 4,
+        filters: Optional[list[Callable[[dict], bool]]] = None,
+    ):
+        """
+        Download only the documents of each hearing that are needed downstream, instead of the whole zip file.
+        The document listing is read from the Details page (which is also saved as metadata),
+        and the selected documents are downloaded individually and in parallel into the hearing folder,
+        with the same file names as `unzip` gives them.
+        A hearing is done once all its selected documents are downloaded, which is recorded in {_id}_documents.json
+        (or the catalog). Hearings with a failed document are tried again on the next run.
+        Params:
+            mainpath: the folder in which the hearing folders are created.
+            patterns: keep documents whose name contains one of these, eg. ["liste"] for NGO extraction or ["svar"].
+            apply_remove_rules: also leave out documents matched by remove_files_rules.match_rules,
+                which FileConverter would delete anyway.
+            concurrency: the number of documents downloaded at once.
+            filters: predicates on the hearings in the subpages. See `populate`.
+        """
+        Path(mainpath).mkdir(exist_ok=True)
+        if self.catalog:
+            done = self.catalog.done("unzipped")
+        else:
+            # A hearing is done once its documents manifest is written, also when no document matched
+            done = {
+                int(x)
+                for x in os.listdir(mainpath)
+                if x.isnumeric() and os.path.exists(self.documents_path(f"{mainpath}/{x}", x))
+            }
+
+        ids = [
+            x["Id"]
+            for x in apply_filters(
+                [x for x in self.subpages if x["Id"] not in done], filters or []
+            )
+        ]
+
+        self.set_concurrency(concurrency)
+
+        def download(url, file_path):
+            self.rate_limiter.acquire(url)
+            return self.download_file(url, file_path)
+
+        n_documents = 0
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for _id in tqdm(ids, smoothing=0, desc="Downloading documents"):
+                path = f"{mainpath}/{_id}"
+                os.makedirs(path, exist_ok=True)
+
+                url = self.details_url(_id)
+                self.rate_limiter.acquire(url)
+                r = self.request("GET", url)
+                if not self.is_unchanged(r, path, _id):
+                    self.save_meta(path, _id, r.content)
+
+                documents = self.select_documents(
+                    self.parse_documents(r.content), patterns, apply_remove_rules
                 )
+                files = [self.get_valid_filename(name) for name, _ in documents]
+                futures = [
+                    pool.submit(download, doc_url, f"{path}/{file}")
+                    for (_, doc_url), file in zip(documents, files)
+                ]
 
-                with open(f"{path}/{_id}.zip", "wb") as f:
-                    f.write(r.content)
+                # Wait for every download, so a failed one does not leave the others running into the next hearing
+                sizes, failed = [], []
+                for (name, _), future in zip(documents, futures):
+                    try:
+                        sizes.append(future.result())
+                    except Exception as e:
+                        failed.append(name)
+                        print(_id, name, e)
+                if failed:
+                    # No manifest, so the hearing is tried again on the next run
+                    print(f"{_id}: {len(failed)} of {len(documents)} documents failed")
+                    continue
 
-                time.sleep(0.5)
+                self.write_documents_manifest(
+                    path,
+                    _id,
+                    [
+                        {"name": name, "file": file, "size": size}
+                        for (name, _), file, size in zip(documents, files, sizes)
+                    ],
+                )
+                n_documents += len(documents)
+                if self.catalog:
+                    self.catalog.mark(_id, "unzipped", sum(sizes))
 
-    def get_valid_filename(self, s):
+        print(f"Downloaded {n_documents} documents from {len(ids)} hearings")
+        self.report()
+
+    def documents_path(self, path, _id):
+        return f"{path}/{_id}_documents.json"
+
+    def write_documents_manifest(self, path, _id, documents: list[dict]):
         """
-        Return the given string converted to a string that can be used for a clean
-        filename. Remove leading and trailing spaces; convert other spaces to
-        underscores; and remove anything that is not an alphanumeric, dash,
-        underscore, or dot.
-        >>> get_valid_filename("john's portrait in 2004.jpg")
-        'johns_portrait_in_2004.jpg'
+        Record that every selected document of a hearing was downloaded by `populate_documents`,
+        as {_id}_documents.json with the name, file name and size of each document (empty if none matched).
         """
-        if len(s) > 100:
-            s = s[:100] + "." + s.split(".")[-1]
+        tmp_path = f"{self.documents_path(path, _id)}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"documents": documents}, f)
+        os.replace(tmp_path, self.documents_path(path, _id))
 
-        s = str(s).strip().replace(" ", "_")
+    def parse_documents(self, content) -> list[tuple[str, str]]:
+        """
+        Read the document listing from the Details page of a hearing.
+        Returns a list of (file name, url) for each document.
+        """
+        soup = bs(content, features="lxml")
+        documents = []
+        for link in soup.find_all("a", href=True):
+            href = link["href"]
+            if "Download" not in href or "DownloadDocumentsAsZipFile" in href:
+                continue
 
-        return re.sub(r"(?u)[^-\w.]", "�", s)
+            name = link.get("title") or link.text
+            name = name.strip()
+            if not os.path.splitext(name)[1]:
+                # Fall back to the last part of the url, if the link text is not a file name
+                name = href.split("?")[0].rstrip("/").split("/")[-1] or name
 
-    def unzip(self, mainpath):
-        filepath = mainpath
-        dirs = os.listdir(filepath)
+            documents.append((name, urljoin(self.base_url, href)))
+        return documents
 
-        for folder in tqdm(dirs, smoothing=0.1, desc="Unzipping data"):
-            if len(os.listdir(filepath / folder)) > 2:
+    def select_documents(self, documents, patterns, apply_remove_rules=False):
+        """
+        Keep the documents whose name contains one of the patterns (case-insensitive).
+        If apply_remove_rules, documents matched by remove_files_rules.match_rules are left out as well.
+        """
+        selected = []
+        for name, url in documents:
+            if not any(p.lower() in name.lower() for p in patterns):
                 continue
-            else:
+            if apply_remove_rules and match_rules(os.path.splitext(name)[0]):
+                continue
+            selected.append((name, url))
+        return selected
+
+    def details_url(self, _id):
+        return f"{self.base_url}/Hearing/Details/{_id}"
+
+    def zip_url(self, _id):
+        return f"{self.base_url}/Hearing/DownloadDocumentsAsZipFile?hearingId={_id}&includeHidden=False"
+
+    def parse_meta(self, content):
+        """
+        Parse the meta info of a hearing from the content of its Details page.
+        """
+        return parse_details(content)
+
+    def save_meta(self, path, _id, content):
+        """
+        Parse the Details page of a hearing and save the meta info as {_id}_meta.json in path.
+        """
+        if self.archive:
+            self.archive.put("details", _id, content, self.details_url(_id))
+
+        meta_info = self.parse_meta(content)
+        self.write_meta(path, _id, meta_info, len(content))
+
+    def is_unchanged(self, response, path, _id):
+        """
+        Whether the Details page was not modified since it was cached (HTTP 304) and its meta info is already saved.
+        """
+        return response.status_code == 304 and os.path.exists(
+            f"{path}/{_id}_meta.json"
+        )
+
+    def write_meta(self, path, _id, meta_info, n_bytes=None):
+        with open(f"{path}/{_id}_meta.json", "w") as f:
+            json.dump(meta_info, f)
+
+        if self.catalog:
+            self.catalog.mark(_id, "meta_fetched", n_bytes)
+
+    def needs_details(self, meta_info, fields=DETAILS_ONLY_FIELDS):
+        """Whether meta info was built from the search results and lacks one of `fields`."""
+        return meta_info.get("source") == "search" and bool(missing_fields(meta_info, fields))
+
+    def load_meta(self, mainpath, _id, fields=DETAILS_ONLY_FIELDS):
+        """
+        Load the meta info of a hearing. If it was built from the search results and one of `fields` is missing,
+        the Details page is fetched, and the meta info is completed and saved.
+        """
+        path = f"{mainpath}/{_id}"
+        with open(f"{path}/{_id}_meta.json", "r") as f:
+            meta_info = json.load(f)
+
+        if self.needs_details(meta_info, fields):
+            self.rate_limiter.acquire(self.details_url(_id))
+            r = self.request("GET", self.details_url(_id))
+            if self.archive:
+                self.archive.put("details", _id, r.content, self.details_url(_id))
+            meta_info = {**meta_info, **self.parse_meta(r.content), "source": "details"}
+            self.write_meta(path, _id, meta_info, len(r.content))
+
+        return meta_info
+
+    def save_zip(self, url, path, _id):
+        """
+        Download the zip file of a hearing as {_id}.zip in path.
+        """
+        n_bytes = self.download_zip(url, f"{path}/{_id}.zip")
+        self.metrics.archive_size(_id, n_bytes)
+
+        if self.catalog:
+            self.catalog.mark(_id, "zip_downloaded", n_bytes)
+
+    def download_zip(self, url, zip_path, chunk_size=1024 * 1024, retries=3):
+        """
+        Stream a zip file to `{zip_path}.part` and move it to zip_path once it is complete.
+        A .part file left by an interrupted download is resumed with an HTTP Range request.
+        The finished file is checked against the size reported by the server and with ZipFile.testzip,
+        so a truncated or corrupt archive never ends up as {_id}.zip.
+        Params:
+            url: the url of the zip file.
+            zip_path: where to save the zip file.
+            chunk_size: the number of bytes held in memory at a time.
+            retries: the number of times to resume after a dropped connection.
+        """
+        return self.download_file(
+            url, zip_path, chunk_size=chunk_size, retries=retries, verify_zip=True
+        )
+
+    def download_file(
+        self, url, file_path, chunk_size=1024 * 1024, retries=3, verify_zip=False
+    ):
+        """
+        Stream a file to `{file_path}.part`, resuming an earlier .part file with an HTTP Range request,
+        and move it to file_path once it is complete. See `download_zip`.
+        verify_zip: check the downloaded file with ZipFile.testzip before moving it.
+        Returns the size of the file in bytes.
+        """
+        part_path = f"{file_path}.part"
+
+        for attempt in range(retries + 1):
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+            try:
+                with self.request("GET", url, headers=headers, stream=True) as r:
+                    if r.status_code == 416:
+                        # The .part file already holds the whole file
+                        expected_size = offset
+                    else:
+                        r.raise_for_status()
+                        if r.status_code == 206:
+                            mode = "ab"
+                        else:
+                            # The server ignored the Range header, start over
+                            mode, offset = "wb", 0
+
+                        expected_size = self.expected_size(r, offset)
+
+                        started = time.monotonic()
+                        with open(part_path, mode) as f:
+                            for chunk in r.iter_content(chunk_size=chunk_size):
+                                f.write(chunk)
+                                self.metrics.add_bytes(url, len(chunk))
+                        self.metrics.observe_transfer(url, time.monotonic() - started)
+                break
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.ChunkedEncodingError,
+                requests.exceptions.Timeout,
+            ) as e:
+                if attempt == retries:
+                    raise
+                self.metrics.retry(url, type(e).__name__)
+                time.sleep(self.controller.backoff(attempt))
+
+        size = os.path.getsize(part_path)
+        if expected_size is not None and size != expected_size:
+            raise IOError(
+                f"Incomplete download of {file_path}: {size} of {expected_size} bytes"
+            )
+
+        if verify_zip:
+            try:
+                with ZipFile(part_path, "r") as zf:
+                    bad_member = zf.testzip()
+            except BadZipFile:
+                os.remove(part_path)
+                raise
+            if bad_member is not None:
+                os.remove(part_path)
+                raise BadZipFile(f"CRC check failed for {bad_member} in {file_path}")
+
+        os.replace(part_path, file_path)
+        return size
+
+    def expected_size(self, response, offset):
+        """
+        The total size of a file from the Content-Range or Content-Length header of a response, if known.
+        """
+        content_range = response.headers.get("Content-Range", "")
+        if "/" in content_range and not content_range.endswith("/*"):
+            return int(content_range.rsplit("/", 1)[1])
+        if "Content-Length" in response.headers and not response.headers.get(
+            "Content-Encoding"
+        ):
+            return offset + int(response.headers["Content-Length"])
+        return None
+
+    def get_valid_filename(self, s):
+        return get_valid_filename(s)
+
+    def unzip(
+        self, mainpath, workers: Optional[int] = None, verify=False, store_dir=None
+    ):
+        """
+        Extract the zip files of the hearing folders with a process pool.
+        A folder counts as unzipped when its manifest ({id}_manifest.json) lists every extracted file
+        with the right size, so interrupted folders are resumed and nothing else is extracted twice.
+
+        mainpath: the folder holding the hearing folders.
+        workers: the number of worker processes. Defaults to the number of CPUs.
+        verify: also check the CRC of every extracted file against the manifest.
+        store_dir: the root of a BlobStore. If given, identical files are stored once and linked into the folders.
+        """
+        filepath = Path(mainpath)
+
+        if self.catalog:
+            # Only the downloaded hearings which are not unzipped yet
+            dirs = [
+                str(x) for x in self.catalog.pending("unzipped", after="zip_downloaded")
+            ]
+        else:
+            dirs = [
+                x
+                for x in os.listdir(filepath)
+                if os.path.exists(filepath / x / f"{x}.zip")
+            ]
+
+        skipped = 0
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            futures = {
+                pool.submit(unzip_folder, filepath / folder, verify, store_dir): folder
+                for folder in dirs
+            }
+            for future in tqdm(
+                as_completed(futures),
+                total=len(futures),
+                smoothing=0.1,
+                desc="Unzipping data",
+            ):
                 try:
-                    with ZipFile(filepath / folder / f"{folder}.zip", "r") as zf:
-                        for file in zf.namelist():
-                            org_file = file
-                            file = self.get_valid_filename(file)
-                            with open(
-                                filepath / folder / file, "wb"
-                            ) as f:  # open the output path for writing
-                                f.write(zf.read(org_file))
+                    folder, n_bytes, was_unzipped = future.result()
                 except Exception as e:
-                    print(folder, e)
+                    print(futures[future], e)
+                    continue
+                skipped += was_unzipped
+                if self.catalog:
+                    self.catalog.mark(folder, "unzipped", n_bytes)
+
+        if skipped:
+            print(f"{skipped} folders were already unzipped")
+        if store_dir:
+            summary = BlobStore(store_dir).summary()
+            print(
+                f"Blob store: {summary['references']} files, {summary['blobs']} unique, "
+                f"{summary['bytes_saved'] / 1e6:.1f} MB saved"
+            )
 
     def word_to_PDF(self, file, engine: Literal["win32", "soffice"] = "soffice"):
         """
@@ -281,24 +1094,44 @@ class HPScraper:
                     else:
                         extra_files.append(file)
 
-    def meta_extract(self, mainpath, savefile):
+    def complete_meta(self, mainpath, fields=DETAILS_ONLY_FIELDS):
         """
-        Extract meta data from the folders and save them to a .csv file
+        Fetch the Details page of the hearings whose meta info was built from the search results (`meta_from_search`)
+        and lacks one of `fields`, and complete their meta info (`load_meta`). Returns the number of Details pages fetched.
         """
-        dirs = os.listdir(mainpath)
-
-        file_list = [f"{mainpath}/{folder}/{folder}_meta.json" for folder in dirs]
+        todo = []
+        for folder in os.listdir(mainpath):
+            meta_path = f"{mainpath}/{folder}/{folder}_meta.json"
+            if not folder.isnumeric() or not os.path.exists(meta_path):
+                continue
+            with open(meta_path, "r") as f:
+                if self.needs_details(json.load(f), fields):
+                    todo.append(int(folder))
 
-        dfs = []  # an empty list to store the data frames
-        for file in tqdm(file_list, desc="Merging metadata", smoothing=0):
-            data = pd.read_json(file, lines=True)  # read data frame from json file
-            data["Høringsnr"] = re.findall(r"\d+", file)[0]
-            dfs.append(data)  # append the data frame to the list
+        fetched = 0
+        for _id in tqdm(todo, smoothing=0, desc="Completing meta-data"):
+            try:
+                self.load_meta(mainpath, _id, fields)
+            except Exception as e:
+                print(_id, e)
+                continue
+            fetched += 1
+        print(f"Fetched {fetched} Details pages to complete the meta-data")
+        return fetched
 
-        temp = pd.concat(
-            dfs, ignore_index=True
-        )  # concatenate all the data frames in the list.
-        temp.to_csv(savefile)
+    def meta_extract(
+        self, mainpath, savefile, workers=None, incremental=True, complete=False
+    ):
+        """
+        Consolidate the meta data of the folders into a typed Parquet dataset. See `metadata.consolidate_meta`.
+        complete: first fetch the fields only found on the Details page for hearings built from the search results
+            (`complete_meta`). With incremental, hearings already in the dataset keep the meta info they had.
+        """
+        if complete:
+            self.complete_meta(mainpath)
+        return consolidate_meta(
+            mainpath, savefile, workers=workers, incremental=incremental
+        )
 
 
 def parse_args():
@@ -306,6 +1139,18 @@ def parse_args():
 
     parser = argparse.ArgumentParser()
     parser.add_argument("--data-dir", type=Path, required=True)
+    parser.add_argument(
+        "--catalog",
+        action="store_true",
+        default=False,
+        help="Keep the state of every hearing in data-dir/catalog.sqlite instead of subpages.json and the folders",
+    )
+    parser.add_argument(
+        "--import-catalog",
+        action="store_true",
+        default=False,
+        help="Fill the catalog from subpages.json and the hearing folders of an earlier run",
+    )
     parser.add_argument(
         "--all",
         action="store_true",
@@ -324,6 +1169,12 @@ def parse_args():
         default=None,
         help="Number of hearing years to iterate over. Goes from current year and back.",
     )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        default=False,
+        help="Only collect hearings published since the last run and merge them into subpages.json",
+    )
     parser.add_argument("--save-subpages", action="store_true", default=False)
     parser.add_argument("--load-subpages", action="store_true", default=False)
     parser.add_argument(
@@ -332,11 +1183,109 @@ def parse_args():
         default=False,
         help="Collect data (metadata and attachments) from the subpages",
     )
+    parser.add_argument(
+        "--documents",
+        type=lambda x: x.split(","),
+        default=None,
+        help="Comma-separated file name patterns, eg. 'liste'. If given, populate downloads only the matching documents instead of the zip files",
+    )
+    parser.add_argument(
+        "--apply-remove-rules",
+        action="store_true",
+        default=False,
+        help="With --documents: also skip documents that the file conversion removes with remove_files_rules",
+    )
+    parser.add_argument(
+        "--meta-from-search",
+        action="store_true",
+        default=False,
+        help="Build metadata from the search results, and only fetch the Details page when fields are missing",
+    )
+    parser.add_argument(
+        "--hearing-type",
+        nargs="+",
+        default=None,
+        help="Only populate hearings of these types (Høringstype), eg. Lovforslag",
+    )
+    parser.add_argument(
+        "--hearing-type-id",
+        nargs="+",
+        default=None,
+        help="Only collect hearings of these type ids, eg. 1 2. Filtered by the portal (SelectedHearingTypes), "
+        "so it applies to --get-subpages and --all",
+    )
+    parser.add_argument(
+        "--authority",
+        nargs="+",
+        default=None,
+        help="Only populate hearings from these authorities, eg. Skatteministeriet",
+    )
+    parser.add_argument(
+        "--since",
+        type=datetime.date.fromisoformat,
+        default=None,
+        help="Only populate hearings published on or after this date (YYYY-MM-DD)",
+    )
+    parser.add_argument(
+        "--until",
+        type=datetime.date.fromisoformat,
+        default=None,
+        help="Only populate hearings published on or before this date (YYYY-MM-DD)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=None,
+        help="Number of requests in flight at once when collecting subpages and populating. If not set, requests are made one at a time.",
+    )
+    parser.add_argument(
+        "--http-cache",
+        action="store_true",
+        default=False,
+        help="Cache Details pages in data-dir/http_cache and only re-parse them when they have changed",
+    )
+    parser.add_argument(
+        "--archive-responses",
+        action="store_true",
+        default=False,
+        help="Store every Details page and search response in a compressed archive in data-dir/raw_archive",
+    )
+    parser.add_argument(
+        "--reparse",
+        action="store_true",
+        default=False,
+        help="Rebuild all _meta.json files from the archive in data-dir/raw_archive, without network traffic",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes for --reparse, --unzip and --extract-meta. Defaults to the number of CPUs.",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=2.0,
+        help="Maximum number of requests per second against hoeringsportalen.dk when --concurrency is set.",
+    )
     parser.add_argument(
         "--extract-meta",
         action="store_true",
         default=False,
-        help="Extract metadata and save to metadata.csv",
+        help="Extract metadata and save to the Parquet dataset metadata.parquet. Only new hearing folders are read",
+    )
+    parser.add_argument(
+        "--rebuild-meta",
+        action="store_true",
+        default=False,
+        help="With --extract-meta: read every hearing folder again instead of only the new ones",
+    )
+    parser.add_argument(
+        "--complete-meta",
+        action="store_true",
+        default=False,
+        help="With --extract-meta: first fetch the Details page of hearings whose metadata was built with --meta-from-search "
+        "and lacks the fields only found there (contact person, remarks)",
     )
     parser.add_argument(
         "--unzip",
@@ -344,34 +1293,159 @@ def parse_args():
         default=False,
         help="Unzip all the collected attachments",
     )
+    parser.add_argument(
+        "--blob-store",
+        action="store_true",
+        default=False,
+        help="Store unzipped files once per content in data-dir/blobs and hardlink them into the hearing folders",
+    )
+    parser.add_argument(
+        "--work-queue",
+        type=Path,
+        default=None,
+        help="A shared work queue (SQLite, on a filesystem shared by the nodes) for a distributed crawl",
+    )
+    parser.add_argument(
+        "--fill-queue",
+        action="store_true",
+        default=False,
+        help="Add the hearings of subpages.json to the --work-queue",
+    )
+    parser.add_argument(
+        "--worker",
+        action="store_true",
+        default=False,
+        help="Fetch hearings leased from the --work-queue until it is empty. --rate-limit is shared by all workers",
+    )
+    parser.add_argument(
+        "--lease-seconds",
+        type=float,
+        default=900,
+        help="How long a worker holds a hearing before it is handed to another worker",
+    )
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        default=False,
+        help="Write request latencies, bytes, status codes, retries and zip sizes to data-dir/metrics (.prom and .json) at the end of the run",
+    )
     parser.add_argument(
         "--convert-to-pdf",
         action="store_true",
         default=False,
         help="Convert all lists to pdf file (from eg. .doc or .txt). The extractor only works on PDF files.",
     )
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.hearing_type_id and not (args.all or args.get_subpages):
+        parser.error("--hearing-type-id filters the search, so it needs --get-subpages or --all")
+    return args
 
 
 if __name__ == "__main__":
     args = parse_args()
 
-    hp_scraper = HPScraper()
-    if args.all or args.get_subpages:
-        hp_scraper.get_subpages(years=args.n_years)
+    catalog = None
+    if args.catalog or args.import_catalog:
+        catalog = HearingCatalog(args.data_dir / "catalog.sqlite")
+
+    hp_scraper = HPScraper(
+        rate_limit=args.rate_limit,
+        catalog=catalog,
+        cache_dir=args.data_dir / "http_cache" if args.http_cache else None,
+        archive_dir=args.data_dir / "raw_archive" if args.archive_responses else None,
+    )
+    if args.import_catalog:
+        with open(args.data_dir / "subpages.json", "r") as f:
+            catalog.add_hearings(json.load(f))
+        catalog.import_folders(args.data_dir / "hearings")
+    if (args.all or args.get_subpages) and args.incremental:
+        hp_scraper.update_subpages(
+            args.data_dir / "subpages.json",
+            args.data_dir / "crawl_state.json",
+            years=args.n_years,
+            hearing_types=args.hearing_type_id,
+        )
+    elif args.all or args.get_subpages:
+        hp_scraper.get_subpages(
+            years=args.n_years,
+            concurrency=args.concurrency,
+            hearing_types=args.hearing_type_id,
+        )
     if args.all or args.save_subpages:
         hp_scraper.save_subpages(args.data_dir / "subpages.json")
-        print("Saved file to:", args.data_dir / "subpages.json")
+        if catalog:
+            print("Saved subpages to:", catalog.db_path)
+        else:
+            print("Saved file to:", args.data_dir / "subpages.json")
     if args.load_subpages or args.populate:
         hp_scraper.load_subpages(args.data_dir / "subpages.json")
     if args.all or args.populate:
-        hp_scraper.populate(args.data_dir / "hearings")
+        filters = []
+        if args.authority or args.since or args.until or args.hearing_type:
+            filters.append(
+                make_filter(
+                    authorities=args.authority,
+                    since=args.since,
+                    until=args.until,
+                    hearing_types=args.hearing_type,
+                )
+            )
+        if args.documents:
+            hp_scraper.populate_documents(
+                args.data_dir / "hearings",
+                args.documents,
+                apply_remove_rules=args.apply_remove_rules,
+                concurrency=args.concurrency or 4,
+                filters=filters,
+            )
+        else:
+            hp_scraper.populate(
+                args.data_dir / "hearings",
+                concurrency=args.concurrency,
+                meta_from_search=args.meta_from_search,
+                filters=filters,
+            )
+    if args.fill_queue or args.worker:
+        work_queue = SQLiteLeaseStore(args.work_queue or args.data_dir / "work_queue.sqlite")
+        hp_scraper.load_subpages(args.data_dir / "subpages.json")
+        if args.fill_queue:
+            work_queue.add(x["Id"] for x in hp_scraper.subpages)
+            print("Work queue:", work_queue.counts())
+        if args.worker:
+            hp_scraper.rate_limiter = SharedRateLimiter(work_queue, args.rate_limit)
+            crawl_worker(
+                work_queue,
+                hp_scraper,
+                args.data_dir / "hearings",
+                concurrency=args.concurrency or 4,
+                lease_seconds=args.lease_seconds,
+                meta_from_search=args.meta_from_search,
+            )
+    if args.reparse:
+        reparse(
+            args.data_dir / "raw_archive",
+            args.data_dir / "hearings",
+            workers=args.workers,
+        )
     if args.all or args.extract_meta:
         hp_scraper.meta_extract(
-            args.data_dir / "hearings", args.data_dir / "metadata.csv"
+            args.data_dir / "hearings",
+            args.data_dir / "metadata.parquet",
+            workers=args.workers,
+            incremental=not args.rebuild_meta,
+            complete=args.complete_meta,
         )
-        print("Saved file to:", args.data_dir / "metadata.csv")
+        print("Saved file to:", args.data_dir / "metadata.parquet")
     if args.all or args.unzip:
-        hp_scraper.unzip(args.data_dir / "hearings")
+        hp_scraper.unzip(
+            args.data_dir / "hearings",
+            workers=args.workers,
+            store_dir=args.data_dir / "blobs" if args.blob_store else None,
+        )
     if args.all or args.convert_to_pdf:
         hp_scraper.file_conversion(args.data_dir / "hearings")
+    if args.metrics:
+        hp_scraper.write_metrics(
+            args.data_dir / "metrics",
+            f"crawl-{default_worker_id()}" if args.worker else "crawl",
+        )
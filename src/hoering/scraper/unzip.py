@@ -0,0 +1,129 @@
+import json
+import os
+import re
+import shutil
+import zlib
+from pathlib import Path
+from zipfile import ZipFile
+
+from hoering.blobstore import BlobStore
+
+
+def get_valid_filename(s):
+    """
+    Return the given string converted to a string that can be used for a clean
+    filename. Remove leading and trailing spaces; convert other spaces to
+    underscores; and remove anything that is not an alphanumeric, dash,
+    underscore, or dot.
+    >>> get_valid_filename("john's portrait in 2004.jpg")
+    'johns_portrait_in_2004.jpg'
+    """
+    if len(s) > 100:
+        s = s[:100] + "." + s.split(".")[-1]
+
+    s = str(s).strip().replace(" ", "_")
+
+    return re.sub(r"(?u)[^-\w.]", "�", s)
+
+
+def manifest_path(folder: Path) -> Path:
+    return folder / f"{folder.name}_manifest.json"
+
+
+def file_crc(path, chunk_size=1024 * 1024) -> int:
+    crc = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def load_manifest(folder: Path, verify=False):
+    """
+    The manifest of a folder, if the folder holds every member listed in it and the manifest belongs to
+    the current zip file. Otherwise None.
+    Sizes are always checked. With verify, the CRC of every file is checked as well.
+    """
+    try:
+        with open(manifest_path(folder), "r") as f:
+            manifest = json.load(f)
+        zip_size = (folder / f"{folder.name}.zip").stat().st_size
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+    if manifest.get("zip_size") != zip_size:
+        return None
+    for member in manifest["members"]:
+        path = folder / member["file"]
+        if not path.exists() or path.stat().st_size != member["size"]:
+            return None
+        if verify and file_crc(path) != member["crc"]:
+            return None
+    return manifest
+
+
+def unzip_folder(folder, verify=False, store_dir=None):
+    """
+    Extract the zip file of a hearing folder next to it, with the member names made valid by `get_valid_filename`.
+    Members are streamed to disk, and a manifest ({id}_manifest.json) with the name, size and CRC of every member
+    is written when the folder is complete. Runs in a worker process.
+
+    Files left by an interrupted run are kept if their size and CRC match the member, so a crashed run
+    resumes where it stopped. A file is only in place once it is fully written.
+
+    store_dir: the root of a BlobStore. If given, members are written to the store and linked into the folder,
+        and the manifest records their sha256.
+
+    Returns (folder name, number of bytes in the folder's members, whether the folder was already unzipped).
+    """
+    folder = Path(folder)
+    manifest = load_manifest(folder, verify=verify)
+    if manifest is not None:
+        return folder.name, sum(x["size"] for x in manifest["members"]), True
+
+    zip_path = folder / f"{folder.name}.zip"
+    store = BlobStore(store_dir) if store_dir else None
+    members = []
+    with ZipFile(zip_path, "r") as zf:
+        for info in zf.infolist():
+            if info.is_dir():
+                continue
+            file = get_valid_filename(info.filename)
+            path = folder / file
+            members.append(
+                {
+                    "name": info.filename,
+                    "file": file,
+                    "size": info.file_size,
+                    "crc": info.CRC,
+                }
+            )
+
+            if (
+                path.exists()
+                and path.stat().st_size == info.file_size
+                and file_crc(path) == info.CRC
+            ):
+                if store:
+                    members[-1]["sha256"] = store.store_file(path)
+                continue
+
+            if store:
+                with zf.open(info) as src:
+                    members[-1]["sha256"] = store.store(src, path)
+                continue
+
+            part_path = folder / f"{file}.part"
+            with zf.open(info) as src, open(part_path, "wb") as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            os.replace(part_path, path)
+
+    manifest = {"zip_size": zip_path.stat().st_size, "members": members}
+    tmp_path = f"{manifest_path(folder)}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path(folder))
+    if store:
+        store.close()
+
+    return folder.name, sum(x["size"] for x in members), False
@@ -0,0 +1,379 @@
+import asyncio
+import os
+import socket
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Iterable, Optional
+from urllib.parse import urlparse
+
+
+class SQLiteLeaseStore:
+    def __init__(self, db_path, max_attempts: int = 3):
+        """
+        A work queue of hearing-ids with leases, in a SQLite database on a filesystem shared by the nodes.
+        A worker leases a batch of hearings for a while. If it dies, the lease expires and the hearings are
+        handed to another worker. The same database holds token buckets for a rate limit shared by all workers.
+
+        The database uses a rollback journal instead of WAL, since WAL needs shared memory, which network
+        filesystems do not provide. Every change is a short `BEGIN IMMEDIATE` transaction.
+
+        db_path: the path of the database file. Created if it does not exist.
+        max_attempts: the number of times a hearing is tried before it is marked as failed.
+        """
+        self.db_path = Path(db_path)
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(
+            self.db_path, timeout=120, check_same_thread=False, isolation_level=None
+        )
+        self.conn.execute("PRAGMA journal_mode=DELETE")
+        with self.lock:
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id INTEGER PRIMARY KEY,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    worker TEXT,
+                    lease_until REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT
+                )
+                """
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, lease_until)"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)"
+            )
+
+    def transaction(self, func):
+        """Run func(conn) in a write transaction."""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(self.conn)
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+            return result
+
+    def add(self, ids: Iterable[int]):
+        """Add hearings to the queue. Hearings already in the queue keep their status."""
+        rows = [(int(x),) for x in ids]
+        self.transaction(
+            lambda conn: conn.executemany(
+                "INSERT OR IGNORE INTO tasks (id) VALUES (?)", rows
+            )
+        )
+
+    def lease(self, worker: str, n: int, lease_seconds: float) -> list[int]:
+        """
+        Lease up to n pending hearings, or hearings whose lease has expired.
+        A hearing whose lease expired after max_attempts is marked as failed instead, so a hearing that
+        kills its worker is not handed out forever.
+        """
+
+        def lease(conn):
+            now = time.time()
+            conn.execute(
+                """
+                UPDATE tasks SET status = 'failed', lease_until = NULL, error = 'lease expired'
+                WHERE status = 'leased' AND lease_until < ? AND attempts >= ?
+                """,
+                (now, self.max_attempts),
+            )
+            rows = conn.execute(
+                """
+                SELECT id FROM tasks
+                WHERE status = 'pending' OR (status = 'leased' AND lease_until < ?)
+                ORDER BY id DESC LIMIT ?
+                """,
+                (now, n),
+            ).fetchall()
+            ids = [row[0] for row in rows]
+            conn.executemany(
+                "UPDATE tasks SET status = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                [(worker, now + lease_seconds, _id) for _id in ids],
+            )
+            return ids
+
+        return self.transaction(lease)
+
+    def renew(self, _id: int, worker: str, lease_seconds: float) -> bool:
+        """Extend the lease of a hearing. False if the worker no longer holds it."""
+
+        def renew(conn):
+            cursor = conn.execute(
+                "UPDATE tasks SET lease_until = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                (time.time() + lease_seconds, _id, worker),
+            )
+            return cursor.rowcount == 1
+
+        return self.transaction(renew)
+
+    def complete(self, _id: int, worker: str):
+        self.transaction(
+            lambda conn: conn.execute(
+                "UPDATE tasks SET status = 'done', lease_until = NULL, error = NULL WHERE id = ? AND worker = ?",
+                (_id, worker),
+            )
+        )
+
+    def fail(self, _id: int, worker: str, error: str):
+        """Give a hearing back to the queue, or mark it as failed after max_attempts."""
+        self.transaction(
+            lambda conn: conn.execute(
+                """
+                UPDATE tasks SET
+                    status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                    lease_until = NULL,
+                    error = ?
+                WHERE id = ? AND worker = ?
+                """,
+                (self.max_attempts, error, _id, worker),
+            )
+        )
+
+    def counts(self) -> dict:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT status, COUNT(*) FROM tasks GROUP BY status"
+            ).fetchall()
+        return {"pending": 0, "leased": 0, "done": 0, "failed": 0, **dict(rows)}
+
+    def reserve_token(self, key: str, rate: float, capacity: float) -> float:
+        """
+        Take a token from a shared token bucket and return the number of seconds to wait before using it.
+        Works like TokenBucket.reserve, with the bucket kept in the database.
+        """
+
+        def reserve(conn):
+            now = time.time()
+            row = conn.execute(
+                "SELECT tokens, updated FROM buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens = min(capacity, tokens + (now - updated) * rate) - 1
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                (key, tokens, now),
+            )
+            return max(0.0, -tokens / rate)
+
+        return self.transaction(reserve)
+
+
+# Hand expired leases back (or fail them after max_attempts) and lease up to n hearings, in one atomic step.
+# KEYS: pending, leases, status, worker, attempts. ARGV: now, lease until, n, worker, max_attempts.
+LEASE_SCRIPT = """
+for _, id in ipairs(redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])) do
+    redis.call('ZREM', KEYS[2], id)
+    if tonumber(redis.call('HGET', KEYS[5], id) or '0') >= tonumber(ARGV[5]) then
+        redis.call('HSET', KEYS[3], id, 'failed')
+    else
+        redis.call('HSET', KEYS[3], id, 'pending')
+        redis.call('RPUSH', KEYS[1], id)
+    end
+end
+
+local ids = {}
+for i = 1, tonumber(ARGV[3]) do
+    local id = redis.call('LPOP', KEYS[1])
+    if not id then
+        break
+    end
+    redis.call('ZADD', KEYS[2], ARGV[2], id)
+    redis.call('HSET', KEYS[3], id, 'leased')
+    redis.call('HSET', KEYS[4], id, ARGV[4])
+    redis.call('HINCRBY', KEYS[5], id, 1)
+    ids[#ids + 1] = id
+end
+return ids
+"""
+
+# Give a hearing back to the queue, or fail it after max_attempts, if the worker still holds it.
+# KEYS: pending, leases, status, worker, attempts. ARGV: id, worker, max_attempts.
+FAIL_SCRIPT = """
+if redis.call('HGET', KEYS[4], ARGV[1]) ~= ARGV[2] or not redis.call('ZSCORE', KEYS[2], ARGV[1]) then
+    return 0
+end
+redis.call('ZREM', KEYS[2], ARGV[1])
+if tonumber(redis.call('HGET', KEYS[5], ARGV[1]) or '0') >= tonumber(ARGV[3]) then
+    redis.call('HSET', KEYS[3], ARGV[1], 'failed')
+else
+    redis.call('HSET', KEYS[3], ARGV[1], 'pending')
+    redis.call('RPUSH', KEYS[1], ARGV[1])
+end
+return 1
+"""
+
+
+class RedisLeaseStore:
+    def __init__(self, client, prefix: str = "hoering", max_attempts: int = 3):
+        """
+        The work queue of SQLiteLeaseStore in Redis, for clusters with a Redis server.
+        Leasing and failing run as Lua scripts, so a worker dying halfway through never loses a hearing.
+        client: a redis-py client, or a stand-in with the same interface (eg. fakeredis.FakeRedis with lupa) for tests.
+            With or without decode_responses.
+        """
+        self.client = client
+        self.prefix = prefix
+        self.max_attempts = max_attempts
+        self.lease_script = client.register_script(LEASE_SCRIPT)
+        self.fail_script = client.register_script(FAIL_SCRIPT)
+
+    def queue_keys(self) -> list[str]:
+        """The keys the scripts work on."""
+        return [self.key(x) for x in ("pending", "leases", "status", "worker", "attempts")]
+
+    def key(self, name):
+        return f"{self.prefix}:{name}"
+
+    @staticmethod
+    def text(value) -> str:
+        """A value read from Redis as a string: bytes, or str if the client decodes responses."""
+        return value.decode() if isinstance(value, bytes) else str(value)
+
+    def add(self, ids: Iterable[int]):
+        for _id in ids:
+            # A hash field per hearing keeps its status, so known hearings are not queued twice
+            if self.client.hsetnx(self.key("status"), _id, "pending"):
+                self.client.rpush(self.key("pending"), _id)
+
+    def lease(self, worker: str, n: int, lease_seconds: float) -> list[int]:
+        now = time.time()
+        ids = self.lease_script(
+            keys=self.queue_keys(),
+            args=[now, now + lease_seconds, n, worker, self.max_attempts],
+        )
+        return [int(self.text(x)) for x in ids]
+
+    def holds(self, _id, worker) -> bool:
+        owner = self.client.hget(self.key("worker"), _id)
+        return owner is not None and self.text(owner) == worker
+
+    def renew(self, _id: int, worker: str, lease_seconds: float) -> bool:
+        if not self.holds(_id, worker):
+            return False
+        self.client.zadd(self.key("leases"), {_id: time.time() + lease_seconds})
+        return True
+
+    def complete(self, _id: int, worker: str):
+        if self.holds(_id, worker):
+            # MULTI/EXEC, so the hearing is never left without a lease and still marked as leased
+            pipe = self.client.pipeline()
+            pipe.zrem(self.key("leases"), _id)
+            pipe.hset(self.key("status"), _id, "done")
+            pipe.execute()
+
+    def fail(self, _id: int, worker: str, error: str):
+        self.fail_script(keys=self.queue_keys(), args=[_id, worker, self.max_attempts])
+
+    def counts(self) -> dict:
+        counts = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+        for status in self.client.hvals(self.key("status")):
+            counts[self.text(status)] += 1
+        return counts
+
+    def reserve_token(self, key: str, rate: float, capacity: float) -> float:
+        bucket_key = self.key(f"bucket:{key}")
+
+        def reserve(pipe):
+            now = time.time()
+            values = pipe.hmget(bucket_key, "tokens", "updated")
+            tokens = float(values[0]) if values[0] is not None else capacity
+            updated = float(values[1]) if values[1] is not None else now
+            tokens = min(capacity, tokens + (now - updated) * rate) - 1
+            pipe.multi()
+            pipe.hset(bucket_key, mapping={"tokens": tokens, "updated": now})
+            return max(0.0, -tokens / rate)
+
+        return self.client.transaction(reserve, bucket_key, value_from_callable=True)
+
+
+class SharedRateLimiter:
+    def __init__(self, store, rate: float, capacity: float = None):
+        """
+        A per-host rate limit shared by every worker using the same store, with the interface of HostRateLimiter.
+        rate: requests per second allowed against a single host, in total over all workers.
+        """
+        self.store = store
+        self.rate = rate
+        self.capacity = capacity if capacity else max(1.0, rate)
+
+    def acquire(self, url: str):
+        time.sleep(self.store.reserve_token(urlparse(url).netloc, self.rate, self.capacity))
+
+    async def acquire_async(self, url: str):
+        wait = await asyncio.to_thread(
+            self.store.reserve_token, urlparse(url).netloc, self.rate, self.capacity
+        )
+        await asyncio.sleep(wait)
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def crawl_worker(
+    store,
+    scraper,
+    mainpath,
+    worker_id: Optional[str] = None,
+    concurrency: int = 4,
+    lease_seconds: float = 900,
+    zip_files=True,
+    meta_from_search=False,
+    poll_interval: float = 10,
+):
+    """
+    Fetch hearings leased from the store until the queue is empty. Run one worker per node, eg. as a SLURM array job.
+    The scraper should use a SharedRateLimiter on the same store, so the portal sees the total rate of all workers.
+    A lease is renewed before each hearing is fetched. While other workers still hold leases, the worker waits
+    for them to finish or expire.
+    """
+    worker_id = worker_id or default_worker_id()
+    hearings = {x["Id"]: x for x in scraper.subpages}
+    scraper.set_concurrency(concurrency)
+    Path(mainpath).mkdir(exist_ok=True)
+
+    def fetch(_id):
+        if not store.renew(_id, worker_id, lease_seconds):
+            return
+        try:
+            scraper.populate_hearing(
+                mainpath,
+                _id,
+                hearings.get(_id),
+                zip_files=zip_files,
+                meta_from_search=meta_from_search,
+            )
+        except Exception as e:
+            store.fail(_id, worker_id, str(e))
+            print(f"{worker_id}: {_id} failed: {e}")
+            return
+        store.complete(_id, worker_id)
+
+    n_done = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        while True:
+            ids = store.lease(worker_id, concurrency * 2, lease_seconds)
+            if not ids:
+                counts = store.counts()
+                if counts["pending"] == 0 and counts["leased"] == 0:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            for future in as_completed([pool.submit(fetch, _id) for _id in ids]):
+                future.result()
+            n_done += len(ids)
+            print(f"{worker_id}: fetched {n_done} hearings, queue: {store.counts()}")
+
+    print(f"{worker_id}: queue is empty")
+    scraper.report()
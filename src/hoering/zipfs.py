@@ -0,0 +1,139 @@
+import fnmatch
+import os
+import shutil
+import threading
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Callable, Optional
+from zipfile import ZipFile
+
+from hoering.scraper.unzip import get_valid_filename
+
+
+class HearingArchives:
+    def __init__(
+        self,
+        mainpath,
+        scratch_dir,
+        rename: Callable[[str], str] = get_valid_filename,
+        exclude: Optional[Callable[[str], bool]] = None,
+        max_open: int = 64,
+    ):
+        """
+        Read-through access to the files of the hearings, directly inside the {id}.zip files,
+        so the archives do not have to be extracted (and copied and pruned) on disk first.
+        Members are listed under the names `unzip` would give them, and are only written to disk
+        when a caller needs a real path, with `materialize`.
+
+        The most recently used zip files are kept open, so their central directories are read once.
+
+        mainpath: the folder holding the hearing folders.
+        scratch_dir: a local folder for materialized files, laid out as scratch_dir/{id}/{file}.
+        rename: the name a member is listed under, from its name in the zip file.
+        exclude: a predicate on the listed name. Matching members are left out, eg. files removed by `match_rules`.
+        max_open: the number of zip files kept open.
+        """
+        self.mainpath = Path(mainpath)
+        self.scratch_dir = Path(scratch_dir)
+        self.rename = rename
+        self.exclude = exclude
+        self.max_open = max_open
+        self.open_zips = OrderedDict()
+        self.lock = threading.Lock()
+
+    def folders(self) -> list[str]:
+        """The hearing folders holding a zip file."""
+        return sorted(
+            x
+            for x in os.listdir(self.mainpath)
+            if os.path.exists(self.mainpath / x / f"{x}.zip")
+        )
+
+    def zip_file(self, folder) -> tuple[ZipFile, dict]:
+        """The open zip file of a folder and its members as {listed name: ZipInfo}."""
+        folder = str(folder)
+        zip_path = self.mainpath / folder / f"{folder}.zip"
+        stat = zip_path.stat()
+        signature = (stat.st_size, stat.st_mtime_ns)
+
+        with self.lock:
+            if folder in self.open_zips:
+                zf, members, cached_signature = self.open_zips[folder]
+                if cached_signature == signature:
+                    self.open_zips.move_to_end(folder)
+                    return zf, members
+                # The zip file was replaced, eg. by a new download
+                zf.close()
+                del self.open_zips[folder]
+
+            zf = ZipFile(zip_path, "r")
+            members = {}
+            for info in zf.infolist():
+                if info.is_dir():
+                    continue
+                name = self.rename(info.filename)
+                if self.exclude and self.exclude(name):
+                    continue
+                members[name] = info
+
+            self.open_zips[folder] = (zf, members, signature)
+            if len(self.open_zips) > self.max_open:
+                _, (oldest, _, _) = self.open_zips.popitem(last=False)
+                oldest.close()
+            return zf, members
+
+    def listdir(self, folder, pattern: str = "*") -> list[str]:
+        """The names of the members of a folder matching a glob pattern, eg. '*.pdf'."""
+        _, members = self.zip_file(folder)
+        return [x for x in members if fnmatch.fnmatch(x.lower(), pattern.lower())]
+
+    def size(self, folder, name) -> int:
+        return self.zip_file(folder)[1][name].file_size
+
+    def open(self, folder, name):
+        """A binary file object for a member."""
+        zf, members = self.zip_file(folder)
+        return zf.open(members[name])
+
+    def read(self, folder, name) -> bytes:
+        with self.open(folder, name) as f:
+            return f.read()
+
+    def materialize(self, folder, name) -> Path:
+        """
+        Write a member to the scratch folder and return its path there.
+        A file already materialized with the right size is reused.
+        """
+        folder = str(folder)
+        path = self.scratch_dir / folder / name
+        info = self.zip_file(folder)[1][name]
+        if path.exists() and path.stat().st_size == info.file_size:
+            return path
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        part_path = path.with_name(f"{path.name}.{threading.get_ident()}.part")
+        with self.open(folder, name) as src, open(part_path, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.replace(part_path, path)
+        return path
+
+    def count_by_extension(self, patterns: Optional[list[str]] = None) -> dict:
+        """The number of members by extension, optionally only for names containing one of the patterns."""
+        counts = Counter()
+        for folder in self.folders():
+            for name in self.listdir(folder):
+                if patterns and not any(p.lower() in name.lower() for p in patterns):
+                    continue
+                counts[os.path.splitext(name)[1].lstrip(".")] += 1
+        return dict(counts)
+
+    def set_exclude(self, exclude: Optional[Callable[[str], bool]]):
+        """Replace the exclude predicate. The cached member lists are dropped."""
+        self.exclude = exclude
+        self.close()
+
+    def close(self):
+        with self.lock:
+            for zf, _, _ in self.open_zips.values():
+                zf.close()
+            self.open_zips.clear()
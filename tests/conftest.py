@@ -0,0 +1,30 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# The package is run from the source tree, like the scripts in scripts/benchmark
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "scripts" / "benchmark"))
+
+
+@pytest.fixture(scope="session")
+def corpus(tmp_path_factory):
+    """A small synthetic corpus of the mock portal (see scripts/benchmark/mock_portal.py)."""
+    from mock_portal import make_corpus
+
+    corpus_dir = tmp_path_factory.mktemp("corpus")
+    make_corpus(corpus_dir, 6, document_size=20_000)
+    return corpus_dir
+
+
+@pytest.fixture
+def portal(corpus):
+    """The mock portal serving the corpus on a free port, with fresh request counts."""
+    from mock_portal import MockPortal
+
+    portal = MockPortal(corpus).start()
+    yield portal
+    portal.stop()
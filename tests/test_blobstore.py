@@ -0,0 +1,97 @@
+import errno
+import hashlib
+import io
+import os
+
+import pytest
+
+from hoering import blobstore
+from hoering.blobstore import BlobStore
+
+DATA = b"Standard hoeringsliste " * 1000
+SHA = hashlib.sha256(DATA).hexdigest()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = BlobStore(tmp_path / "blobs")
+    yield store
+    store.close()
+
+
+def test_identical_files_are_stored_once(store, tmp_path):
+    a, b = tmp_path / "1" / "liste.pdf", tmp_path / "2" / "liste.pdf"
+    a.parent.mkdir()
+    b.parent.mkdir()
+
+    assert store.store(io.BytesIO(DATA), a) == SHA
+    assert store.store_bytes(DATA, b) == SHA
+
+    assert a.read_bytes() == b.read_bytes() == DATA
+    assert sorted((store.root / "objects").rglob("*")) == [store.blob_path(SHA).parent, store.blob_path(SHA)]
+    # Both folders hold hardlinks to the blob
+    assert os.stat(a).st_ino == os.stat(b).st_ino == os.stat(store.blob_path(SHA)).st_ino
+    assert store.summary() == {"references": 2, "blobs": 1, "bytes_saved": len(DATA)}
+    assert not list((store.root / "tmp").iterdir())
+
+
+def test_store_file_replaces_the_file_with_a_link(store, tmp_path):
+    path = tmp_path / "svar.pdf"
+    path.write_bytes(DATA)
+
+    assert store.store_file(path) == SHA
+    assert path.read_bytes() == DATA
+    assert os.stat(path).st_ino == os.stat(store.blob_path(SHA)).st_ino
+    assert store.sha_of(path) == SHA
+
+
+def test_copies_where_hardlinks_are_not_possible(store, tmp_path, monkeypatch):
+    def cross_device(src, dst):
+        raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+    monkeypatch.setattr(blobstore.os, "link", cross_device)
+    dest = tmp_path / "liste.pdf"
+
+    assert store.store(io.BytesIO(DATA), dest) == SHA
+    assert dest.read_bytes() == DATA
+    assert os.stat(dest).st_ino != os.stat(store.blob_path(SHA)).st_ino
+    assert [x.name for x in tmp_path.iterdir() if x.name.endswith(".tmp")] == []
+    # The copy is a known reference, so it is not hashed again
+    assert store.sha_of(dest) == SHA
+
+
+def test_sha_of_hashes_unknown_and_changed_files(store, tmp_path):
+    path = tmp_path / "liste.pdf"
+    store.store_bytes(DATA, path)
+
+    other = tmp_path / "other.pdf"
+    other.write_bytes(b"other")
+    assert store.sha_of(other) == hashlib.sha256(b"other").hexdigest()
+
+    # A reference of another size is not trusted
+    path.unlink()
+    path.write_bytes(b"changed")
+    assert store.sha_of(path) == hashlib.sha256(b"changed").hexdigest()
+
+
+def test_derived_results(store):
+    assert store.get_derived(SHA, "ngos:abc") is None
+
+    store.set_derived(SHA, "ngos:abc", ["KL", "DI"])
+    assert store.get_derived(SHA, "ngos:abc") == ["KL", "DI"]
+    # Kept per blob and kind
+    assert store.get_derived(SHA, "converted:pdf") is None
+    assert store.get_derived("0" * 64, "ngos:abc") is None
+
+    store.set_derived(SHA, "ngos:abc", [])
+    assert store.get_derived(SHA, "ngos:abc") == []
+
+
+def test_the_store_is_shared_through_its_database(store, tmp_path):
+    store.store_bytes(DATA, tmp_path / "liste.pdf")
+    store.set_derived(SHA, "ngos:abc", ["KL"])
+
+    other = BlobStore(store.root)
+    assert other.sha_of(tmp_path / "liste.pdf") == SHA
+    assert other.get_derived(SHA, "ngos:abc") == ["KL"]
+    other.close()
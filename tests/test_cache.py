@@ -0,0 +1,113 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from hoering.scraper.cache import CachedSession
+
+
+class Portal:
+    """A Details page served with an ETag, answering 304 when the client already has it."""
+
+    def __init__(self):
+        self.body = b"<fieldset>v1</fieldset>"
+        self.etag = '"v1"'
+        self.requests = []
+
+        portal = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                portal.requests.append((self.path, dict(self.headers)))
+                if self.headers.get("If-None-Match") == portal.etag:
+                    self.send_response(304)
+                    self.send_header("ETag", portal.etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("ETag", portal.etag)
+                self.send_header("Content-Length", str(len(portal.body)))
+                self.end_headers()
+                self.wfile.write(portal.body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def update(self, body, etag):
+        self.body = body
+        self.etag = etag
+
+
+@pytest.fixture
+def portal():
+    portal = Portal()
+    yield portal
+    portal.server.shutdown()
+    portal.server.server_close()
+
+
+def test_unchanged_page_is_served_from_cache(portal, tmp_path):
+    session = CachedSession(tmp_path / "http_cache")
+    url = f"{portal.base_url}/Hearing/Details/1"
+
+    first = session.get(url)
+    assert first.status_code == 200
+    assert "If-None-Match" not in portal.requests[0][1]
+
+    second = session.get(url)
+    # The status stays 304, so callers can skip parsing, but the body is the cached one
+    assert second.status_code == 304
+    assert second.content == b"<fieldset>v1</fieldset>"
+    assert portal.requests[1][1]["If-None-Match"] == '"v1"'
+    assert (session.hits, session.misses) == (1, 1)
+
+
+def test_changed_page_replaces_the_cached_one(portal, tmp_path):
+    session = CachedSession(tmp_path / "http_cache")
+    url = f"{portal.base_url}/Hearing/Details/1"
+    session.get(url)
+
+    portal.update(b"<fieldset>v2</fieldset>", '"v2"')
+    changed = session.get(url)
+    assert changed.status_code == 200
+    assert changed.content == b"<fieldset>v2</fieldset>"
+
+    unchanged = session.get(url)
+    assert unchanged.status_code == 304
+    assert unchanged.content == b"<fieldset>v2</fieldset>"
+
+
+def test_cache_survives_a_new_session(portal, tmp_path):
+    url = f"{portal.base_url}/Hearing/Details/1"
+    CachedSession(tmp_path / "http_cache").get(url)
+
+    response = CachedSession(tmp_path / "http_cache").get(url)
+    assert response.status_code == 304
+    assert response.content == b"<fieldset>v1</fieldset>"
+
+
+def test_other_urls_are_not_cached(portal, tmp_path):
+    session = CachedSession(tmp_path / "http_cache")
+    url = f"{portal.base_url}/Hearing/DownloadDocumentsAsZipFile?hearingId=1"
+    session.get(url)
+    session.get(url)
+
+    assert all("If-None-Match" not in headers for _, headers in portal.requests)
+    assert (session.hits, session.misses) == (0, 0)
+
+
+def test_missing_body_means_no_validators(portal, tmp_path):
+    session = CachedSession(tmp_path / "http_cache")
+    url = f"{portal.base_url}/Hearing/Details/1"
+    session.get(url)
+    # A body lost after its validators were written must not turn into an empty 304 response
+    Path(f"{session.cache_path(url)}.body").unlink()
+
+    response = session.get(url)
+    assert response.status_code == 200
+    assert response.content == b"<fieldset>v1</fieldset>"
@@ -0,0 +1,140 @@
+import pytest
+
+from hoering.catalog import STAGES, HearingCatalog
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    catalog = HearingCatalog(tmp_path / "catalog.sqlite")
+    yield catalog
+    catalog.close()
+
+
+def hearing(_id, published="2024-01-01T00:00:00", **fields):
+    return {"Id": _id, "PublicationDate": published, **fields}
+
+
+def test_add_hearings_marks_them_listed(catalog):
+    catalog.add_hearings([hearing(1), hearing(2)])
+
+    assert catalog.ids() == {1, 2}
+    assert catalog.done("listed") == {1, 2}
+    assert catalog.pending("meta_fetched") == [2, 1]
+    assert [x["Id"] for x in catalog.subpages()] == [2, 1]
+
+
+def test_stages_follow_marks(catalog):
+    catalog.add_hearings([hearing(1), hearing(2), hearing(3)])
+    catalog.mark(1, "meta_fetched")
+    catalog.mark(1, "zip_downloaded", 1024)
+    catalog.mark("2", "zip_downloaded", 2048)
+
+    assert catalog.done("zip_downloaded") == {1, 2}
+    assert catalog.pending("unzipped", after="zip_downloaded") == [2, 1]
+    assert catalog.pending("meta_fetched") == [3, 2]
+
+    status = catalog.status(1)
+    assert status["zip_downloaded"] == 1
+    assert status["zip_downloaded_bytes"] == 1024
+    assert status["zip_downloaded_at"] is not None
+
+    # A stage can be set back, eg. when its output turns out to be broken
+    catalog.mark(1, "zip_downloaded", done=False)
+    assert catalog.done("zip_downloaded") == {2}
+
+
+def test_readding_hearings_keeps_their_stages(catalog):
+    catalog.add_hearings([hearing(1, Title="Old title")])
+    catalog.mark(1, "unzipped", 10)
+    catalog.add_hearings([hearing(1, Title="New title")])
+
+    assert catalog.done("unzipped") == {1}
+    assert catalog.subpages() == [hearing(1, Title="New title")]
+
+
+def test_mark_creates_unknown_hearings(catalog):
+    catalog.mark(5, "extracted", 3)
+
+    assert catalog.done("extracted") == {5}
+    assert catalog.done("listed") == set()
+    assert catalog.subpages() == []
+
+
+def test_unknown_stage_is_rejected(catalog):
+    with pytest.raises(ValueError):
+        catalog.mark(1, "downloaded")
+    with pytest.raises(ValueError):
+        catalog.done("downloaded")
+    with pytest.raises(ValueError):
+        catalog.pending("unzipped", after="downloaded")
+
+
+def test_summary_counts_every_stage(catalog):
+    catalog.add_hearings([hearing(1), hearing(2)])
+    catalog.mark(1, "meta_fetched")
+
+    summary = catalog.summary()
+    assert summary["total"] == 2
+    assert summary["listed"] == 2
+    assert summary["meta_fetched"] == 1
+    assert all(summary[stage] == 0 for stage in STAGES[2:])
+
+
+def test_state_round_trips(catalog):
+    assert catalog.get_state("high_water_mark", {"last_publication_date": None}) == {
+        "last_publication_date": None
+    }
+    catalog.set_state("high_water_mark", {"last_publication_date": "2024-05-01T00:00:00"})
+    assert catalog.get_state("high_water_mark") == {"last_publication_date": "2024-05-01T00:00:00"}
+
+
+def test_catalog_is_shared_through_the_database(tmp_path):
+    first = HearingCatalog(tmp_path / "catalog.sqlite")
+    second = HearingCatalog(tmp_path / "catalog.sqlite")
+    first.add_hearings([hearing(1)])
+    first.mark(1, "converted")
+
+    assert second.done("converted") == {1}
+    first.close()
+    second.close()
+
+
+def test_catalog_runs_in_wal_mode(tmp_path):
+    first = HearingCatalog(tmp_path / "catalog.sqlite")
+    second = HearingCatalog(tmp_path / "catalog.sqlite")
+    assert first.query("PRAGMA journal_mode")[0][0] == "wal"
+    # NORMAL
+    assert first.query("PRAGMA synchronous")[0][0] == 1
+
+    first.add_hearings([hearing(1)])
+    assert (tmp_path / "catalog.sqlite-wal").exists()
+
+    # A reader is not blocked by an open write transaction, and sees the last committed state
+    second.conn.execute("BEGIN IMMEDIATE")
+    second.conn.execute("UPDATE hearings SET converted = 1 WHERE id = 1")
+    assert first.done("listed") == {1}
+    assert first.done("converted") == set()
+    second.conn.execute("COMMIT")
+    assert first.done("converted") == {1}
+    first.close()
+    second.close()
+
+
+def test_import_folders(catalog, tmp_path):
+    mainpath = tmp_path / "hearings"
+    for _id, files in {
+        "1": ["1_meta.json"],
+        "2": ["2_meta.json", "2.zip"],
+        "3": ["3_meta.json", "3.zip", "hoeringsliste.pdf"],
+        "scratch": ["x.pdf"],
+    }.items():
+        (mainpath / _id).mkdir(parents=True)
+        for name in files:
+            (mainpath / _id / name).write_bytes(b"1234")
+
+    catalog.import_folders(mainpath)
+
+    assert catalog.done("meta_fetched") == {1, 2, 3}
+    assert catalog.done("zip_downloaded") == {2, 3}
+    assert catalog.status(2)["zip_downloaded_bytes"] == 4
+    assert catalog.done("unzipped") == {3}
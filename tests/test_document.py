@@ -0,0 +1,55 @@
+"""DocumentContext on tests/fixtures/tables/letter_and_list.pdf (see test_tables.py)."""
+
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("fitz")
+pytest.importorskip("pdfplumber")
+
+from hoering.parser import tables  # noqa: E402
+from hoering.parser.document import DocumentContext  # noqa: E402
+
+FIXTURE = Path(__file__).parent / "fixtures" / "tables" / "letter_and_list.pdf"
+LETTER, LIST = 0, 1
+
+
+def test_pdfplumber_finds_the_table_on_the_same_buffer():
+    with DocumentContext(FIXTURE) as ctx:
+        # Both pages have drawings, so both are read by pdfplumber, which only finds a table on the list
+        assert tables.table_pages(ctx.doc, ctx.drawings) == [LETTER, LIST]
+        assert tables.table_pages(ctx.doc) == [LETTER, LIST]
+        pages = ctx.plumber().pages
+        assert pages[LETTER].extract_tables() == []
+        assert pages[LIST].extract_tables()[0][1:] == [["KL", "kl@kl.dk"], ["Advokatrådet", "post@advokatsamfundet.dk"], ["DI", "di@di.dk"]]
+
+
+def test_document_context_caches_page_derivatives():
+    with DocumentContext(FIXTURE) as ctx:
+        drawings = ctx.drawings(LIST)
+        assert ctx.drawings(LIST) is drawings
+        assert "Høringsliste" in ctx.text(LIST)
+        assert set(ctx.cache) == {("drawings", LIST), ("text", LIST)}
+
+
+def test_document_context_closes_its_handles():
+    ctx = DocumentContext(FIXTURE)
+    pdf = ctx.plumber()
+    assert ctx.doc.page_count == 2
+    ctx.close()
+
+    assert ctx.file.closed
+    assert ctx.buffer.closed
+    assert ctx.doc.is_closed
+    assert not ctx.cache
+    with pytest.raises(ValueError):
+        ctx.view.tobytes()
+    # pdfplumber is closed with the context, and its stream is the mmap, closed as well
+    assert pdf.stream.closed
+
+
+def test_document_context_closes_on_error():
+    with pytest.raises(RuntimeError):
+        with DocumentContext(FIXTURE) as ctx:
+            raise RuntimeError("a failing extraction")
+    assert ctx.file.closed and ctx.buffer.closed
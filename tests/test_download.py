@@ -0,0 +1,92 @@
+from zipfile import BadZipFile
+
+import pytest
+from mock_portal import MockPortal, make_corpus
+
+from hoering.scraper.scrape import HPScraper
+
+
+@pytest.fixture
+def hearing(portal, corpus):
+    """The scraper, the zip url of a hearing and its bytes."""
+    _id = portal.hearings[0]["Id"]
+    scraper = HPScraper(base_url=portal.base_url, rate_limit=100)
+    return scraper, scraper.zip_url(_id), (corpus / "zips" / f"{_id}.zip").read_bytes()
+
+
+def test_download_zip(portal, hearing, tmp_path):
+    scraper, url, data = hearing
+    zip_path = tmp_path / "hearing.zip"
+
+    assert scraper.download_zip(url, zip_path) == len(data)
+    assert zip_path.read_bytes() == data
+    assert not (tmp_path / "hearing.zip.part").exists()
+    assert scraper.metrics.summary()["endpoints"]["/Hearing/DownloadDocumentsAsZipFile"]["bytes"] == len(data)
+
+
+def test_truncated_part_file_is_resumed(portal, hearing, tmp_path):
+    scraper, url, data = hearing
+    zip_path = tmp_path / "hearing.zip"
+    (tmp_path / "hearing.zip.part").write_bytes(data[:30_000])
+
+    assert scraper.download_zip(url, zip_path) == len(data)
+    assert zip_path.read_bytes() == data
+    # Only the rest of the file was sent, as a 206
+    assert portal.stats["bytes_sent"] == len(data) - 30_000
+    endpoint = scraper.metrics.summary()["endpoints"]["/Hearing/DownloadDocumentsAsZipFile"]
+    assert endpoint["statuses"] == {"206": 1}
+    assert endpoint["bytes"] == len(data) - 30_000
+
+
+def test_complete_part_file_is_only_checked(portal, hearing, tmp_path):
+    scraper, url, data = hearing
+    zip_path = tmp_path / "hearing.zip"
+    (tmp_path / "hearing.zip.part").write_bytes(data)
+
+    # The portal answers the Range request past the end with a 416
+    assert scraper.download_zip(url, zip_path) == len(data)
+    assert zip_path.read_bytes() == data
+    assert portal.stats["bytes_sent"] == 0
+
+
+def test_part_file_with_other_bytes_is_rejected(portal, hearing, tmp_path):
+    scraper, url, data = hearing
+    zip_path = tmp_path / "hearing.zip"
+    # The start of another version of the file: the resumed file has the right size, but not the right content
+    (tmp_path / "hearing.zip.part").write_bytes(data[:100] + bytes(30_000))
+
+    with pytest.raises(BadZipFile):
+        scraper.download_zip(url, zip_path)
+    assert not zip_path.exists()
+    assert not (tmp_path / "hearing.zip.part").exists()
+
+    # So the next attempt starts over
+    assert scraper.download_zip(url, zip_path) == len(data)
+    assert zip_path.read_bytes() == data
+
+
+@pytest.mark.parametrize("damage", ["member", "truncated"])
+def test_corrupt_zip_from_the_portal_is_rejected(tmp_path, damage):
+    corpus = tmp_path / "corpus"
+    make_corpus(corpus, 1, document_size=5_000)
+    served = next((corpus / "zips").iterdir())
+    data = bytearray(served.read_bytes())
+    if damage == "member":
+        # A flipped byte in the data of the first member fails its CRC
+        data[100] ^= 0xFF
+    else:
+        # Cut before the central directory, but sent with a matching Content-Length
+        data = data[: len(data) // 2]
+    served.write_bytes(data)
+
+    portal = MockPortal(corpus).start()
+    try:
+        scraper = HPScraper(base_url=portal.base_url, rate_limit=100)
+        zip_path = tmp_path / "hearing.zip"
+        with pytest.raises(BadZipFile):
+            scraper.download_zip(scraper.zip_url(served.stem), zip_path)
+    finally:
+        portal.stop()
+
+    assert not zip_path.exists()
+    assert not (tmp_path / "hearing.zip.part").exists()
@@ -0,0 +1,80 @@
+"""
+The NGOs extracted from a list are kept in the BlobStore per file content and per extractor settings,
+so identical lists are extracted once, and a run with other settings does not get stale results.
+"""
+
+import pytest
+
+from hoering.blobstore import BlobStore
+
+extract = pytest.importorskip("hoering.parser.extract")
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = BlobStore(tmp_path / "blobs")
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def hearing_list(tmp_path):
+    path = tmp_path / "hearings" / "1234" / "hoeringsliste.pdf"
+    path.parent.mkdir(parents=True)
+    path.write_bytes(b"%PDF-1.4 the same list in every hearing")
+    return str(path)
+
+
+def extractor_with(store, calls, **settings):
+    """An NGOExtractor whose extract_file records its calls instead of reading the PDF."""
+    extractor = extract.NGOExtractor(store=store, **settings)
+
+    def extract_file(file):
+        calls.append(extractor.worker_options())
+        return file.split("/")[-2], [f"NGO extracted with {extractor.engine}"]
+
+    extractor.extract_file = extract_file
+    return extractor
+
+
+def test_identical_settings_reuse_the_stored_ngos(store, hearing_list):
+    calls = []
+    extractor_with(store, calls).extract([hearing_list])
+
+    extractor = extractor_with(store, calls)
+    extractor.extract([hearing_list])
+
+    assert len(calls) == 1
+    assert extractor.ngos_list == {"1234": ["NGO extracted with html"]}
+
+
+@pytest.mark.parametrize(
+    "settings", [{"engine": "spans"}, {"table_detector": "camelot"}, {"row_tolerance": 0.5}]
+)
+def test_other_settings_extract_again(store, hearing_list, settings):
+    calls = []
+    extractor_with(store, calls).extract([hearing_list])
+
+    extractor = extractor_with(store, calls, **settings)
+    extractor.extract([hearing_list])
+
+    assert len(calls) == 2
+    assert extractor.derived_kind() != extract.NGOExtractor().derived_kind()
+    # Both results are kept, each under its own settings
+    sha = store.sha_of(hearing_list)
+    assert store.get_derived(sha, extract.NGOExtractor().derived_kind()) == ["NGO extracted with html"]
+    assert store.get_derived(sha, extractor.derived_kind()) == extractor.ngos_list["1234"]
+
+
+def test_derived_kind_is_stable():
+    assert (
+        extract.NGOExtractor(engine="spans").derived_kind()
+        == extract.NGOExtractor(engine="spans").derived_kind()
+    )
+    assert extract.NGOExtractor().derived_kind().startswith("ngos:")
+
+
+def test_row_tolerance_is_part_of_the_settings():
+    # Rows assembled with another tolerance give other NGOs, so they are stored apart
+    kinds = {extract.NGOExtractor(row_tolerance=x).derived_kind() for x in (0.0, 0.5, 1.0)}
+    assert len(kinds) == 3
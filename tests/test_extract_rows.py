@@ -0,0 +1,52 @@
+"""
+Regression tests of the row assembly of NGOExtractor.extract_page. tests/fixtures/lists holds a few generated
+hearing lists (bullets with e-mail addresses and indented rows, notes in a smaller font on the same row,
+two columns), and expected.json the most common style and the NGOs per page that extract_page gave for them
+before rows were assembled in one pass. Both engines must still give exactly that.
+"""
+
+import json
+import logging
+from pathlib import Path
+
+import pytest
+
+fitz = pytest.importorskip("fitz")
+extract = pytest.importorskip("hoering.parser.extract")
+
+FIXTURES = Path(__file__).parent / "fixtures" / "lists"
+EXPECTED = json.loads((FIXTURES / "expected.json").read_text(encoding="utf-8"))
+
+
+@pytest.fixture(autouse=True)
+def quiet_logger():
+    # The debug records of extract_page go to extractor.log otherwise
+    level = extract.logger.level
+    extract.logger.setLevel(logging.WARNING)
+    yield
+    extract.logger.setLevel(level)
+
+
+@pytest.mark.parametrize("engine", ["html", "spans"])
+@pytest.mark.parametrize("name", sorted(EXPECTED))
+def test_extract_page_matches_fixture(name, engine):
+    extractor = extract.NGOExtractor(engine=engine)
+    with fitz.open(FIXTURES / name) as doc:
+        style = extractor.get_most_common_style(doc[0])
+        pages = [extractor.extract_page(page, style) for page in doc]
+
+    assert style == EXPECTED[name]["style"]
+    assert pages == EXPECTED[name]["pages"]
+
+
+def test_assemble_rows():
+    texts = [("top:90.0pt", "KL"), ("top:90.3pt", "*"), ("top:90.0pt", ", Advokatrådet"), ("top:104.0pt", "DI")]
+    top_margins = ["top:90.0pt", "top:90.3pt", "top:104.0pt"]
+
+    # Without a tolerance, only texts with the same top margin are joined
+    extractor = extract.NGOExtractor()
+    assert extractor.assemble_rows(texts, top_margins) == ["KL, Advokatrådet", "*", "DI"]
+
+    # With one, a misaligned baseline joins its row, and the row is returned once
+    extractor = extract.NGOExtractor(row_tolerance=0.5)
+    assert extractor.assemble_rows(texts, top_margins) == ["KL*, Advokatrådet", "DI"]
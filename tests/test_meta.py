@@ -0,0 +1,116 @@
+import datetime
+import json
+from pathlib import Path
+
+import pytest
+
+from hoering.scraper.meta import apply_filters, build_meta, make_filter, missing_fields, search_value
+
+HEARINGS = [
+    {"Id": 1, "HearingType": "Lovforslag", "Authority": "Skatteministeriet", "PublicationDate": "2024-03-01T00:00:00"},
+    {"Id": 2, "HearingType": "Bekendtgørelser", "Authority": "Skatteministeriet", "PublicationDate": "2024-05-01T00:00:00"},
+    {"Id": 3, "HearingType": "lovforslag", "Authority": "Finanstilsynet", "PublicationDate": "2023-12-01T00:00:00"},
+]
+
+
+def ids(hearings):
+    return [x["Id"] for x in hearings]
+
+
+def test_filter_on_hearing_type_labels():
+    assert ids(apply_filters(HEARINGS, [make_filter(hearing_types=["Lovforslag"])])) == [1, 3]
+    assert ids(apply_filters(HEARINGS, [make_filter(hearing_types=["bekendtgørelser", "EU-Dokumenter"])])) == [2]
+
+
+def test_filters_are_combined():
+    predicate = make_filter(
+        authorities=["skatteministeriet"],
+        since=datetime.date(2024, 1, 1),
+        hearing_types=["Lovforslag"],
+    )
+
+    assert ids(apply_filters(HEARINGS, [predicate])) == [1]
+    assert predicate.fields == ["Myndighed", "Publiceringsdato", "Høringstype"]
+
+
+def test_type_ids_are_not_matched_as_labels():
+    # A search result holding the id of the type, not its name, has no Høringstype
+    hearings = [{**x, "HearingType": i} for i, x in enumerate(HEARINGS)]
+
+    with pytest.raises(ValueError, match="Høringstype"):
+        apply_filters(hearings, [make_filter(hearing_types=["Lovforslag"])])
+
+
+# A gethearings page in the shapes the search API is known to use: plain names and ISO dates, lookup objects and
+# .NET json dates, and ids. The portal does not document it; replace it with a page archived by --archive-responses
+# (raw_archive, kind "search") to check SEARCH_META_FIELDS against the live portal.
+SEARCH_PAGE = json.loads((Path(__file__).parent / "fixtures" / "search" / "gethearings.json").read_text(encoding="utf-8"))
+PLAIN, LOOKUPS, IDS = SEARCH_PAGE["Hearings"]
+
+
+def test_build_meta_gives_the_details_labels():
+    assert build_meta(PLAIN) == {
+        "Officiel titel": "Forslag til lov om ændring af skatteforvaltningsloven",
+        "Beskrivelse": "Lovforslaget udmønter en del af aftalen om en styrket skatteforvaltning.",
+        "Høringstype": "Lovforslag",
+        "Myndighed": "Skatteministeriet",
+        "Område": "Skatter og afgifter",
+        "Høringsfrist": "01-03-2024",
+        "Arkiveringsdato": "01-06-2024",
+        "Høringsår": "2023/2024",
+        "Publiceringsdato": "02-02-2024",
+        "details": "",
+        "source": "search",
+    }
+    assert missing_fields(build_meta(PLAIN)) == []
+
+
+def test_build_meta_reads_lookup_objects_and_json_dates():
+    meta_info = build_meta(LOOKUPS)
+
+    assert meta_info["Høringstype"] == "Bekendtgørelser"
+    assert meta_info["Myndighed"] == "Finanstilsynet"
+    assert meta_info["Område"] == "Erhverv"
+    # In Copenhagen time, as the Details page shows them
+    assert meta_info["Høringsfrist"] == "01-03-2024"
+    assert meta_info["Arkiveringsdato"] == "01-06-2024"
+    assert meta_info["Publiceringsdato"] == "02-02-2024"
+    assert meta_info["Ikrafttrædelsesdato"] == "01-07-2024"
+    assert missing_fields(meta_info) == []
+
+
+def test_ids_and_single_years_send_the_hearing_to_its_details_page():
+    meta_info = build_meta(IDS)
+
+    assert missing_fields(meta_info) == ["Høringstype", "Myndighed", "Høringsår"]
+    assert meta_info["Område"] == "Miljø"
+
+
+@pytest.mark.parametrize(
+    "label, value, expected",
+    [
+        ("Høringsfrist", "2024-03-01T12:00:00", "01-03-2024"),
+        ("Høringsfrist", "/Date(1709247600000)/", "01-03-2024"),
+        ("Høringsfrist", "snart", None),
+        ("Høringsår", "2011/2012", "2011/2012"),
+        ("Høringsår", "2012", None),
+        ("Høringsår", 2012, None),
+        ("Myndighed", {"Name": "Finanstilsynet"}, "Finanstilsynet"),
+        ("Myndighed", "41", None),
+        ("Myndighed", "", None),
+        ("Officiel titel", "  Forslag til lov  ", "Forslag til lov"),
+        ("Officiel titel", True, None),
+    ],
+)
+def test_search_value(label, value, expected):
+    assert search_value(label, value) == expected
+
+
+def test_apply_filters_on_the_search_page():
+    hearings = SEARCH_PAGE["Hearings"]
+
+    assert ids(apply_filters(hearings, [make_filter(authorities=["finanstilsynet"])])) == [68003]
+    assert ids(apply_filters(hearings, [make_filter(since=datetime.date(2024, 2, 1))])) == [68012, 68003]
+    # The third hearing only has the id of its type, so it is left out by a type filter
+    assert ids(apply_filters(hearings, [make_filter(hearing_types=["Lovforslag", "Bekendtgørelser"])])) == [68012, 68003]
+    assert ids(apply_filters(hearings, [])) == [68012, 68003, 67991]
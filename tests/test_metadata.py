@@ -0,0 +1,74 @@
+import json
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from hoering.scraper.metadata import META_COLUMNS, consolidate_meta, load_metadata
+
+
+def write_meta(mainpath, _id, meta_info):
+    folder = mainpath / str(_id)
+    folder.mkdir(parents=True)
+    (folder / f"{_id}_meta.json").write_text(json.dumps(meta_info, ensure_ascii=False), encoding="utf-8")
+
+
+def test_parts_with_different_fields_read_back_as_one_frame(tmp_path):
+    mainpath, dataset = tmp_path / "hearings", tmp_path / "metadata.parquet"
+    # Built from the search results: no contact person, and a field the schema does not know
+    write_meta(
+        mainpath,
+        101,
+        {
+            "Høringstype": "Lovforslag",
+            "Myndighed": "Skatteministeriet",
+            "Publiceringsdato": "02-02-2024",
+            "details": "",
+            "source": "search",
+            "Sagsnummer": "2024-123",
+        },
+    )
+    assert consolidate_meta(mainpath, dataset, workers=1) == 1
+
+    # Parsed from the Details page: contact person and an effective date, but no source
+    write_meta(
+        mainpath,
+        102,
+        {
+            "Høringstype": "Bekendtgørelser",
+            "Myndighed": "Finanstilsynet",
+            "Publiceringsdato": "01-03-2024",
+            "Ikrafttrædelsesdato": "01-07-2024",
+            "Kontaktperson": "Jens Hansen",
+            "details": "Høringsdetaljer",
+        },
+    )
+    # Only the new folder is read, into a second part file
+    assert consolidate_meta(mainpath, dataset, workers=1) == 1
+    assert len(list(dataset.glob("part-*.parquet"))) == 2
+
+    df = load_metadata(dataset)
+
+    assert list(df.columns) == META_COLUMNS
+    assert list(df["Høringsnr"]) == [102, 101]
+    assert df["Høringsnr"].dtype == "int64"
+    assert list(df["Publiceringsdato"]) == [pd.Timestamp("2024-03-01"), pd.Timestamp("2024-02-02")]
+    assert df["Ikrafttrædelsesdato"].isna().tolist() == [False, True]
+    assert isinstance(df["Høringstype"].dtype, pd.CategoricalDtype)
+    assert set(df["Høringstype"].cat.categories) == {"Lovforslag", "Bekendtgørelser"}
+    assert df["Kontaktperson"].tolist()[0] == "Jens Hansen" and pd.isna(df["Kontaktperson"][1])
+    assert pd.isna(df["source"][0]) and df["source"][1] == "search"
+    assert pd.isna(df["extra"][0])
+    assert json.loads(df["extra"][1]) == {"Sagsnummer": "2024-123"}
+
+
+def test_rebuild_replaces_the_parts(tmp_path):
+    mainpath, dataset = tmp_path / "hearings", tmp_path / "metadata.parquet"
+    write_meta(mainpath, 101, {"Myndighed": "Skatteministeriet"})
+    consolidate_meta(mainpath, dataset, workers=1)
+    consolidate_meta(mainpath, dataset, workers=1)
+
+    assert consolidate_meta(mainpath, dataset, workers=1, incremental=False) == 1
+    assert len(list(dataset.glob("part-*.parquet"))) == 1
+    assert list(load_metadata(dataset)["Høringsnr"]) == [101]
@@ -0,0 +1,123 @@
+import json
+import os
+import re
+
+from hoering.scraper import metrics
+from hoering.scraper.metrics import CrawlMetrics, Histogram, endpoint_of
+
+DETAILS = "https://hoeringsportalen.dk/Hearing/Details/123"
+ZIP = "https://hoeringsportalen.dk/Hearing/DownloadDocumentsAsZipFile?hearingId=123"
+
+
+def crawl_metrics():
+    crawl = CrawlMetrics()
+    crawl.observe_request(DETAILS, 200, 0.08)
+    crawl.observe_request(DETAILS.replace("123", "456"), 304, 0.3)
+    crawl.observe_request(DETAILS, None, 40)
+    crawl.observe_request(ZIP, 200, 1.5)
+    crawl.observe_transfer(ZIP, 12.0)
+    crawl.add_bytes(DETAILS, 5000)
+    crawl.add_bytes(ZIP, 3_000_000)
+    crawl.cache_hit(DETAILS)
+    crawl.retry(DETAILS, "timeout")
+    crawl.archive_size(123, 3_000_000)
+    crawl.set_gauge("concurrency", 4)
+    return crawl
+
+
+def test_endpoint_of():
+    assert endpoint_of(DETAILS) == "/Hearing/Details/{id}"
+    assert endpoint_of(ZIP) == "/Hearing/DownloadDocumentsAsZipFile"
+    assert endpoint_of("https://hoeringsportalen.dk") == "/"
+
+
+def test_histogram():
+    histogram = Histogram((1, 10))
+    for value in (0.5, 1, 5, 50):
+        histogram.observe(value)
+    assert list(histogram.cumulative()) == [(1, 2), (10, 3), ("+Inf", 4)]
+    assert histogram.quantile(0.5) == 1
+    assert histogram.quantile(0.99) == float("inf")
+    assert Histogram((1,)).quantile(0.5) is None
+
+
+def test_prometheus_exposition_format():
+    text = crawl_metrics().prometheus()
+    lines = text.splitlines()
+    assert text.endswith("\n")
+
+    # Every metric has a HELP and a TYPE line, in that order, before its samples
+    declared = {}
+    for i, line in enumerate(lines):
+        if line.startswith("# HELP "):
+            name = line.split()[2]
+            assert lines[i + 1].startswith(f"# TYPE {name} ")
+            declared[name] = lines[i + 1].split()[3]
+    assert declared == {
+        "hoering_request_duration_seconds": "histogram",
+        "hoering_transfer_duration_seconds": "histogram",
+        "hoering_response_bytes_total": "counter",
+        "hoering_cache_hits_total": "counter",
+        "hoering_responses_total": "counter",
+        "hoering_retries_total": "counter",
+        "hoering_archive_bytes": "histogram",
+        "hoering_concurrency": "gauge",
+        "hoering_crawl_started_seconds": "gauge",
+    }
+
+    samples = {}
+    for line in lines:
+        if line.startswith("#"):
+            continue
+        match = re.fullmatch(r"([a-z_]+)(\{.*\})? (\S+)", line)
+        assert match, line
+        name, labels, value = match.groups()
+        assert re.sub(r"_(bucket|sum|count)$", "", name) in declared, name
+        samples[name + (labels or "")] = float(value)
+
+    assert samples['hoering_response_bytes_total{endpoint="/Hearing/Details/{id}"}'] == 5000
+    assert samples['hoering_cache_hits_total{endpoint="/Hearing/Details/{id}"}'] == 1
+    assert samples['hoering_responses_total{endpoint="/Hearing/Details/{id}",status="304"}'] == 1
+    assert samples['hoering_responses_total{endpoint="/Hearing/Details/{id}",status="error"}'] == 1
+    assert samples['hoering_retries_total{endpoint="/Hearing/Details/{id}",reason="timeout"}'] == 1
+    assert samples['hoering_request_duration_seconds_bucket{endpoint="/Hearing/Details/{id}",le="0.1"}'] == 1
+    assert samples['hoering_request_duration_seconds_bucket{endpoint="/Hearing/Details/{id}",le="+Inf"}'] == 3
+    assert samples['hoering_request_duration_seconds_count{endpoint="/Hearing/Details/{id}"}'] == 3
+    assert samples['hoering_transfer_duration_seconds_sum{endpoint="/Hearing/DownloadDocumentsAsZipFile"}'] == 12
+    assert samples["hoering_archive_bytes_count"] == 1
+    assert samples["hoering_concurrency"] == 4
+
+
+def test_summary():
+    summary = crawl_metrics().summary()
+    details = summary["endpoints"]["/Hearing/Details/{id}"]
+    assert details["requests"] == 3
+    assert details["bytes"] == 5000
+    assert details["cache_hits"] == 1
+    assert details["statuses"] == {"200": 1, "304": 1, "error": 1}
+    assert details["transfer_seconds"] is None
+    assert summary["endpoints"]["/Hearing/DownloadDocumentsAsZipFile"]["transfer_seconds"] == 12
+    assert summary["archives"]["hearings"] == 1
+    assert summary["archives"]["largest"] == {"123": 3_000_000}
+    assert summary["concurrency"] == 4
+
+
+def test_write_replaces_the_files_atomically(tmp_path, monkeypatch):
+    crawl = crawl_metrics()
+    (tmp_path / "crawl.prom").write_text("# an old run\n")
+
+    replaced = []
+
+    def replace(src, dst):
+        # The new file is complete before it takes the place of the old one
+        assert os.path.getsize(src) > 0
+        replaced.append((os.path.basename(src), os.path.basename(dst)))
+        os.rename(src, dst)
+
+    monkeypatch.setattr(metrics.os, "replace", replace)
+    crawl.write(tmp_path, name="crawl")
+
+    assert replaced == [("crawl.prom.tmp", "crawl.prom"), ("crawl.json.tmp", "crawl.json")]
+    assert sorted(os.listdir(tmp_path)) == ["crawl.json", "crawl.prom"]
+    assert (tmp_path / "crawl.prom").read_text() == crawl.prometheus()
+    assert json.loads((tmp_path / "crawl.json").read_text())["endpoints"]["/Hearing/Details/{id}"]["bytes"] == 5000
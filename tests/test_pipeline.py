@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from hoering.runner import Pipeline, Stage
+
+# Set by the initializer of a worker process
+worker_tag = None
+
+
+def run(stages, items, queue_size=2, timeout=30):
+    """Run a pipeline in a thread, and fail instead of hanging if STOP does not reach every worker."""
+    result = {}
+    thread = threading.Thread(
+        target=lambda: result.update(items=Pipeline(stages, queue_size).run(items)),
+        daemon=True,
+    )
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "the pipeline did not stop"
+    return result["items"]
+
+
+def slow_double(x):
+    time.sleep(0.001 * (x % 3))
+    return x * 2
+
+
+def test_every_item_passes_every_stage():
+    stages = [
+        Stage("double", slow_double, workers=3),
+        Stage("increment", lambda x: x + 1, workers=2),
+        Stage("identity", lambda x: x, workers=4),
+    ]
+
+    assert sorted(run(stages, range(50))) == [x * 2 + 1 for x in range(50)]
+    assert [stage.stats["done"] for stage in stages] == [50, 50, 50]
+    assert [stage.stats["failed"] for stage in stages] == [0, 0, 0]
+
+
+def test_stop_reaches_stages_after_an_empty_run():
+    stages = [Stage("a", lambda x: x, workers=2), Stage("b", lambda x: x, workers=3)]
+
+    assert run(stages, []) == []
+
+
+def test_more_workers_than_items():
+    stages = [Stage("a", lambda x: x, workers=8), Stage("b", lambda x: x, workers=8)]
+
+    assert sorted(run(stages, [1, 2])) == [1, 2]
+
+
+def test_failed_and_dropped_items_are_counted_and_not_passed_on():
+    def check(x):
+        if x % 5 == 0:
+            raise ValueError(f"bad item {x}")
+        return x
+
+    seen = []
+    stages = [
+        Stage("check", check, workers=2),
+        # None drops an item, and counts as a failure of the stage
+        Stage("drop_odd", lambda x: x if x % 2 == 0 else None, workers=2),
+        Stage("collect", lambda x: seen.append(x) or x, workers=1),
+    ]
+
+    items = run(stages, range(20))
+    assert sorted(items) == sorted(seen) == [2, 4, 6, 8, 12, 14, 16, 18]
+    assert stages[0].stats == {**stages[0].stats, "done": 16, "failed": 4}
+    assert stages[1].stats == {**stages[1].stats, "done": 8, "failed": 8}
+    assert stages[2].stats == {**stages[2].stats, "done": 8, "failed": 0}
+
+
+def test_on_result_runs_in_the_main_process():
+    recorded = []
+
+    def on_result(item, result):
+        recorded.append((item, result))
+        return item
+
+    stages = [Stage("abs", abs, workers=2, processes=True, on_result=on_result)]
+
+    assert sorted(run(stages, [-1, -2, 3])) == [-2, -1, 3]
+    assert sorted(recorded) == [(-2, 2), (-1, 1), (3, 3)]
+
+
+def test_failing_on_result_counts_as_a_failure():
+    def on_result(item, result):
+        raise RuntimeError("catalog is locked")
+
+    stages = [Stage("a", lambda x: x, on_result=on_result), Stage("b", lambda x: x)]
+
+    assert run(stages, [1, 2]) == []
+    assert stages[0].stats["failed"] == 2
+    assert stages[1].stats["done"] == 0
+
+
+def set_tag(tag):
+    global worker_tag
+    worker_tag = f"{tag}-{os.getpid()}"
+
+
+def tagged(x):
+    return x, worker_tag
+
+
+def test_initializer_gets_the_context_of_the_run():
+    events = []
+
+    @contextmanager
+    def context():
+        events.append("enter")
+        yield ("run",)
+        events.append("exit")
+
+    stages = [
+        Stage("tag", tagged, workers=2, processes=True, initializer=set_tag, context=context)
+    ]
+
+    items = run(stages, range(6))
+    assert sorted(x for x, _ in items) == list(range(6))
+    # Every item was handled in a worker process that ran the initializer with the value of the context
+    assert all(tag.startswith("run-") and tag != f"run-{os.getpid()}" for _, tag in items)
+    assert events == ["enter", "exit"]
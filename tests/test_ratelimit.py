@@ -0,0 +1,65 @@
+import asyncio
+import time
+
+import pytest
+
+from hoering.scraper.ratelimit import HostRateLimiter, TokenBucket
+
+
+def test_a_full_bucket_allows_a_burst_then_spaces_requests():
+    bucket = TokenBucket(rate=10, capacity=3)
+
+    waits = [bucket.reserve() for _ in range(6)]
+
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    # Borrowed tokens are paid back at the rate, one tenth of a second each
+    assert waits[3:] == pytest.approx([0.1, 0.2, 0.3], abs=0.02)
+
+
+def test_the_bucket_refills_at_the_rate():
+    bucket = TokenBucket(rate=20, capacity=1)
+
+    assert bucket.reserve() == 0.0
+    time.sleep(0.06)
+    assert bucket.reserve() == 0.0
+    # The refill never goes above the capacity
+    time.sleep(0.2)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(0.05, abs=0.02)
+
+
+def test_acquire_keeps_to_the_rate():
+    bucket = TokenBucket(rate=20, capacity=1)
+
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    elapsed = time.monotonic() - start
+
+    assert 0.25 - 0.02 <= elapsed < 0.5
+
+
+def test_acquire_async_keeps_to_the_rate_across_tasks():
+    bucket = TokenBucket(rate=20, capacity=1)
+
+    async def run():
+        start = time.monotonic()
+        await asyncio.gather(*(bucket.acquire_async() for _ in range(6)))
+        return time.monotonic() - start
+
+    assert 0.25 - 0.02 <= asyncio.run(run()) < 0.5
+
+
+def test_hosts_have_their_own_bucket():
+    limiter = HostRateLimiter(rate=5, capacity=1)
+
+    assert limiter.bucket("http://a.test/x") is limiter.bucket("http://a.test/y?z=1")
+    assert limiter.bucket("http://a.test/x") is not limiter.bucket("http://b.test/x")
+
+    start = time.monotonic()
+    limiter.acquire("http://a.test/1")
+    limiter.acquire("http://b.test/1")
+    # A second request to a waits a fifth of a second, a first request to another host does not
+    assert time.monotonic() - start < 0.1
+    limiter.acquire("http://a.test/2")
+    assert time.monotonic() - start >= 0.18
@@ -0,0 +1,164 @@
+import json
+import time
+from zipfile import ZipFile
+
+from hoering.scraper.meta import make_filter
+from hoering.scraper.scrape import HPScraper
+
+
+def scraper_for(portal, **kwargs):
+    scraper = HPScraper(base_url=portal.base_url, **kwargs)
+    scraper.subpages = list(portal.hearings)
+    return scraper
+
+
+def test_populate_async_downloads_every_hearing(portal, corpus, tmp_path):
+    portal.latency = 0.1
+    scraper = scraper_for(portal, rate_limit=100)
+    ids = [x["Id"] for x in portal.hearings]
+
+    start = time.monotonic()
+    scraper.populate(tmp_path, concurrency=4)
+    elapsed = time.monotonic() - start
+
+    for _id in ids:
+        folder = tmp_path / str(_id)
+        with ZipFile(folder / f"{_id}.zip") as zf:
+            assert zf.testzip() is None
+        assert (folder / f"{_id}.zip").read_bytes() == (corpus / "zips" / f"{_id}.zip").read_bytes()
+        meta = json.loads((folder / f"{_id}_meta.json").read_text())
+        assert meta["Officiel titel"] == f"Forslag til lov nr. {_id}"
+        assert not list(folder.glob("*.part"))
+    # 12 requests of 0.1 seconds each take 1.2 seconds one at a time
+    assert portal.stats["requests"] == 2 * len(ids)
+    assert elapsed < 0.9
+
+
+def test_populate_async_keeps_to_the_rate_limit(portal, tmp_path):
+    # A burst of 2 requests, then one every 0.1 seconds
+    scraper = scraper_for(portal, rate_limit=10)
+    scraper.rate_limiter.capacity = 2
+
+    start = time.monotonic()
+    scraper.populate(tmp_path, concurrency=6)
+
+    assert portal.stats["requests"] == 12
+    assert time.monotonic() - start >= (12 - 2) / 10 - 0.05
+
+
+def test_populate_async_skips_downloaded_hearings(portal, tmp_path):
+    scraper = scraper_for(portal, rate_limit=100)
+    scraper.populate(tmp_path, concurrency=4)
+    portal.reset_stats()
+
+    scraper_for(portal, rate_limit=100).populate(tmp_path, concurrency=4)
+
+    assert portal.stats["requests"] == 0
+
+
+def test_populate_documents_records_completed_hearings(portal, corpus, tmp_path):
+    scraper = scraper_for(portal, rate_limit=100)
+    ids = [x["Id"] for x in portal.hearings]
+
+    scraper.populate_documents(tmp_path, ["liste"])
+
+    for _id in ids:
+        folder = tmp_path / str(_id)
+        manifest = json.loads((folder / f"{_id}_documents.json").read_text())
+        assert manifest["documents"] == [
+            {"name": "hoeringsliste.pdf", "file": "hoeringsliste.pdf", "size": 20_000}
+        ]
+        assert (folder / "hoeringsliste.pdf").read_bytes() == (
+            corpus / "documents" / f"{_id}_hoeringsliste.pdf"
+        ).read_bytes()
+
+    portal.reset_stats()
+    scraper.populate_documents(tmp_path, ["liste"])
+    assert portal.stats["requests"] == 0
+
+
+def test_hearings_without_matching_documents_are_done(portal, tmp_path):
+    scraper = scraper_for(portal, rate_limit=100)
+
+    scraper.populate_documents(tmp_path, ["no such document"])
+    _id = portal.hearings[0]["Id"]
+    assert json.loads((tmp_path / str(_id) / f"{_id}_documents.json").read_text()) == {
+        "documents": []
+    }
+
+    portal.reset_stats()
+    scraper.populate_documents(tmp_path, ["no such document"])
+    assert portal.stats["requests"] == 0
+
+
+def test_a_failed_document_is_downloaded_on_the_next_run(portal, tmp_path):
+    failing = portal.hearings[0]["Id"]
+    scraper = scraper_for(portal, rate_limit=100)
+    download_file = scraper.download_file
+
+    def flaky(url, file_path, **kwargs):
+        if f"hearingId={failing}&" in url and "brev" in url:
+            raise IOError("connection reset")
+        return download_file(url, file_path, **kwargs)
+
+    scraper.download_file = flaky
+    scraper.populate_documents(tmp_path, ["liste", "brev"])
+
+    # The other document of the hearing was downloaded, but the hearing is not done
+    assert (tmp_path / str(failing) / "hoeringsliste.pdf").exists()
+    assert not (tmp_path / str(failing) / f"{failing}_documents.json").exists()
+
+    portal.reset_stats()
+    scraper_for(portal, rate_limit=100).populate_documents(tmp_path, ["liste", "brev"])
+
+    manifest = json.loads((tmp_path / str(failing) / f"{failing}_documents.json").read_text())
+    assert sorted(x["file"] for x in manifest["documents"]) == ["hoeringsbrev.pdf", "hoeringsliste.pdf"]
+    # Only the failed hearing is requested again: its Details page and its two documents
+    assert portal.stats["requests"] == 3
+
+
+def test_populate_only_downloads_the_filtered_hearing_types(portal, tmp_path):
+    scraper = scraper_for(portal, rate_limit=100)
+    wanted = {x["Id"] for x in portal.hearings if x["HearingType"] == "Lovforslag"}
+    assert wanted and len(wanted) < len(portal.hearings)
+
+    scraper.populate(tmp_path, concurrency=4, filters=[make_filter(hearing_types=["lovforslag"])])
+
+    assert {int(x.name) for x in tmp_path.iterdir()} == wanted
+    assert portal.stats["requests"] == 2 * len(wanted)
+
+
+def test_meta_from_search_is_completed_from_the_details_page(portal, tmp_path):
+    scraper = scraper_for(portal, rate_limit=100)
+    _id = portal.hearings[0]["Id"]
+    (tmp_path / str(_id)).mkdir()
+    scraper.write_meta(tmp_path / str(_id), _id, {"Høringstype": "Lovforslag", "details": "", "source": "search"})
+    # Meta info from the Details page is never fetched again
+    other = portal.hearings[1]["Id"]
+    (tmp_path / str(other)).mkdir()
+    scraper.write_meta(tmp_path / str(other), other, {"Høringstype": "Lovforslag", "details": ""})
+
+    assert scraper.complete_meta(tmp_path) == 1
+    meta = json.loads((tmp_path / str(_id) / f"{_id}_meta.json").read_text())
+    assert meta["source"] == "details"
+    assert meta["Officiel titel"] == f"Forslag til lov nr. {_id}"
+    assert portal.stats["requests"] == 1
+
+    assert scraper.complete_meta(tmp_path) == 0
+    assert portal.stats["requests"] == 1
+
+
+def test_pages_served_from_the_http_cache_are_not_counted_as_transferred(portal, corpus, tmp_path):
+    scraper = scraper_for(portal, rate_limit=100, cache_dir=tmp_path / "http_cache")
+    _id = portal.hearings[0]["Id"]
+    size = len((corpus / "details" / f"{_id}.html").read_bytes())
+
+    for _ in range(3):
+        response = scraper.request("GET", scraper.details_url(_id))
+        assert response.content == (corpus / "details" / f"{_id}.html").read_bytes()
+
+    endpoint = scraper.metrics.summary()["endpoints"]["/Hearing/Details/{id}"]
+    assert endpoint["bytes"] == size
+    assert endpoint["cache_hits"] == 2
+    assert endpoint["statuses"] == {"200": 1, "304": 2}
+    assert 'hoering_cache_hits_total{endpoint="/Hearing/Details/{id}"} 2' in scraper.metrics.prometheus()
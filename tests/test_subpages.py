@@ -0,0 +1,129 @@
+import json
+
+import pytest
+
+from hoering.catalog import HearingCatalog
+from hoering.scraper import scrape
+from hoering.scraper.scrape import HPScraper
+
+
+def hearing(_id, day):
+    return {"Id": _id, "Title": f"Høring {_id}", "PublicationDate": f"2024-03-{day:02d}T00:00:00"}
+
+
+@pytest.fixture
+def search(portal):
+    """The mock portal with 8 hearings published a day apart, newest first, and a scraper for it."""
+    portal.hearings = [hearing(100 + day, day) for day in range(20, 12, -1)]
+    return portal, HPScraper(base_url=portal.base_url, rate_limit=100)
+
+
+def test_get_subpages_stops_at_the_date(search):
+    portal, scraper = search
+    scraper.get_subpages(page_size=3, since="2024-03-17T00:00:00")
+
+    # The second page reaches the 16th, so the third is not requested
+    assert [x["Id"] for x in scraper.subpages] == [120, 119, 118, 117, 116, 115]
+    assert portal.stats["requests"] == 2
+
+
+def test_get_subpages_stops_at_known_hearings(search):
+    portal, scraper = search
+    scraper.get_subpages(page_size=3, known_ids={117, 116, 115, 114, 113})
+
+    assert [x["Id"] for x in scraper.subpages] == [120, 119, 118]
+    assert portal.stats["requests"] == 2
+
+
+def test_update_subpages_only_adds_new_hearings(search, tmp_path):
+    portal, scraper = search
+    subpages_file = tmp_path / "subpages.json"
+    state_file = tmp_path / "state.json"
+
+    assert len(scraper.update_subpages(subpages_file, state_file)) == 8
+    portal.hearings.insert(0, hearing(121, 21))
+    portal.reset_stats()
+
+    scraper = HPScraper(base_url=portal.base_url, rate_limit=100)
+    assert scraper.update_subpages(subpages_file, state_file) == [hearing(121, 21)]
+    assert portal.stats["requests"] == 1
+
+    assert json.loads(subpages_file.read_text()) == portal.hearings
+    state = json.loads(state_file.read_text())
+    assert state["last_publication_date"] == "2024-03-21T00:00:00"
+    assert state["ids"] == list(range(113, 122))
+
+    # Nothing new
+    assert HPScraper(base_url=portal.base_url, rate_limit=100).update_subpages(subpages_file, state_file) == []
+
+
+def test_update_subpages_with_a_catalog(search, tmp_path):
+    portal, _ = search
+    catalog = HearingCatalog(tmp_path / "catalog.sqlite")
+
+    assert len(HPScraper(base_url=portal.base_url, rate_limit=100, catalog=catalog).update_subpages()) == 8
+    portal.hearings.insert(0, hearing(121, 21))
+
+    scraper = HPScraper(base_url=portal.base_url, rate_limit=100, catalog=catalog)
+    assert scraper.update_subpages() == [hearing(121, 21)]
+    assert [x["Id"] for x in scraper.subpages] == list(range(121, 112, -1))
+    assert catalog.get_state("high_water_mark") == {"last_publication_date": "2024-03-21T00:00:00"}
+    catalog.close()
+
+
+def test_update_subpages_needs_files_without_a_catalog(search):
+    _, scraper = search
+    with pytest.raises(ValueError):
+        scraper.update_subpages()
+
+
+def sequential_subpages(portal, **kwargs):
+    scraper = HPScraper(base_url=portal.base_url, rate_limit=100)
+    scraper.get_subpages(page_size=3, **kwargs)
+    return scraper.subpages
+
+
+def test_parallel_pages_keep_the_order_of_the_portal(search):
+    portal, scraper = search
+    portal.latency = 0.05
+    expected = sequential_subpages(portal)
+    portal.reset_stats()
+
+    scraper.get_subpages(page_size=3, concurrency=3)
+    assert scraper.subpages == expected == portal.hearings
+    # The first page tells the total, so the other two are requested at once, and no empty page after them
+    assert portal.stats["requests"] == 3
+
+
+def test_parallel_pages_up_to_a_total(search):
+    portal, scraper = search
+    scraper.get_subpages(total=5, page_size=3, concurrency=3)
+    assert scraper.subpages == portal.hearings[:5]
+    assert portal.stats["requests"] == 2
+
+
+def test_parallel_pages_without_a_reported_total(search, monkeypatch):
+    portal, scraper = search
+    monkeypatch.setattr(scrape, "SEARCH_TOTAL_KEYS", ())
+
+    scraper.get_subpages(page_size=3, concurrency=2)
+    assert scraper.subpages == portal.hearings
+    # Batches of two pages until one is empty: pages 2-3, then 4-5
+    assert portal.stats["requests"] == 5
+
+
+def test_parallel_pages_are_deduplicated(search):
+    portal, scraper = search
+    search_hearings = scraper.search_hearings
+
+    def publish_during_the_crawl(skip, *args):
+        page = search_hearings(skip, *args)
+        if skip == 0:
+            # A hearing published after the first page shifts the later windows by one
+            portal.hearings.insert(0, hearing(121, 21))
+        return page
+
+    scraper.search_hearings = publish_during_the_crawl
+    scraper.get_subpages(page_size=3, concurrency=3)
+
+    assert [x["Id"] for x in scraper.subpages] == list(range(120, 112, -1))
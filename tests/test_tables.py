@@ -0,0 +1,37 @@
+"""
+tests/fixtures/tables/letter_and_list.pdf is a generated two-page hearing file: a letter (text and a single
+underline under its heading) and a hearing list drawn as a ruled table, one rectangle per cell.
+"""
+
+from pathlib import Path
+
+import pytest
+
+from hoering.parser import tables
+
+fitz = pytest.importorskip("fitz")
+
+FIXTURE = Path(__file__).parent / "fixtures" / "tables" / "letter_and_list.pdf"
+LETTER, LIST = 0, 1
+
+
+def test_table_page_is_flagged():
+    with fitz.open(FIXTURE) as doc:
+        assert tables.classify_page(doc[LIST]) == tables.TABLE
+        assert tables.classify_page(doc[LETTER]) == tables.NO_TABLE
+
+
+def test_cell_edges_join_into_rulings():
+    with fitz.open(FIXTURE) as doc:
+        page = doc[LIST]
+        # The vertical edge of a single cell is shorter than height / line_scale, but the column lines are not
+        assert tables.rulings(page.get_drawings(), page.rect.width, page.rect.height) == (5, 3)
+        page = doc[LETTER]
+        assert tables.rulings(page.get_drawings(), page.rect.width, page.rect.height) == (1, 0)
+
+
+def test_merge_segments():
+    # Two touching cell edges, one overlapping, one a little off the line, and one apart
+    segments = [(100, 0, 24), (100, 24, 48), (100, 40, 60), (101, 60, 70), (100, 90, 100), (200, 0, 10)]
+    assert tables.merge_segments(segments) == [70, 10, 10]
+    assert tables.merge_segments([]) == []
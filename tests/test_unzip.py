@@ -0,0 +1,115 @@
+import csv
+import json
+import os
+import zipfile
+
+import pytest
+
+from hoering.scraper.unzip import load_manifest, manifest_path, unzip_folder
+from hoering.zipfs import HearingArchives
+
+MEMBERS = {
+    "Høringssvar KL.pdf": b"%PDF-1.4 svar fra KL",
+    "bilag/svar 2.docx": b"docx bytes" * 100,
+    "Hoeringsbrev.pdf": b"%PDF-1.4 brev",
+}
+
+
+@pytest.fixture
+def folder(tmp_path):
+    folder = tmp_path / "hearings" / "101"
+    folder.mkdir(parents=True)
+    with zipfile.ZipFile(folder / "101.zip", "w") as zf:
+        for name, data in MEMBERS.items():
+            zf.writestr(name, data)
+    return folder
+
+
+def test_manifest_records_the_members(folder):
+    assert unzip_folder(folder) == ("101", sum(len(x) for x in MEMBERS.values()), False)
+
+    manifest = json.loads(manifest_path(folder).read_text())
+    assert manifest["zip_size"] == (folder / "101.zip").stat().st_size
+    assert [(x["name"], x["file"], x["size"]) for x in manifest["members"]] == [
+        ("Høringssvar KL.pdf", "Høringssvar_KL.pdf", 20),
+        ("bilag/svar 2.docx", "bilag�svar_2.docx", 1000),
+        ("Hoeringsbrev.pdf", "Hoeringsbrev.pdf", 13),
+    ]
+    for member in manifest["members"]:
+        assert (folder / member["file"]).read_bytes() == MEMBERS[member["name"]]
+    assert not list(folder.glob("*.part")) and not list(folder.glob("*.tmp"))
+
+
+def test_rerun_is_idempotent(folder):
+    unzip_folder(folder)
+    mtimes = {x.name: x.stat().st_mtime_ns for x in folder.iterdir()}
+
+    assert unzip_folder(folder, verify=True)[2]
+    assert {x.name: x.stat().st_mtime_ns for x in folder.iterdir()} == mtimes
+
+
+def test_interrupted_run_resumes(folder):
+    unzip_folder(folder)
+    kept = folder / "Høringssvar_KL.pdf"
+    kept_mtime = kept.stat().st_mtime_ns
+
+    # A crash while writing the last member: it is only a .part file, and there is no manifest yet
+    os.replace(folder / "Hoeringsbrev.pdf", folder / "Hoeringsbrev.pdf.part")
+    manifest_path(folder).unlink()
+    assert load_manifest(folder) is None
+
+    assert not unzip_folder(folder)[2]
+    assert (folder / "Hoeringsbrev.pdf").read_bytes() == MEMBERS["Hoeringsbrev.pdf"]
+    assert kept.stat().st_mtime_ns == kept_mtime
+    assert load_manifest(folder, verify=True) is not None
+
+
+def test_changed_files_are_extracted_again(folder):
+    unzip_folder(folder)
+
+    # Same size, other bytes: only found when the CRC is checked
+    (folder / "Hoeringsbrev.pdf").write_bytes(b"%PDF-1.4 xxxx")
+    assert load_manifest(folder) is not None
+    assert load_manifest(folder, verify=True) is None
+    assert not unzip_folder(folder, verify=True)[2]
+    assert (folder / "Hoeringsbrev.pdf").read_bytes() == MEMBERS["Hoeringsbrev.pdf"]
+
+    # A new download of the zip file makes the manifest stale
+    with zipfile.ZipFile(folder / "101.zip", "a") as zf:
+        zf.writestr("svar 3.pdf", b"%PDF-1.4 nyt svar")
+    assert load_manifest(folder) is None
+    assert not unzip_folder(folder)[2]
+    assert (folder / "svar_3.pdf").exists()
+
+
+def test_removed_members_are_logged_without_extracting(folder, tmp_path):
+    from hoering.parser.file_convert.resources.remove_files_rules import get_matching_members, process_log_to_csv
+
+    archives = HearingArchives(folder.parent, tmp_path / "scratch")
+    log_entries, rule_to_filenames = get_matching_members(archives)
+
+    # Hoeringsbrev matches rule 2 (hoering without svar) and rule 5 (hoeringsbrev); the svar files match nothing
+    path = folder / "Hoeringsbrev.pdf"
+    assert [(x["filename"], x["rule"]) for x in log_entries] == [(path, 2), (path, 5)]
+    assert {rule: files for (rule, _), files in rule_to_filenames.items()} == {2: [path], 5: [path]}
+    assert os.listdir(folder) == ["101.zip"]
+
+    process_log_to_csv(tmp_path / "logs", log_entries, rule_to_filenames)
+    with open(tmp_path / "logs" / "removal_log.csv", encoding="utf-8") as f:
+        assert [(row["filename"], row["rule"]) for row in csv.DictReader(f)] == [(str(path), "2"), (str(path), "5")]
+
+    # Nothing changes on disk, so matching again gives the same result
+    assert get_matching_members(archives) == (log_entries, rule_to_filenames)
+    archives.close()
+
+
+def test_removing_unzipped_files_is_idempotent(folder, tmp_path):
+    from hoering.parser.file_convert.resources.remove_files_rules import match_and_remove_files
+
+    unzip_folder(folder)
+    # The matched file (once, though two rules match it), and the zip file and manifest
+    assert match_and_remove_files(folder.parent, tmp_path / "logs") == 3
+    assert sorted(os.listdir(folder)) == ["Høringssvar_KL.pdf", "bilag�svar_2.docx"]
+
+    assert match_and_remove_files(folder.parent, tmp_path / "logs") == 0
+    assert sorted(os.listdir(folder)) == ["Høringssvar_KL.pdf", "bilag�svar_2.docx"]
@@ -0,0 +1,124 @@
+import pytest
+
+from hoering.scraper import workqueue
+from hoering.scraper.workqueue import RedisLeaseStore, SQLiteLeaseStore
+
+
+class Clock:
+    """Stands in for the time module of workqueue, so leases expire without waiting."""
+
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(workqueue, "time", clock)
+    return clock
+
+
+@pytest.fixture(params=["sqlite", "redis", "redis-decoded"])
+def store(request, tmp_path, clock):
+    if request.param == "sqlite":
+        store = SQLiteLeaseStore(tmp_path / "work_queue.sqlite", max_attempts=2)
+        yield store
+        store.conn.close()
+        return
+
+    fakeredis = pytest.importorskip("fakeredis")
+    # The leases are taken by Lua scripts, which fakeredis runs with lupa
+    pytest.importorskip("lupa")
+    client = fakeredis.FakeRedis(decode_responses=request.param == "redis-decoded")
+    yield RedisLeaseStore(client, prefix="test", max_attempts=2)
+    client.flushall()
+
+
+def test_add_is_idempotent(store):
+    store.add([1, 2, 3])
+    store.add([2, 3, 4])
+    assert store.counts() == {"pending": 4, "leased": 0, "done": 0, "failed": 0}
+
+
+def test_expired_lease_is_reclaimed(store, clock):
+    store.add([1, 2, 3])
+    leased_a = store.lease("a", 2, lease_seconds=10)
+    assert len(leased_a) == 2
+
+    # Only the hearing nobody holds is handed out while the lease runs
+    leased_b = store.lease("b", 5, lease_seconds=100)
+    assert set(leased_b) == {1, 2, 3} - set(leased_a)
+
+    clock.now += 11
+    assert sorted(store.lease("b", 5, lease_seconds=10)) == sorted(leased_a)
+
+    # Worker a lost its hearings, and can no longer renew or complete them
+    _id = leased_a[0]
+    assert not store.renew(_id, "a", 10)
+    store.complete(_id, "a")
+    assert store.counts()["done"] == 0
+
+    store.complete(_id, "b")
+    assert store.counts()["done"] == 1
+
+
+def test_renewed_lease_is_not_reclaimed(store, clock):
+    store.add([1])
+    assert store.lease("a", 1, lease_seconds=10) == [1]
+
+    clock.now += 6
+    assert store.renew(1, "a", 10)
+    clock.now += 6
+    assert store.lease("b", 1, lease_seconds=10) == []
+
+    clock.now += 5
+    assert store.lease("b", 1, lease_seconds=10) == [1]
+
+
+def test_fail_retries_until_max_attempts(store):
+    store.add([1])
+    assert store.lease("a", 1, lease_seconds=10) == [1]
+    store.fail(1, "a", "timeout")
+    assert store.counts()["pending"] == 1
+
+    assert store.lease("a", 1, lease_seconds=10) == [1]
+    store.fail(1, "a", "timeout")
+    assert store.counts() == {"pending": 0, "leased": 0, "done": 0, "failed": 1}
+    assert store.lease("a", 1, lease_seconds=10) == []
+
+
+def test_expired_leases_count_as_attempts(store, clock):
+    # A hearing that kills its worker every time is failed after max_attempts, instead of looping forever
+    store.add([1, 2])
+    assert sorted(store.lease("a", 2, lease_seconds=10)) == [1, 2]
+    store.complete(2, "a")
+
+    clock.now += 11
+    assert store.lease("b", 2, lease_seconds=10) == [1]
+
+    clock.now += 11
+    assert store.lease("c", 2, lease_seconds=10) == []
+    assert store.counts() == {"pending": 0, "leased": 0, "done": 1, "failed": 1}
+
+
+def test_leases_are_handed_out_once(store):
+    store.add(range(20))
+    leased = [store.lease(worker, 3, lease_seconds=10) for worker in "abcdefgh"]
+
+    ids = [x for batch in leased for x in batch]
+    assert sorted(ids) == list(range(20))
+    assert store.counts() == {"pending": 0, "leased": 20, "done": 0, "failed": 0}
+
+
+def test_reserve_token_shares_the_bucket(store, clock):
+    # A burst of two, then one token per second
+    assert store.reserve_token("portal", rate=1, capacity=2) == 0
+    assert store.reserve_token("portal", rate=1, capacity=2) == 0
+    assert store.reserve_token("portal", rate=1, capacity=2) == pytest.approx(1)
+    assert store.reserve_token("other", rate=1, capacity=2) == 0
@@ -0,0 +1,124 @@
+import os
+import zipfile
+
+import pytest
+
+from hoering.zipfs import HearingArchives
+
+MEMBERS = {
+    "Høringssvar KL.pdf": b"%PDF-1.4 svar fra KL",
+    "bilag/svar 2.docx": b"docx bytes" * 100,
+    "Hoeringsbrev.pdf": b"%PDF-1.4 brev",
+}
+
+
+def make_hearing(mainpath, _id, members):
+    folder = mainpath / str(_id)
+    folder.mkdir(parents=True, exist_ok=True)
+    with zipfile.ZipFile(folder / f"{_id}.zip", "w") as zf:
+        zf.writestr("bilag/", b"")
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return folder
+
+
+@pytest.fixture
+def archives(tmp_path):
+    make_hearing(tmp_path / "hearings", 101, MEMBERS)
+    make_hearing(tmp_path / "hearings", 102, {"svar.pdf": b"%PDF-1.4"})
+    # A folder without a zip file is not a hearing yet
+    (tmp_path / "hearings" / "103").mkdir()
+    archives = HearingArchives(tmp_path / "hearings", tmp_path / "scratch")
+    yield archives
+    archives.close()
+
+
+def test_members_are_listed_under_their_unzipped_names(archives):
+    assert archives.folders() == ["101", "102"]
+    # Directories are left out, and a member in a subfolder gets its path flattened into the name, like unzip does
+    assert sorted(archives.listdir(101)) == ["Hoeringsbrev.pdf", "Høringssvar_KL.pdf", "bilag�svar_2.docx"]
+    assert sorted(archives.listdir("101", "*.PDF")) == ["Hoeringsbrev.pdf", "Høringssvar_KL.pdf"]
+
+
+def test_read_members(archives):
+    assert archives.read(101, "Høringssvar_KL.pdf") == MEMBERS["Høringssvar KL.pdf"]
+    assert archives.read(101, "bilag�svar_2.docx") == MEMBERS["bilag/svar 2.docx"]
+    assert archives.size(101, "bilag�svar_2.docx") == len(MEMBERS["bilag/svar 2.docx"])
+    with archives.open(102, "svar.pdf") as f:
+        assert f.read(4) == b"%PDF"
+
+
+def test_missing_member(archives):
+    # Members are looked up by their listed name only
+    with pytest.raises(KeyError):
+        archives.read(101, "bilag/svar 2.docx")
+    with pytest.raises(KeyError):
+        archives.materialize(101, "missing.pdf")
+    assert not (archives.scratch_dir / "101" / "missing.pdf").exists()
+
+    with pytest.raises(FileNotFoundError):
+        archives.listdir(103)
+
+
+def test_materialize(archives):
+    path = archives.materialize(101, "bilag�svar_2.docx")
+    assert path == archives.scratch_dir / "101" / "bilag�svar_2.docx"
+    assert path.read_bytes() == MEMBERS["bilag/svar 2.docx"]
+    assert os.listdir(path.parent) == [path.name]
+
+    # A file already written is reused
+    mtime = path.stat().st_mtime_ns
+    assert archives.materialize(101, "bilag�svar_2.docx") == path
+    assert path.stat().st_mtime_ns == mtime
+
+    # A truncated one is written again
+    path.write_bytes(b"docx")
+    assert archives.materialize(101, "bilag�svar_2.docx").read_bytes() == MEMBERS["bilag/svar 2.docx"]
+
+
+def test_exclude(archives):
+    archives.set_exclude(lambda name: "brev" in name.lower())
+    assert sorted(archives.listdir(101)) == ["Høringssvar_KL.pdf", "bilag�svar_2.docx"]
+    with pytest.raises(KeyError):
+        archives.read(101, "Hoeringsbrev.pdf")
+
+    archives.set_exclude(None)
+    assert len(archives.listdir(101)) == 3
+
+
+def test_replaced_zip_file_is_read_again(archives):
+    assert archives.listdir(102) == ["svar.pdf"]
+    make_hearing(archives.mainpath, 102, {"svar.pdf": b"%PDF-1.4", "svar 2.pdf": b"%PDF-1.4 nyt svar"})
+    assert sorted(archives.listdir(102)) == ["svar.pdf", "svar_2.pdf"]
+
+
+def test_least_recently_used_zip_files_are_closed(tmp_path):
+    for _id in range(5):
+        make_hearing(tmp_path / "hearings", _id, {"svar.pdf": b"%PDF-1.4"})
+    archives = HearingArchives(tmp_path / "hearings", tmp_path / "scratch", max_open=2)
+
+    for _id in range(5):
+        assert archives.read(_id, "svar.pdf") == b"%PDF-1.4"
+    assert list(archives.open_zips) == ["3", "4"]
+
+    archives.close()
+    assert not archives.open_zips
+
+
+def test_file_converter_from_zip(tmp_path):
+    convert = pytest.importorskip("hoering.parser.file_convert.file_to_format_convert")
+    make_hearing(tmp_path / "hearings", 101, MEMBERS)
+
+    converter = convert.FileConverter(tmp_path / "hearings", tmp_path / "output", "pdf", "svar", from_zip=True)
+    # Names are fixed like the unzipped files: � becomes oe, and names are lower cased
+    assert sorted(converter.archives.listdir(101)) == ["bilagoesvar_2.docx", "hoeringsbrev.pdf", "høringssvar_kl.pdf"]
+    assert converter.archives.read(101, "bilagoesvar_2.docx") == MEMBERS["bilag/svar 2.docx"]
+    with pytest.raises(KeyError):
+        converter.archives.read(101, "missing.pdf")
+
+    # The standard files are left out of the listing, and nothing is deleted
+    # The count is per matching rule: hoeringsbrev matches rule 2 (hoering) and rule 5 (hoeringsbrev)
+    assert converter.remove_standard_files() == 2
+    assert sorted(converter.archives.listdir(101)) == ["bilagoesvar_2.docx", "høringssvar_kl.pdf"]
+    assert os.listdir(tmp_path / "hearings" / "101") == ["101.zip"]
+    converter.archives.close()